@@ -1,12 +1,13 @@
 from django.contrib import admin
 
+from . import services
 from .models import Thread, Message
 
 
 class MessageInline(admin.TabularInline):
     model = Message
     extra = 1
-    readonly_fields = ('text', 'sender', 'thread', 'created', 'is_read')
+    readonly_fields = ('text', 'sender', 'thread', 'created')
 
 
 @admin.register(Thread)
@@ -15,24 +16,37 @@ class ThreadAdmin(admin.ModelAdmin):
     list_display_links = ('id', 'created')
     list_filter = ('created', 'updated')
     search_fields = ('id',)
-    readonly_fields = ('id', 'created', 'updated')
+    readonly_fields = ('id', 'created', 'updated', 'participants_key')
     save_on_top = True
     save_as = True
     inlines = [
         MessageInline,
     ]
 
+    def save_related(self, request, form, formsets, change) -> None:
+        super().save_related(request, form, formsets, change)
+        services.refresh_participants_key(form.instance)
+
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ('id', 'sender', 'thread', 'created', 'is_read')
+    list_display = ('id', 'sender', 'thread', 'created')
     list_display_links = ('id', 'created')
-    list_filter = ('sender', 'thread', 'is_read')
+    list_filter = ('sender', 'thread')
     search_fields = ('id', 'sender')
     readonly_fields = ('id', 'created')
     save_on_top = True
     save_as = True
 
+    def save_model(self, request, obj, form, change) -> None:
+        if change:
+            super().save_model(request, obj, form, change)
+            return
+        # The thread, counters and change log are updated with it.
+        message = services.create_message(obj.thread, obj.sender, obj.text)
+        obj.pk = message.pk
+        obj.created = message.created
+
 
 admin.site.site_title = 'Simple Chat'
 admin.site.site_header = 'Simple Chat'
@@ -0,0 +1,319 @@
+"""
+Stateless JWT authentication of the chats API.
+
+Chats views need only the id of the user, so the user is built from
+claims of the validated token and its row is loaded only when another
+attribute is used. Loaded users are kept in a small LRU cache of the
+process. Deactivation and revoked tokens are checked with a state of
+the user: `is_active` and the `TokenRevocation` time are read with one
+query and kept in the default cache for `CHATS_AUTH_STATE_TIMEOUT`
+seconds, the longest time a change is not seen by other processes.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import HttpRequest
+from django.utils import timezone
+
+from .models import TokenRevocation
+
+if TYPE_CHECKING:
+    from django.contrib.auth.models import User
+else:
+    User = get_user_model()
+
+STATE_KEY = 'chats:user-state:{}'
+
+
+def get_timeout() -> int:
+    """
+    Time in seconds the state and loaded rows of users are cached.
+    """
+    return getattr(settings, 'CHATS_AUTH_STATE_TIMEOUT', 30)
+
+
+def get_token_lifetime() -> int:
+    return int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+
+
+class UserCache:
+    """
+    Bounded LRU cache of loaded users with expiration.
+    """
+
+    def __init__(self, size: int, timeout: float) -> None:
+        self.size = size
+        self.timeout = timeout
+        self.users: OrderedDict[int, tuple[float, User]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id: int) -> User | None:
+        with self.lock:
+            item = self.users.get(user_id)
+            if item is None:
+                return None
+            expires, user = item
+            if expires < time.monotonic():
+                del self.users[user_id]
+                return None
+            self.users.move_to_end(user_id)
+        # Copy, so changes of the user by a request are not shared.
+        return copy.copy(user)
+
+    def set(self, user: User) -> None:
+        with self.lock:
+            self.users[user.pk] = (time.monotonic() + self.timeout, user)
+            self.users.move_to_end(user.pk)
+            while len(self.users) > self.size:
+                self.users.popitem(last=False)
+
+    def delete(self, user_id: int) -> None:
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.users.clear()
+
+
+user_cache = UserCache(
+    getattr(settings, 'CHATS_AUTH_USER_CACHE_SIZE', 1024), get_timeout()
+)
+
+
+def load_user(user_id: int) -> User:
+    user = user_cache.get(user_id)
+    if user is None:
+        try:
+            user = User.objects.get(pk=user_id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        user_cache.set(user)
+        user = copy.copy(user)
+    return user
+
+
+class LazyTokenUser(TokenUser):
+    """
+    User backed by a validated token that loads its row
+    on the first use of an attribute other than `id`.
+    """
+
+    def __str__(self) -> str:
+        return str(self.get_user())
+
+    def get_user(self) -> User:
+        """
+        Return the model instance of the user.
+        """
+        if '_user' not in self.__dict__:
+            self._user = load_user(self.id)
+        return self._user
+
+    @property
+    def username(self) -> str:
+        return self.get_user().username
+
+    @property
+    def is_staff(self) -> bool:
+        return self.get_user().is_staff
+
+    @property
+    def is_superuser(self) -> bool:
+        return self.get_user().is_superuser
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.get_user(), name)
+
+
+def get_request_user(request: HttpRequest | Request) -> User:
+    """
+    Return the user of a request to a view that requires authentication.
+    """
+    user = request.user
+    if isinstance(user, AnonymousUser):
+        raise NotAuthenticated()
+    return user
+
+
+def get_model_user(user: User | LazyTokenUser) -> User:
+    """
+    Return the model instance of a user, e.g. to assign it to a relation.
+    """
+    if isinstance(user, LazyTokenUser):
+        return user.get_user()
+    return user
+
+
+def get_state_row(user_id: int) -> QuerySet:
+    users = User.objects.filter(pk=user_id)
+    return users.values_list('is_active', 'token_revocation__valid_after')
+
+
+def make_state(row: tuple[bool, datetime | None]) -> dict:
+    is_active, valid_after = row
+    return {
+        'is_active': is_active,
+        # Whole seconds, as issue times of tokens.
+        'valid_after': int(valid_after.timestamp()) if valid_after else 0,
+    }
+
+
+def get_user_state(user_id: int) -> dict | None:
+    """
+    Return `is_active` and `valid_after` (timestamp in seconds before
+    which tokens are revoked) of the user or `None` if the user does not exist.
+
+    Takes a query only when the state is not cached.
+    """
+    key = STATE_KEY.format(user_id)
+    state = cache.get(key)
+    if state is None:
+        row = get_state_row(user_id).first()
+        if row is None:
+            return None
+        state = make_state(row)
+        cache.set(key, state, get_timeout())
+    return state
+
+
+async def aget_user_state(user_id: int) -> dict | None:
+    """
+    Version of `get_user_state()` for async views.
+    """
+    key = STATE_KEY.format(user_id)
+    state = await cache.aget(key)
+    if state is None:
+        row = await get_state_row(user_id).afirst()
+        if row is None:
+            return None
+        state = make_state(row)
+        await cache.aset(key, state, get_timeout())
+    return state
+
+
+def set_user_state(user_id: int, state: dict) -> None:
+    """
+    Cache the state now and after commit, so concurrent requests
+    do not cache the old one again.
+    """
+    key = STATE_KEY.format(user_id)
+    cache.set(key, state, get_timeout())
+    transaction.on_commit(lambda: cache.set(key, state, get_timeout()))
+    user_cache.delete(user_id)
+
+
+def update_user_state(user: User, revoke_tokens: bool = False) -> None:
+    """
+    Save state of the user and, if `revoke_tokens`, reject its
+    tokens issued before the current second.
+    """
+    revocations = TokenRevocation.objects.filter(user_id=user.pk)
+    valid_after: datetime | None
+    if revoke_tokens:
+        valid_after = timezone.now().replace(microsecond=0)
+        revocations.update_or_create(defaults={'valid_after': valid_after})
+    else:
+        valid_after = revocations.values_list(
+            'valid_after', flat=True
+        ).first()
+    set_user_state(user.pk, make_state((user.is_active, valid_after)))
+
+
+def delete_user_state(user_id: int) -> None:
+    set_user_state(
+        user_id, {'is_active': False, 'valid_after': int(time.time())}
+    )
+
+
+def get_issued_at(token: Token) -> int:
+    """
+    Tokens have no `iat` claim, so the time is calculated by expiration.
+    """
+    return token['exp'] - get_token_lifetime()
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that returns `LazyTokenUser` without a query.
+    """
+
+    def get_user(self, validated_token: Token) -> LazyTokenUser | User:
+        user = self.get_token_user(validated_token)
+        self.check_user_state(validated_token, get_user_state(user.id))
+        return user
+
+    async def aget_user(self, validated_token: Token) -> LazyTokenUser:
+        """
+        Version of `get_user()` for async views.
+        """
+        user = self.get_token_user(validated_token)
+        self.check_user_state(validated_token, await aget_user_state(user.id))
+        return user
+
+    async def aauthenticate(
+        self, request: HttpRequest
+    ) -> tuple[LazyTokenUser, Token] | None:
+        """
+        Version of `authenticate()` for async views.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    def get_token_user(self, validated_token: Token) -> LazyTokenUser:
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(
+                'Token contained no recognizable user identification'
+            )
+        return LazyTokenUser(validated_token)
+
+    def check_user_state(
+        self, validated_token: Token, state: dict | None
+    ) -> None:
+        if state is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not state['is_active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        # `exp` has seconds precision, so tokens issued in the second of
+        # a revocation are accepted, e.g. the ones issued after a password
+        # change.
+        if get_issued_at(validated_token) < state['valid_after']:
+            raise AuthenticationFailed(
+                'Token is revoked', code='token_not_valid'
+            )
+
+
+class ModelJWTAuthentication(StatelessJWTAuthentication):
+    """
+    JWT authentication that returns the model instance of the user,
+    for views that change the user, e.g. the ones of djoser.
+    """
+
+    def get_user(self, validated_token: Token) -> User:
+        return get_model_user(super().get_user(validated_token))
@@ -0,0 +1,333 @@
+"""
+Benchmark of the chats API with synthetic traffic.
+
+A dataset of users, threads and messages is generated and bulk loaded
+by `loader` and then clients replay a mix of the chats endpoints against the
+in-process application, recording latency, queries and write statements
+of every request. Writes of `message_create` are writes per message sent.
+"""
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Iterator
+
+from rest_framework_simplejwt.tokens import AccessToken
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from . import loader
+from .loader import LoadedObject
+from .models import Thread, Message
+
+User = get_user_model()
+
+API_URL = '/api/v1/chats/'
+
+DEFAULT_MIX = {
+    'thread_create': 3,
+    'thread_destroy': 1,
+    'thread_list': 20,
+    'message_create': 15,
+    'message_list': 30,
+    'message_read': 11,
+    'unread_number': 20,
+}
+
+
+@dataclass
+class Dataset:
+    """
+    Ids of generated objects that clients choose from.
+    """
+
+    users: list[int]
+    threads: dict[int, list[int]]
+    messages: dict[int, list[tuple[int, int]]]
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def get_user_thread(
+        self, user_id: int, rng: random.Random
+    ) -> int | None:
+        with self.lock:
+            threads = self.threads.get(user_id)
+            return rng.choice(threads) if threads else None
+
+    def pop_user_thread(
+        self, user_id: int, rng: random.Random
+    ) -> int | None:
+        with self.lock:
+            threads = self.threads.get(user_id)
+            if not threads:
+                return None
+            thread_id = threads.pop(rng.randrange(len(threads)))
+            for thread_ids in self.threads.values():
+                if thread_id in thread_ids:
+                    thread_ids.remove(thread_id)
+            self.messages.pop(thread_id, None)
+            return thread_id
+
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    seconds: float
+    queries: int
+    status: int
+    writes: int = 0
+
+
+def generate_dataset(
+    users: int, threads: int, messages: int, batch_size: int = 1000,
+    seed: int = None
+) -> Dataset:
+    """
+    Load a dataset of `loader.generate_objects()` and return ids
+    of its objects.
+
+    Threads get their last messages and participants read receipts
+    and unread counters, as threads of real chats.
+    """
+    dataset = Dataset([], {}, {})
+
+    def collect(objects: Iterator[LoadedObject]) -> Iterator[LoadedObject]:
+        for obj, participants in objects:
+            if isinstance(obj, User):
+                dataset.users.append(obj.id)
+            elif isinstance(obj, Thread):
+                for user_id in participants or []:
+                    dataset.threads.setdefault(user_id, []).append(obj.id)
+            elif isinstance(obj, Message):
+                dataset.messages.setdefault(obj.thread_id, []).append(
+                    (obj.id, obj.sender_id)
+                )
+            yield obj, participants
+
+    loader.load(
+        collect(loader.generate_objects(users, threads, messages, seed=seed)),
+        batch_size,
+    )
+    return dataset
+
+
+class BenchmarkClient:
+    """
+    Client of one user that sends requests of the mix.
+
+    Objects of requests are chosen with `rng`, so runs with the same
+    seed send the same requests.
+    """
+
+    def __init__(
+        self, dataset: Dataset, user_id: int, rng: random.Random = None
+    ) -> None:
+        self.dataset = dataset
+        self.user_id = user_id
+        self.rng = rng or random.Random()
+        user = User(id=user_id)
+        self.client = Client(
+            raise_request_exception=False,
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}',
+        )
+
+    def request(self, endpoint: str) -> Sample | None:
+        method, url, data = getattr(self, f'get_{endpoint}')()
+        if url is None:
+            return None
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(
+                url, data=data, content_type='application/json'
+            )
+            seconds = time.perf_counter() - start
+        writes = sum(
+            query['sql'].lstrip().upper().startswith(WRITE_STATEMENTS)
+            for query in context.captured_queries
+        )
+        return Sample(
+            endpoint, seconds, len(context.captured_queries),
+            response.status_code, writes,
+        )
+
+    def get_thread_create(self) -> tuple:
+        other = self.rng.choice(self.dataset.users)
+        while other == self.user_id and len(self.dataset.users) > 1:
+            other = self.rng.choice(self.dataset.users)
+        data = json.dumps({'participants': [self.user_id, other]})
+        return 'post', f'{API_URL}thread/create/', data
+
+    def get_thread_destroy(self) -> tuple:
+        thread_id = self.dataset.pop_user_thread(self.user_id, self.rng)
+        if thread_id is None:
+            return 'delete', None, None
+        return 'delete', f'{API_URL}thread/{thread_id}/destroy/', None
+
+    def get_thread_list(self) -> tuple:
+        return 'get', f'{API_URL}thread/list/', {'limit': 50}
+
+    def get_message_create(self) -> tuple:
+        thread_id = self.dataset.get_user_thread(self.user_id, self.rng)
+        if thread_id is None:
+            return 'post', None, None
+        data = json.dumps({'text': 'Benchmark message'})
+        return 'post', f'{API_URL}thread/{thread_id}/message/create/', data
+
+    def get_message_list(self) -> tuple:
+        thread_id = self.dataset.get_user_thread(self.user_id, self.rng)
+        if thread_id is None:
+            return 'get', None, None
+        url = f'{API_URL}thread/{thread_id}/message/list/'
+        return 'get', url, {'limit': 50}
+
+    def get_message_read(self) -> tuple:
+        thread_id = self.dataset.get_user_thread(self.user_id, self.rng)
+        messages = self.dataset.messages.get(thread_id, [])  # type: ignore
+        received = [pk for pk, sender in messages if sender != self.user_id]
+        if not received:
+            return 'patch', None, None
+        url = f'{API_URL}message/{self.rng.choice(received)}/read/'
+        return 'patch', url, None
+
+    def get_unread_number(self) -> tuple:
+        return 'get', f'{API_URL}message/number-unread/', None
+
+
+def replay(
+    dataset: Dataset, mix: dict[str, int], clients: int,
+    requests_per_client: int, seed: int = None
+) -> tuple[list[Sample], float]:
+    """
+    Send requests of the mix from concurrent clients.
+
+    Return samples of all requests and wall time of the replay.
+    """
+    rng = random.Random(seed)
+    endpoints = list(mix)
+    weights = [mix[endpoint] for endpoint in endpoints]
+    plans = [
+        (rng.choice(dataset.users),
+         rng.choices(endpoints, weights=weights, k=requests_per_client),
+         random.Random(rng.getrandbits(64)))
+        for _ in range(clients)
+    ]
+
+    def run(
+        user_id: int, plan: list[str], client_rng: random.Random
+    ) -> list[Sample]:
+        client = BenchmarkClient(dataset, user_id, client_rng)
+        samples = [client.request(endpoint) for endpoint in plan]
+        return [sample for sample in samples if sample is not None]
+
+    def run_in_thread(
+        user_id: int, plan: list[str], client_rng: random.Random
+    ) -> list[Sample]:
+        try:
+            return run(user_id, plan, client_rng)
+        finally:
+            connections.close_all()
+
+    start = time.perf_counter()
+    if clients == 1:
+        samples = run(*plans[0])
+    else:
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            results = executor.map(lambda plan: run_in_thread(*plan), plans)
+            samples = [sample for result in results for sample in result]
+    return samples, time.perf_counter() - start
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """
+    Return percentile of sorted values by nearest-rank method.
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(values)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def summarize(samples: list[Sample], seconds: float) -> dict:
+    endpoints: dict[str, list[Sample]] = {}
+    for sample in samples:
+        endpoints.setdefault(sample.endpoint, []).append(sample)
+    report = {}
+    for endpoint, endpoint_samples in sorted(endpoints.items()):
+        latency = sorted(sample.seconds * 1000 for sample in endpoint_samples)
+        queries = [sample.queries for sample in endpoint_samples]
+        writes = [sample.writes for sample in endpoint_samples]
+        report[endpoint] = {
+            'requests': len(endpoint_samples),
+            'errors': sum(
+                sample.status >= 400 for sample in endpoint_samples
+            ),
+            'throughput_rps': round(len(endpoint_samples) / seconds, 2),
+            'mean_ms': round(sum(latency) / len(latency), 3),
+            'p50_ms': round(percentile(latency, 50), 3),
+            'p95_ms': round(percentile(latency, 95), 3),
+            'p99_ms': round(percentile(latency, 99), 3),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+            'writes_mean': round(sum(writes) / len(writes), 2),
+        }
+    return {
+        'seconds': round(seconds, 3),
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / seconds, 2) if seconds else 0,
+        'endpoints': report,
+    }
+
+
+def get_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run_benchmark(
+    users: int = 100,
+    threads: int = 300,
+    messages: int = 10000,
+    clients: int = 8,
+    requests_per_client: int = 100,
+    mix: dict[str, int] = None,
+    seed: int = None,
+) -> dict:
+    """
+    Generate a dataset in the current database, replay traffic
+    and return the report.
+    """
+    mix = mix or DEFAULT_MIX
+    dataset = generate_dataset(users, threads, messages, seed=seed)
+    samples, seconds = replay(
+        dataset, mix, clients, requests_per_client, seed=seed
+    )
+    report = summarize(samples, seconds)
+    report['meta'] = {
+        'commit': get_commit(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'database': connection.vendor,
+        'users': users,
+        'threads': threads,
+        'messages': messages,
+        'clients': clients,
+        'requests_per_client': requests_per_client,
+        'mix': mix,
+        'seed': seed,
+    }
+    return report
@@ -0,0 +1,161 @@
+"""
+Conditional requests and cached first pages of list endpoints.
+
+Data of a user (threads, unread numbers) and of a thread (messages)
+have versions in the shared cache. A version gets a new tag whenever
+a change of the data is logged, so the version is an `ETag` and
+`Last-Modified` of responses that costs no queries. First pages are
+kept in the cache by the version they were built with, so they are
+not used once the data is changed.
+"""
+import hashlib
+import time
+import uuid
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpRequest
+from django.http.response import HttpResponseBase
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date, quote_etag
+
+USER_VERSION_KEY = 'chats:user-version:{}'
+THREAD_VERSION_KEY = 'chats:thread-version:{}'
+PAGE_KEY = 'chats:page:{}:{}:{}'
+
+# Versions are kept longer than pages; a lost version only makes
+# clients load their data once again.
+VERSION_TIMEOUT = 24 * 60 * 60
+
+DEFAULTS = {
+    'ENABLED': True,
+    'TIMEOUT': 60,
+}
+
+
+def get_option(name: str) -> Any:
+    options = getattr(settings, 'CHATS_RESPONSE_CACHE', {})
+    return options.get(name, DEFAULTS[name])
+
+
+def is_shared_cache() -> bool:
+    """
+    Check whether the default cache is seen by all worker processes.
+
+    `LocMemCache` is kept by every process, so data changed by one
+    worker is not invalidated in the others.
+    """
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def is_enabled() -> bool:
+    """
+    Check whether responses are cached. Versions changed by one worker
+    must be seen by the others, so a per-process cache is not used.
+    """
+    return get_option('ENABLED') and is_shared_cache()
+
+
+def make_version(modified: int) -> dict:
+    return {'tag': uuid.uuid4().hex, 'modified': modified}
+
+
+def get_version(key: str) -> dict:
+    """
+    Return `tag` and `modified` timestamp of the data version.
+    """
+    version = cache.get(key)
+    if version is None:
+        version = make_version(int(time.time()))
+        if not cache.add(key, version, VERSION_TIMEOUT):
+            version = cache.get(key) or version
+    return version
+
+
+def invalidate(
+    user_ids: Iterable[int] = (), thread_ids: Iterable[int] = ()
+) -> None:
+    """
+    Give new versions to data of the users and threads now and after
+    commit, so pages cached by concurrent requests before the commit
+    are not used.
+
+    `modified` of a new version is greater than of the old one
+    even within a second, so `If-Modified-Since` is not answered
+    with an old version.
+    """
+    keys = [USER_VERSION_KEY.format(pk) for pk in user_ids]
+    keys += [THREAD_VERSION_KEY.format(pk) for pk in thread_ids]
+    if not keys:
+        return
+
+    def bump() -> None:
+        versions = cache.get_many(keys)
+        now = int(time.time())
+        cache.set_many({
+            key: make_version(
+                max(now, versions[key]['modified'] + 1)
+                if key in versions else now
+            )
+            for key in keys
+        }, VERSION_TIMEOUT)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_not_modified(
+    request: HttpRequest, version: dict, variant: str = ''
+) -> HttpResponseBase | None:
+    """
+    Return `304 Not Modified` response if the client has the version.
+    """
+    return get_conditional_response(
+        request,
+        etag=quote_etag(get_etag(version, variant)),
+        last_modified=version['modified'],
+    )
+
+
+def set_validators(
+    response: HttpResponseBase, version: dict, variant: str = ''
+) -> None:
+    """
+    Set `ETag` and `Last-Modified` of the version and ask clients
+    to revalidate their private copies.
+    """
+    if response.status_code not in (200, 304):
+        return
+    response['ETag'] = quote_etag(get_etag(version, variant))
+    response['Last-Modified'] = http_date(version['modified'])
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+
+
+def get_etag(version: dict, variant: str) -> str:
+    """
+    `variant` separates representations of the same data,
+    e.g. JSON and HTML.
+    """
+    return f'{version["tag"]}-{variant}' if variant else version['tag']
+
+
+def get_page_key(request: HttpRequest, scope: str, version: dict) -> str:
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return PAGE_KEY.format(scope, version['tag'], url)
+
+
+def is_first_page(request: HttpRequest) -> bool:
+    """
+    Check whether the request is for the first page of newest (or
+    oldest) objects, the one clients poll.
+    """
+    params = request.GET
+    if params.get('before') or params.get('after'):
+        return False
+    return params.get('offset', '0') in ('', '0')
@@ -0,0 +1,125 @@
+"""
+SQLite connection profile and retries of writes.
+
+Every new SQLite connection gets the pragmas of `CHATS_DATABASE`: the
+WAL journal lets readers work while a message is written and
+`synchronous=NORMAL` syncs the journal only at checkpoints. Writers
+wait for each other up to the busy timeout (`OPTIONS['timeout']` of
+the database).
+
+SQLite has one writer at a time. A transaction that has read before
+its first write fails at once with `database is locked` if another
+writer committed meanwhile, so write services take the write lock
+when they begin with `atomic_immediate()`, and writes that still find
+the database locked are repeated with a backoff by `retry_on_locked()`.
+"""
+import functools
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, TypeVar, cast
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+DEFAULTS = {
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    'WRITE_RETRIES': 5,
+    'RETRY_BACKOFF_MS': 20,
+}
+
+Function = TypeVar('Function', bound=Callable)
+
+# A write that changes nothing, to a table that every database has.
+TAKE_WRITE_LOCK_SQL = 'DELETE FROM django_migrations WHERE 0'
+
+
+def get_option(name: str) -> Any:
+    options = getattr(settings, 'CHATS_DATABASE', {})
+    return options.get(name, DEFAULTS[name])
+
+
+def get_pragmas() -> list[str]:
+    """
+    Return pragmas of the options that are set.
+    """
+    pragmas = {
+        'journal_mode': get_option('JOURNAL_MODE'),
+        'synchronous': get_option('SYNCHRONOUS'),
+        'mmap_size': get_option('MMAP_SIZE'),
+    }
+    return [
+        f'PRAGMA {name} = {value}'
+        for name, value in pragmas.items()
+        if value not in (None, '')
+    ]
+
+
+def configure_connection(connection: BaseDatabaseWrapper) -> None:
+    """
+    Set pragmas of a new SQLite connection.
+
+    In-memory databases keep their `memory` journal.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma in get_pragmas():
+            cursor.execute(pragma)
+
+
+@contextmanager
+def atomic_immediate(using: str = None) -> Iterator[None]:
+    """
+    Atomic block that takes the SQLite write lock when it begins, like
+    `BEGIN IMMEDIATE`: the lock is waited for up to the busy timeout
+    before anything is read. Other atomic blocks are not changed.
+
+    Nested in another atomic block it is a savepoint of that transaction.
+    """
+    connection = transaction.get_connection(using)
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(using):
+        if outermost and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(TAKE_WRITE_LOCK_SQL)
+        yield
+
+
+def is_locked(error: OperationalError) -> bool:
+    """
+    Check whether the error is of a write lock held by another
+    connection, either of the database or of a shared cache table.
+    """
+    return 'locked' in str(error)
+
+
+def retry_on_locked(func: Function) -> Function:
+    """
+    Repeat the write if the database is locked, waiting twice as long
+    (with jitter) after every attempt up to `WRITE_RETRIES` times.
+
+    Writes inside an outer transaction are not repeated, because the
+    rolled back transaction is not theirs.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as error:
+                if (
+                    not is_locked(error)
+                    or attempt >= get_option('WRITE_RETRIES')
+                    or transaction.get_connection().in_atomic_block
+                ):
+                    raise
+            delay = get_option('RETRY_BACKOFF_MS') / 1000 * 2 ** attempt
+            time.sleep(random.uniform(delay / 2, delay))
+            attempt += 1
+
+    return cast(Function, wrapper)
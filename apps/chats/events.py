@@ -0,0 +1,256 @@
+"""
+Delivery of chat events to connected clients.
+
+Events are dicts with `type`, `users` (ids of recipients) and `data`.
+They are published to a backend that delivers them to the hub of
+every worker process, and the hub passes them to queues of streams
+opened by the recipients in this process.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import IO, Callable, Iterator
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+Event = dict
+Dispatch = Callable[[Event], None]
+
+
+class BaseEventBackend:
+    """
+    Interface of a backend that shares events between worker processes.
+
+    `publish()` sends an event to all processes, `start()` is called
+    once per process with a callback that must receive every
+    published event, including the ones published by this process.
+    """
+    # Whether events of other processes are delivered.
+    shared = True
+
+    def publish(self, event: Event) -> None:
+        raise NotImplementedError
+
+    def start(self, dispatch: Dispatch) -> None:
+        raise NotImplementedError
+
+
+class InMemoryEventBackend(BaseEventBackend):
+    """
+    Delivers events only inside the current process.
+    """
+    shared = False
+
+    def __init__(self, **options) -> None:
+        self.dispatch: Dispatch | None = None
+
+    def publish(self, event: Event) -> None:
+        if self.dispatch is not None:
+            self.dispatch(event)
+
+    def start(self, dispatch: Dispatch) -> None:
+        self.dispatch = dispatch
+
+
+class FileEventBackend(BaseEventBackend):
+    """
+    Shares events between processes on one host through a file.
+
+    Every event is appended to the file as a JSON line and each
+    process reads new lines from the file in a background thread.
+    When the file grows to `max_bytes` it is moved to `<path>.1`
+    (replacing the previous one) and readers continue with a new file;
+    a reader that falls behind by a whole file skips it, so the file must
+    hold far more events than are published in a poll interval.
+    """
+
+    def __init__(
+        self, path: str = 'chats_events.log',
+        max_bytes: int = 10 * 1024 * 1024, poll_interval: float = 0.05,
+        **options
+    ) -> None:
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self.stopped = threading.Event()
+
+    def publish(self, event: Event) -> None:
+        line = json.dumps(event, separators=(',', ':')) + '\n'
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+            if self.max_bytes and os.fstat(fd).st_size >= self.max_bytes:
+                self.rotate(fd)
+        finally:
+            os.close(fd)
+
+    def rotate(self, fd: int) -> None:
+        try:
+            # Another process may have rotated the file already.
+            if os.stat(self.path).st_ino == os.fstat(fd).st_ino:
+                os.replace(self.path, f'{self.path}.1')
+        except FileNotFoundError:
+            pass
+
+    def is_rotated(self, file: IO[bytes]) -> bool:
+        try:
+            return os.stat(self.path).st_ino != os.fstat(file.fileno()).st_ino
+        except FileNotFoundError:
+            # No event since the rotation.
+            return False
+
+    def start(self, dispatch: Dispatch) -> None:
+        open(self.path, 'a').close()
+        position = os.path.getsize(self.path)
+        thread = threading.Thread(
+            target=self.read, args=(dispatch, position), daemon=True
+        )
+        thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def read(self, dispatch: Dispatch, position: int) -> None:
+        file = open(self.path, 'rb')
+        file.seek(position)
+        buffer = b''
+        rotated = False
+        try:
+            while not self.stopped.is_set():
+                chunk = file.readline()
+                if chunk:
+                    buffer += chunk
+                    if buffer.endswith(b'\n'):
+                        dispatch(json.loads(buffer))
+                        buffer = b''
+                    continue
+                if rotated:
+                    # The rotated file is read to the end, including
+                    # events written by processes that opened it before.
+                    file.close()
+                    file = open(self.path, 'rb')
+                    buffer = b''
+                    rotated = False
+                    continue
+                rotated = self.is_rotated(file)
+                if not rotated:
+                    time.sleep(self.poll_interval)
+        finally:
+            file.close()
+
+
+class EventHub:
+    """
+    Fans events out to streams opened in the current process.
+
+    Streams run in event loops while events are usually published
+    from sync views, so queues are filled thread-safely.
+    """
+
+    def __init__(self, backend: BaseEventBackend) -> None:
+        self.backend = backend
+        self.subscribers: dict[int, set[tuple]] = {}
+        self.lock = threading.Lock()
+        self.backend.start(self.dispatch)
+
+    def publish(self, event_type: str, users: list[int], data: dict) -> None:
+        if users:
+            self.backend.publish(
+                {'type': event_type, 'users': list(users), 'data': data}
+            )
+
+    def dispatch(self, event: Event) -> None:
+        with self.lock:
+            queues = [
+                subscriber
+                for user_id in event['users']
+                for subscriber in self.subscribers.get(user_id, ())
+            ]
+        for loop, queue in queues:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The loop of a stream is already closed.
+                pass
+
+    @contextmanager
+    def subscribe(self, user_id: int) -> Iterator[asyncio.Queue]:
+        """
+        Return queue that receives events of the user until exit.
+
+        Must be used inside a running event loop.
+        """
+        subscriber: tuple[asyncio.AbstractEventLoop, asyncio.Queue] = (
+            asyncio.get_running_loop(), asyncio.Queue()
+        )
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self.lock:
+                subscribers = self.subscribers.get(user_id, set())
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    self.subscribers.pop(user_id, None)
+
+
+_hub: EventHub | None = None
+_hub_lock = threading.Lock()
+
+
+def get_hub() -> EventHub:
+    """
+    Return hub of the process with backend from `CHATS_EVENTS` setting.
+    """
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            options = dict(getattr(settings, 'CHATS_EVENTS', {}))
+            backend_class = import_string(
+                options.pop('BACKEND', 'chats.events.InMemoryEventBackend')
+            )
+            _hub = EventHub(backend_class(**options.pop('OPTIONS', {})))
+        return _hub
+
+
+def get_recheck_interval() -> float | None:
+    """
+    Return seconds after which waiting views re-check the database,
+    since events of other worker processes are not delivered by
+    an in-process backend, or `None` for a backend shared by processes.
+    """
+    if get_hub().backend.shared:
+        return None
+    options = getattr(settings, 'CHATS_EVENTS', {})
+    return options.get('RECHECK_INTERVAL', 1)
+
+
+async def wait_for_event(
+    queue: asyncio.Queue, match: Callable[[Event], bool], timeout: float
+) -> Event | None:
+    """
+    Return the first event of the queue that matches or `None`
+    if there is no such event in `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while (remaining := deadline - time.monotonic()) > 0:
+        try:
+            event = await asyncio.wait_for(queue.get(), remaining)
+        except asyncio.TimeoutError:
+            return None
+        if match(event):
+            return event
+    return None
+
+
+def format_event(event: Event) -> str:
+    """
+    Format event as a Server-Sent Events message.
+    """
+    data = json.dumps(event['data'], separators=(',', ':'), default=str)
+    return f'event: {event["type"]}\ndata: {data}\n\n'
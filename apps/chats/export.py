@@ -0,0 +1,134 @@
+"""
+Streaming export of messages as JSON Lines or CSV.
+
+Messages are read with a chunked iterator and written in chunks,
+so memory use does not depend on the number of exported messages.
+ASGI servers get the chunks with `aiterate()`: Django reads a sync
+iterator of a streaming response to a list under ASGI.
+"""
+import csv
+import heapq
+import io
+import itertools
+import json
+import zlib
+from typing import AsyncIterator, Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+
+from . import services
+from .models import ArchivedMessage, Message
+
+FIELDS = ('id', 'thread', 'sender', 'sender_id', 'text', 'created', 'is_read')
+
+# Number of messages written to one chunk of the output.
+ROWS_PER_CHUNK = 100
+
+# Number of output chunks taken in a thread at once by `aiterate()`.
+CHUNKS_PER_THREAD_CALL = 10
+
+CONTENT_TYPES = {
+    'jsonl': 'application/jsonl',
+    'csv': 'text/csv',
+}
+
+
+def get_rows(
+    thread_ids: list[int] = None, chunk_size: int = 2000
+) -> Iterable[tuple]:
+    """
+    Return rows of messages of the threads (all threads if not given),
+    including archived ones, ordered by thread and creation,
+    in order of `FIELDS`.
+    """
+    sources = []
+    for model in (ArchivedMessage, Message):
+        messages = model.objects.order_by('thread_id', 'created', 'id')
+        messages = messages.annotate(is_read=services.get_read_by_receivers())
+        if thread_ids is not None:
+            messages = messages.filter(thread_id__in=thread_ids)
+        rows = messages.values_list(
+            'id', 'thread_id', 'sender__username', 'sender_id', 'text',
+            'created', 'is_read',
+        )
+        sources.append(rows.iterator(chunk_size=chunk_size))
+    return heapq.merge(*sources, key=lambda row: (row[1], row[5], row[0]))
+
+
+def write_jsonl(rows: Iterable[tuple]) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        data = dict(zip(FIELDS, row))
+        data['created'] = data['created'].isoformat()
+        lines.append(json.dumps(data, ensure_ascii=False) + '\n')
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def write_csv(rows: Iterable[tuple]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for i, row in enumerate(rows, 1):
+        writer.writerow((*row[:5], row[5].isoformat(), int(row[6])))
+        if i % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+WRITERS = {
+    'jsonl': write_jsonl,
+    'csv': write_csv,
+}
+
+
+def compress(chunks: Iterable[str]) -> Iterator[bytes]:
+    """
+    Compress text chunks to a gzip stream on the fly.
+    """
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_messages(
+    export_format: str,
+    thread_ids: list[int] = None,
+    chunk_size: int = 2000,
+) -> Iterator[str]:
+    """
+    Return text chunks of exported messages of the threads,
+    which `compress()` turns to gzip.
+
+    `chunk_size` is the number of rows fetched from the database at once.
+    """
+    rows = get_rows(thread_ids, chunk_size)
+    return WRITERS[export_format](rows)
+
+
+async def aiterate(
+    chunks: Iterator[str | bytes], batch: int = CHUNKS_PER_THREAD_CALL
+) -> AsyncIterator[str | bytes]:
+    """
+    Return chunks of a sync iterator for async servers.
+
+    The iterator is advanced by `batch` chunks in the thread of sync
+    code of the request, which keeps its database connection and cursor,
+    so only `batch` chunks are in memory at once.
+    """
+    take = sync_to_async(lambda: list(itertools.islice(chunks, batch)))
+    while True:
+        items = await take()
+        if not items:
+            return
+        for item in items:
+            yield item
@@ -0,0 +1,311 @@
+"""
+Fast loading of users, threads and messages.
+
+Objects are inserted in chunks with `bulk_create()`, so no signals are
+sent: fields that receivers keep up to date (`Thread.updated`,
+`Thread.last_message` and unread messages counters) are calculated
+once after the load. Objects are read from JSON Lines in the format of
+`dumpdata --format jsonl` or generated with a realistic distribution.
+"""
+import itertools
+import json
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import IO, TYPE_CHECKING, Iterable, Iterator
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.core.serializers.python import Deserializer
+from django.db import connection, models, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import caching, membership, services
+from .models import ReadReceipt, Thread, Message
+
+if TYPE_CHECKING:
+    from django.contrib.auth.models import User
+else:
+    User = get_user_model()
+
+# Models in order of dependencies, the order they are inserted in.
+MODELS: tuple[type[models.Model], ...] = (User, Thread, Message, ReadReceipt)
+
+LoadedObject = tuple[models.Model, list[int] | None]
+
+
+@dataclass
+class LoadStats:
+    created: dict[str, int] = field(default_factory=dict)
+    skipped: int = 0
+
+    def add(self, model: type[models.Model], number: int) -> None:
+        label = model._meta.label
+        self.created[label] = self.created.get(label, 0) + number
+
+
+def get_auto_now_add_fields(
+    model: type[models.Model]
+) -> list[models.DateTimeField]:
+    return [
+        model_field
+        for model_field in model._meta.fields
+        if isinstance(model_field, models.DateTimeField)
+        and model_field.auto_now_add
+    ]
+
+
+def bulk_create_keeping_dates(
+    model: type[models.Model],
+    objects: list[models.Model],
+    fields: list[models.DateTimeField],
+) -> None:
+    """
+    Insert objects and restore the loaded values of `auto_now_add`
+    fields, which `bulk_create()` overwrites.
+    """
+    dates = [[getattr(obj, f.attname) for f in fields] for obj in objects]
+    model.objects.bulk_create(objects)
+    if not fields:
+        return
+    for obj, values in zip(objects, dates):
+        for model_field, value in zip(fields, values):
+            setattr(obj, model_field.attname, value)
+    model.objects.bulk_update(objects, [f.name for f in fields])
+
+
+class BulkLoader:
+    """
+    Collects objects and inserts them in chunks of `chunk_size`.
+
+    Objects must come after the objects they refer to, as in dumps.
+    """
+
+    def __init__(self, chunk_size: int = 5000) -> None:
+        self.chunk_size = chunk_size
+        self.objects: dict[type[models.Model], list[models.Model]] = {
+            model: [] for model in MODELS
+        }
+        self.participants: list[tuple[Thread, list[int]]] = []
+        # Threads with loaded objects, the only ones `finish()` updates.
+        self.thread_ids: set[int] = set()
+        self.auto_now_add_fields = {
+            model: get_auto_now_add_fields(model) for model in MODELS
+        }
+        self.stats = LoadStats()
+
+    def add(self, obj: models.Model, participants: list[int] = None) -> None:
+        model = type(obj)
+        if model not in self.objects:
+            self.stats.skipped += 1
+            return
+        for model_field in self.auto_now_add_fields[model]:
+            if getattr(obj, model_field.attname) is None:
+                setattr(obj, model_field.attname, timezone.now())
+        if isinstance(obj, (Message, ReadReceipt)):
+            self.thread_ids.add(obj.thread_id)
+        if isinstance(obj, Thread):
+            participants = participants or []
+            # As `refresh_participants_key()`, only threads of two users
+            # are found by the unique key; deleted threads have none.
+            obj.participants_key = (
+                Thread.make_participants_key(participants)
+                if len(participants) == 2 else None
+            )
+            # Is set by `finish()` when all messages are loaded.
+            obj.last_message_id = None
+            self.participants.append((obj, participants))
+        self.objects[model].append(obj)
+        if len(self.objects[model]) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Insert collected objects of all models in one transaction.
+        """
+        through = Thread.participants.through
+        with transaction.atomic():
+            for model, objects in self.objects.items():
+                if objects:
+                    bulk_create_keeping_dates(
+                        model, objects, self.auto_now_add_fields[model]
+                    )
+                    self.stats.add(model, len(objects))
+                    objects.clear()
+            rows = [
+                through(thread_id=thread.id, user_id=user_id)
+                for thread, user_ids in self.participants
+                for user_id in user_ids
+            ]
+            through.objects.bulk_create(rows, batch_size=self.chunk_size)
+        user_ids = list({
+            user_id for _, thread_user_ids in self.participants
+            for user_id in thread_user_ids
+        })
+        thread_ids = [thread.id for thread, _ in self.participants]
+        self.thread_ids.update(thread_ids)
+        membership.invalidate_user_threads(user_ids)
+        caching.invalidate(user_ids, thread_ids)
+        self.participants.clear()
+
+    def finish(self) -> LoadStats:
+        """
+        Insert the rest of objects and calculate fields of the loaded
+        threads and their unread messages counters.
+        """
+        self.flush()
+        thread_ids = sorted(self.thread_ids)
+        for i in range(0, len(thread_ids), self.chunk_size):
+            batch = thread_ids[i:i + self.chunk_size]
+            update_threads(batch)
+            services.recount_unread_messages_number(self.chunk_size, batch)
+        reset_sequences()
+        return self.stats
+
+
+def update_threads(thread_ids: list[int]) -> None:
+    """
+    Set `updated` and `last_message` of threads by their last messages
+    with one query.
+    """
+    messages = Message.objects.filter(thread=OuterRef('pk'))
+    messages = messages.order_by('-created', '-id')
+    Thread.objects.filter(id__in=thread_ids).update(
+        updated=Coalesce(
+            Subquery(messages.values('created')[:1]), F('created')
+        ),
+        last_message=Subquery(messages.values('id')[:1]),
+    )
+
+
+def reset_sequences() -> None:
+    """
+    Move sequences of primary keys after loaded ids, like `loaddata`.
+    """
+    sql = connection.ops.sequence_reset_sql(no_style(), MODELS)
+    if sql:
+        with connection.cursor() as cursor:
+            for statement in sql:
+                cursor.execute(statement)
+
+
+def read_records(file: IO[str]) -> Iterator[dict]:
+    """
+    Return records of JSON Lines one by one.
+
+    JSON arrays (e.g. `data.json`) are supported too,
+    but they are read to memory at once.
+    """
+    first_line = file.readline()
+    if first_line.lstrip().startswith('['):
+        yield from json.loads(first_line + file.read())
+        return
+    for line in itertools.chain([first_line], file):
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_objects(file: IO[str]) -> Iterator[LoadedObject]:
+    """
+    Return objects of serialized records with thread participants.
+    """
+    deserialized_objects = Deserializer(
+        # Any iterable is deserialized lazily, not only a list.
+        read_records(file),  # type: ignore[arg-type]
+        ignorenonexistent=True,
+    )
+    for deserialized in deserialized_objects:
+        participants = (deserialized.m2m_data or {}).get('participants')
+        yield deserialized.object, (
+            list(participants) if participants is not None else None
+        )
+
+
+def load(
+    objects: Iterable[LoadedObject], chunk_size: int = 5000
+) -> LoadStats:
+    loader = BulkLoader(chunk_size)
+    for obj, participants in objects:
+        loader.add(obj, participants)
+    return loader.finish()
+
+
+def get_next_id(model: type[models.Model]) -> int:
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+def generate_objects(
+    users: int, threads: int, messages: int, days: int = 30,
+    seed: int = None
+) -> Iterator[LoadedObject]:
+    """
+    Generate objects with a realistic distribution.
+
+    Some users have much more threads than others and some threads
+    have much more messages (Pareto distribution). Messages come
+    evenly over the last `days`, the ones older than a day are read
+    by both participants.
+    """
+    rng = random.Random(seed)
+    password = make_password(None)
+    now = timezone.now()
+    start = now - timedelta(days=days)
+
+    first_user = get_next_id(User)
+    user_ids = list(range(first_user, first_user + users))
+    for pk in user_ids:
+        yield User(
+            id=pk, username=f'user_{pk}', password=password,
+            date_joined=start,
+        ), None
+
+    popularity = [rng.paretovariate(1.5) for _ in user_ids]
+    pairs: set[tuple[int, int]] = set()
+    max_pairs = users * (users - 1) // 2
+    while len(pairs) < min(threads, max_pairs):
+        # Only one side is popular, so pairs of rare users are found too.
+        first = rng.choices(user_ids, weights=popularity)[0]
+        second = rng.choice(user_ids)
+        if first != second:
+            pairs.add((min(first, second), max(first, second)))
+    first_thread = get_next_id(Thread)
+    thread_pairs = dict(enumerate(sorted(pairs), first_thread))
+    for pk, pair in thread_pairs.items():
+        yield Thread(id=pk, created=start, updated=start), list(pair)
+
+    if not thread_pairs:
+        return
+    thread_ids = list(thread_pairs)
+    weights = [rng.paretovariate(1.2) for _ in thread_ids]
+    cum_weights = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cum_weights.append(total)
+    read_before = now - timedelta(days=1)
+    last_read: dict[int, tuple[int, datetime]] = {}
+    step = (now - start) / max(messages, 1)
+    first_message = get_next_id(Message)
+    for i in range(messages):
+        thread_id = rng.choices(thread_ids, cum_weights=cum_weights)[0]
+        created: datetime = start + step * i
+        if created < read_before:
+            last_read[thread_id] = (first_message + i, created)
+        yield Message(
+            id=first_message + i,
+            thread_id=thread_id,
+            sender_id=rng.choice(thread_pairs[thread_id]),
+            text=f'Message {i}',
+            created=created,
+        ), None
+
+    for thread_id, (message_id, created) in sorted(last_read.items()):
+        for user_id in thread_pairs[thread_id]:
+            yield ReadReceipt(
+                thread_id=thread_id, user_id=user_id,
+                last_read_id=message_id, last_read_created=created,
+            ), None
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from chats import retention
+
+
+class Command(BaseCommand):
+    help = (
+        'Archive (or delete) messages beyond the retention policy in '
+        'short batches. Can be stopped and started again at any time.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--max-age-days', type=int,
+            help='Keep messages of the last days, 0 for no limit.',
+        )
+        parser.add_argument(
+            '--max-messages', type=int,
+            help='Keep the newest messages of a thread, 0 for no limit.',
+        )
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='Delete messages instead of archiving them.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Number of messages moved per transaction.',
+        )
+        parser.add_argument(
+            '--after-thread', type=int, default=0,
+            help='Continue from the thread after this id.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        policy = retention.RetentionPolicy.from_settings(
+            max_age_days=options['max_age_days'],
+            max_messages=options['max_messages'],
+            archive=False if options['delete'] else None,
+            batch_size=options['batch_size'],
+        )
+        if not policy.is_limited:
+            raise CommandError(
+                'No retention limits, set CHATS_RETENTION or give '
+                '--max-age-days or --max-messages.'
+            )
+
+        def progress(thread_id: int, moved: int) -> None:
+            if moved:
+                self.stdout.write(f'Thread {thread_id}: {moved}')
+
+        moved = retention.apply_retention(
+            policy, options['after_thread'], progress
+        )
+        action = 'Archived' if policy.archive else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{action} {moved} messages'))
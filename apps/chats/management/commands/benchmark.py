@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from chats import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay synthetic chat traffic against the in-process application '
+        'and report latency, throughput, queries and writes of every '
+        'endpoint. Runs on a separate test database.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--threads', type=int, default=300)
+        parser.add_argument('--messages', type=int, default=10000)
+        parser.add_argument(
+            '--clients', type=int, default=8,
+            help='Number of concurrent clients.',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Number of requests of every client.',
+        )
+        parser.add_argument(
+            '--mix',
+            help='Weights of endpoints, e.g. "message_list=30,message_create=10".',
+        )
+        parser.add_argument('--seed', type=int)
+        parser.add_argument(
+            '--output', help='Path of a JSON file to save the report to.'
+        )
+
+    def handle(self, *args, **options) -> None:
+        mix = self.parse_mix(options['mix'])
+        setup_test_environment(debug=False)
+        if connection.vendor == 'sqlite':
+            # In-memory test database of SQLite locks whole tables
+            # for concurrent clients, so a file is used instead.
+            directory = tempfile.mkdtemp()
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                directory, 'benchmark.sqlite3'
+            )
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            report = benchmark.run_benchmark(
+                users=options['users'],
+                threads=options['threads'],
+                messages=options['messages'],
+                clients=options['clients'],
+                requests_per_client=options['requests'],
+                mix=mix,
+                seed=options['seed'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(f'Report is saved to {options["output"]}')
+
+    def parse_mix(self, value: str | None) -> dict[str, int] | None:
+        if not value:
+            return None
+        mix = {}
+        for item in value.split(','):
+            endpoint, _, weight = item.partition('=')
+            endpoint = endpoint.strip()
+            if endpoint not in benchmark.DEFAULT_MIX:
+                raise CommandError(f'Unknown endpoint: {endpoint}')
+            try:
+                mix[endpoint] = int(weight)
+            except ValueError:
+                raise CommandError(f'Invalid weight of {endpoint}: {weight}')
+        return mix
+
+    def print_report(self, report: dict) -> None:
+        header = (
+            f'{"endpoint":<16}{"requests":>9}{"errors":>8}{"rps":>9}'
+            f'{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}'
+            f'{"writes":>9}'
+        )
+        self.stdout.write(header)
+        for endpoint, stats in report['endpoints'].items():
+            self.stdout.write(
+                f'{endpoint:<16}{stats["requests"]:>9}{stats["errors"]:>8}'
+                f'{stats["throughput_rps"]:>9}{stats["p50_ms"]:>9}'
+                f'{stats["p95_ms"]:>9}{stats["p99_ms"]:>9}'
+                f'{stats["queries_mean"]:>9}{stats["writes_mean"]:>9}'
+            )
+        self.stdout.write(
+            f'Total: {report["requests"]} requests in {report["seconds"]} s, '
+            f'{report["throughput_rps"]} requests per second'
+        )
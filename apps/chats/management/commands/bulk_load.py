@@ -0,0 +1,62 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from chats import loader
+
+
+class Command(BaseCommand):
+    help = (
+        'Load users, threads and messages from JSON Lines '
+        '(as written by "dumpdata --format jsonl") with bulk inserts, '
+        'or generate them with --generate.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            'path', nargs='?',
+            help='Path of a JSON Lines file, "-" for stdin.',
+        )
+        parser.add_argument(
+            '--generate', action='store_true',
+            help='Generate objects instead of loading a file.',
+        )
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--threads', type=int, default=5000)
+        parser.add_argument('--messages', type=int, default=100000)
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='Period of generated messages.',
+        )
+        parser.add_argument('--seed', type=int)
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Number of objects inserted in one transaction.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options['generate'] == bool(options['path']):
+            raise CommandError('Give either a path or --generate.')
+        chunk_size = options['chunk_size']
+        if options['generate']:
+            objects = loader.generate_objects(
+                options['users'],
+                options['threads'],
+                options['messages'],
+                days=options['days'],
+                seed=options['seed'],
+            )
+            stats = loader.load(objects, chunk_size)
+        elif options['path'] == '-':
+            stats = loader.load(loader.read_objects(sys.stdin), chunk_size)
+        else:
+            with open(options['path'], encoding='utf-8') as file:
+                stats = loader.load(loader.read_objects(file), chunk_size)
+
+        for label, number in stats.created.items():
+            self.stdout.write(f'{label}: {number}')
+        if stats.skipped:
+            self.stdout.write(f'Skipped objects of other models: {stats.skipped}')
+        self.stdout.write(self.style.SUCCESS('Loaded'))
@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from chats import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Export messages of the threads (all threads by default) '
+        'as JSON Lines or CSV with constant memory use.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('thread_ids', nargs='*', type=int)
+        parser.add_argument(
+            '--format', choices=list(export.WRITERS), default='jsonl',
+        )
+        parser.add_argument(
+            '--gzip', action='store_true', help='Compress the output.',
+        )
+        parser.add_argument(
+            '--output', help='Path of a file to write to instead of stdout.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of messages fetched per query.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        chunks = export.export_messages(
+            options['format'],
+            options['thread_ids'] or None,
+            chunk_size=options['chunk_size'],
+        )
+        if options['gzip']:
+            data = export.compress(chunks)
+            if options['output']:
+                with open(options['output'], 'wb') as binary_file:
+                    binary_file.writelines(data)
+            else:
+                sys.stdout.buffer.writelines(data)
+        elif options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
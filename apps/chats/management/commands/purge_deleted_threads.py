@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from chats import purge
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete messages of deleted threads in batches and then '
+        'the threads. Finishes purges that were not done in background.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Number of messages deleted by one query.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        def progress(thread_id: int, deleted: int) -> None:
+            self.stdout.write(f'Thread {thread_id}: {deleted}')
+
+        deleted = purge.purge_deleted_threads(options['batch_size'], progress)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} messages'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from chats import services
+
+
+class Command(BaseCommand):
+    help = 'Build the full-text index of messages again.'
+
+    def handle(self, *args, **options) -> None:
+        services.rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Rebuilt the search index'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from chats import services
+
+
+class Command(BaseCommand):
+    help = 'Recalculate unread messages counters and repair the ones that drifted.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of counters written per query.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        repaired = services.recount_unread_messages_number(
+            options['batch_size']
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Repaired {repaired} unread messages counters')
+        )
@@ -0,0 +1,199 @@
+"""
+Cache of data needed to authorize thread and message requests.
+
+Ids of user threads and `(thread_id, sender_id)` of messages are
+memoized on the user object for the current request and kept in the
+shared cache for `CHATS_MEMBERSHIP_CACHE_TIMEOUT` seconds. Thread ids
+of a user are invalidated when threads are created, deleted or change
+participants; thread and sender of a message never change.
+
+Invalidation must reach all worker processes, so with a per-process
+cache (`LocMemCache`) nothing is cached between requests and every
+check is an indexed query.
+
+Functions with the `a` prefix are versions for async views.
+"""
+from typing import TYPE_CHECKING
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import BaseCache, cache
+from django.core.cache.backends.dummy import DummyCache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from . import caching
+from .models import Thread, Message
+
+if TYPE_CHECKING:
+    from django.contrib.auth.models import User
+else:
+    User = get_user_model()
+
+THREADS_KEY = 'chats:user-threads:{}'
+MESSAGE_KEY = 'chats:message:{}'
+
+_no_cache = DummyCache('chats-membership', {})
+
+
+def get_timeout() -> int:
+    return getattr(settings, 'CHATS_MEMBERSHIP_CACHE_TIMEOUT', 60)
+
+
+def get_cache() -> BaseCache:
+    """
+    Return the default cache if it is shared by all processes,
+    otherwise a cache that keeps nothing.
+    """
+    return cache if caching.is_shared_cache() else _no_cache
+
+
+def _get_memo(user: User) -> dict:
+    memo = getattr(user, '_chats_membership', None)
+    if memo is None:
+        memo = {'messages': {}}
+        setattr(user, '_chats_membership', memo)
+    return memo
+
+
+def get_user_thread_ids(user: User) -> frozenset[int]:
+    """
+    Return ids of threads the user participates in.
+    """
+    memo = _get_memo(user)
+    if 'threads' in memo:
+        return memo['threads']
+    key = THREADS_KEY.format(user.id)
+    thread_ids = get_cache().get(key)
+    if thread_ids is None:
+        participants = Thread.participants.through.objects.filter(
+            user_id=user.id
+        )
+        thread_ids = frozenset(
+            participants.values_list('thread_id', flat=True)
+        )
+        get_cache().set(key, thread_ids, get_timeout())
+    memo['threads'] = thread_ids
+    return thread_ids
+
+
+async def aget_user_thread_ids(user: User) -> frozenset[int]:
+    """
+    Version of `get_user_thread_ids()` for async views.
+    """
+    memo = _get_memo(user)
+    if 'threads' in memo:
+        return memo['threads']
+    key = THREADS_KEY.format(user.id)
+    thread_ids = await get_cache().aget(key)
+    if thread_ids is None:
+        participants = Thread.participants.through.objects.filter(
+            user_id=user.id
+        )
+        thread_ids = frozenset([
+            pk async for pk in participants.values_list('thread_id', flat=True)
+        ])
+        await get_cache().aset(key, thread_ids, get_timeout())
+    memo['threads'] = thread_ids
+    return thread_ids
+
+
+def get_cached_user_thread_ids(user: User) -> frozenset[int] | None:
+    memo = _get_memo(user)
+    if 'threads' not in memo:
+        thread_ids = get_cache().get(THREADS_KEY.format(user.id))
+        if thread_ids is None:
+            return None
+        memo['threads'] = thread_ids
+    return memo['threads']
+
+
+async def aget_cached_user_thread_ids(user: User) -> frozenset[int] | None:
+    memo = _get_memo(user)
+    if 'threads' not in memo:
+        thread_ids = await get_cache().aget(THREADS_KEY.format(user.id))
+        if thread_ids is None:
+            return None
+        memo['threads'] = thread_ids
+    return memo['threads']
+
+
+def invalidate_user_threads(user_ids: list[int]) -> None:
+    """
+    Remove cached thread ids of the users now and after commit,
+    so concurrent requests do not cache the old ones again.
+    """
+    keys = [THREADS_KEY.format(pk) for pk in user_ids]
+    if not keys:
+        return
+    get_cache().delete_many(keys)
+    transaction.on_commit(lambda: get_cache().delete_many(keys))
+
+
+def get_message_access(
+    message_pk: int, user: User
+) -> tuple[int, int, bool] | None:
+    """
+    Return thread id, sender id of a message and whether the user
+    participates in the thread, or `None` if there is no message.
+
+    Takes at most one query.
+    """
+    message_pk = int(message_pk)
+    memo = _get_memo(user)['messages']
+    if message_pk in memo:
+        return memo[message_pk]
+
+    thread_ids = get_cached_user_thread_ids(user)
+    key = MESSAGE_KEY.format(message_pk)
+    message = get_cache().get(key)
+    access: tuple[int, int, bool] | None
+    if message is not None and thread_ids is not None:
+        thread_id, sender_id = message
+        access = (thread_id, sender_id, thread_id in thread_ids)
+    else:
+        # One query for both the message and the participation.
+        participants = Thread.participants.through.objects.filter(
+            thread_id=OuterRef('thread_id'), user_id=user.id
+        )
+        messages = Message.objects.filter(id=message_pk).order_by()
+        row = messages.values_list(
+            'thread_id', 'sender_id', Exists(participants)
+        ).first()
+        access = row
+        if row is not None:
+            get_cache().set(key, row[:2], get_timeout())
+    memo[message_pk] = access
+    return access
+
+
+async def aget_message_access(
+    message_pk: int, user: User
+) -> tuple[int, int, bool] | None:
+    """
+    Version of `get_message_access()` for async views.
+    """
+    message_pk = int(message_pk)
+    memo = _get_memo(user)['messages']
+    if message_pk in memo:
+        return memo[message_pk]
+
+    thread_ids = await aget_cached_user_thread_ids(user)
+    key = MESSAGE_KEY.format(message_pk)
+    message = await get_cache().aget(key)
+    access: tuple[int, int, bool] | None
+    if message is not None and thread_ids is not None:
+        thread_id, sender_id = message
+        access = (thread_id, sender_id, thread_id in thread_ids)
+    else:
+        participants = Thread.participants.through.objects.filter(
+            thread_id=OuterRef('thread_id'), user_id=user.id
+        )
+        messages = Message.objects.filter(id=message_pk).order_by()
+        row = await messages.values_list(
+            'thread_id', 'sender_id', Exists(participants)
+        ).afirst()
+        access = row
+        if row is not None:
+            await get_cache().aset(key, row[:2], get_timeout())
+    memo[message_pk] = access
+    return access
@@ -0,0 +1,174 @@
+"""
+Per-route request metrics of the current process.
+
+`QueryRecorder` is a database execute wrapper that records queries of
+one request, `MetricsRegistry` aggregates requests by route into
+counters and latency histograms.
+"""
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from django.conf import settings
+
+# Upper bounds of latency histogram buckets in milliseconds.
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SLOW_REQUEST_MS': 500,
+    'SAMPLE_RATE': 0.0,
+}
+
+
+def get_option(name: str) -> Any:
+    options = getattr(settings, 'CHATS_METRICS', {})
+    return options.get(name, DEFAULTS[name])
+
+
+@dataclass
+class Query:
+    sql: str
+    params: str
+    seconds: float
+
+
+class QueryRecorder:
+    """
+    Records SQL and time of every query executed while installed
+    with `connection.execute_wrapper()`.
+    """
+
+    def __init__(self) -> None:
+        self.queries: list[Query] = []
+
+    def __call__(
+        self, execute: Callable, sql: str, params: Any, many: bool,
+        context: dict
+    ) -> Any:
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                Query(sql, repr(params), time.perf_counter() - start)
+            )
+
+    @property
+    def seconds(self) -> float:
+        return sum(query.seconds for query in self.queries)
+
+    @property
+    def duplicates(self) -> int:
+        """
+        Number of queries repeated with the same SQL and parameters.
+        """
+        unique = {(query.sql, query.params) for query in self.queries}
+        return len(self.queries) - len(unique)
+
+    @property
+    def similar(self) -> int:
+        """
+        Number of queries repeated with the same SQL, usually N+1.
+        """
+        return len(self.queries) - len({query.sql for query in self.queries})
+
+
+@dataclass
+class RouteMetrics:
+    requests: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    db_seconds: float = 0.0
+    queries: int = 0
+    max_queries: int = 0
+    duplicates: int = 0
+    similar: int = 0
+    histogram: list[int] = field(default_factory=lambda: [0] * len(BUCKETS))
+
+    def add(self, seconds: float, recorder: QueryRecorder, status: int) -> None:
+        self.requests += 1
+        self.errors += status >= 500
+        self.seconds += seconds
+        self.db_seconds += recorder.seconds
+        self.queries += len(recorder.queries)
+        self.max_queries = max(self.max_queries, len(recorder.queries))
+        self.duplicates += recorder.duplicates
+        self.similar += recorder.similar
+        milliseconds = seconds * 1000
+        for i, bound in enumerate(BUCKETS):
+            if milliseconds <= bound:
+                self.histogram[i] += 1
+                break
+
+    def get_percentile(self, percent: float) -> float:
+        """
+        Return upper bound of the bucket that has the percentile.
+        """
+        rank = percent / 100 * self.requests
+        total = 0
+        for bound, number in zip(BUCKETS, self.histogram):
+            total += number
+            if number and total >= rank:
+                return bound
+        return 0
+
+    def as_dict(self) -> dict:
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'mean_ms': round(self.seconds / requests * 1000, 3),
+            'db_mean_ms': round(self.db_seconds / requests * 1000, 3),
+            'p50_ms': self.get_percentile(50),
+            'p95_ms': self.get_percentile(95),
+            'p99_ms': self.get_percentile(99),
+            'queries_mean': round(self.queries / requests, 2),
+            'queries_max': self.max_queries,
+            'duplicate_queries': self.duplicates,
+            'similar_queries': self.similar,
+            'histogram': {
+                str(bound): number
+                for bound, number in zip(BUCKETS, self.histogram)
+            },
+        }
+
+
+class MetricsRegistry:
+
+    def __init__(self) -> None:
+        self.routes: dict[str, RouteMetrics] = {}
+        self.lock = threading.Lock()
+
+    def add(
+        self, route: str, seconds: float, recorder: QueryRecorder, status: int
+    ) -> None:
+        with self.lock:
+            metrics = self.routes.setdefault(route, RouteMetrics())
+            metrics.add(seconds, recorder, status)
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {
+                route: metrics.as_dict()
+                for route, metrics in sorted(self.routes.items())
+            }
+
+    def reset(self) -> None:
+        with self.lock:
+            self.routes.clear()
+
+
+registry = MetricsRegistry()
+
+
+def format_trace(recorder: QueryRecorder) -> str:
+    counts = Counter(query.sql for query in recorder.queries)
+    return '\n'.join(
+        f'{query.seconds * 1000:8.3f} ms'
+        f'{" x" + str(counts[query.sql]) if counts[query.sql] > 1 else "":>6}'
+        f'  {query.sql}'
+        for query in recorder.queries
+    )
@@ -0,0 +1,122 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+from typing import Awaitable, Callable
+
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async
+)
+
+from django.db import connections
+from django.http import HttpRequest
+from django.http.response import HttpResponseBase
+
+from . import metrics
+
+logger = logging.getLogger('chats.metrics')
+
+
+class QueryMetricsMiddleware:
+    """
+    Records wall time, DB time and queries of every request by route.
+
+    Requests slower than `SLOW_REQUEST_MS` and a `SAMPLE_RATE` share of
+    the others are logged with their queries. SQL is logged without
+    parameters, so messages do not get into logs.
+
+    Streaming responses and views with false `record_metrics` (long
+    polls, which wait for events by design) are not recorded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(
+        self, request: HttpRequest
+    ) -> HttpResponseBase | Awaitable[HttpResponseBase]:
+        if self.is_async:
+            return self.__acall__(request)
+        if not metrics.get_option('ENABLED'):
+            return self.get_response(request)
+
+        recorder = metrics.QueryRecorder()
+        with self.record_queries(recorder):
+            start = time.perf_counter()
+            response = self.get_response(request)
+            seconds = time.perf_counter() - start
+        self.report(request, response, seconds, recorder)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        if not metrics.get_option('ENABLED'):
+            return await self.get_response(request)
+
+        recorder = metrics.QueryRecorder()
+        # Queries of async views are run by `sync_to_async()` in one
+        # thread per request, which has its own connections.
+        stack = await sync_to_async(self.record_queries)(recorder)
+        try:
+            start = time.perf_counter()
+            response = await self.get_response(request)
+            seconds = time.perf_counter() - start
+        finally:
+            await sync_to_async(stack.close)()
+        self.report(request, response, seconds, recorder)
+        return response
+
+    def record_queries(self, recorder: metrics.QueryRecorder) -> ExitStack:
+        """
+        Add the recorder to all connections of the current thread
+        until the returned stack is closed.
+        """
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def report(
+        self,
+        request: HttpRequest,
+        response: HttpResponseBase,
+        seconds: float,
+        recorder: metrics.QueryRecorder,
+    ) -> None:
+        if not self.is_recorded(request, response):
+            return
+        route = self.get_route(request)
+        metrics.registry.add(route, seconds, recorder, response.status_code)
+        slow = seconds * 1000 >= metrics.get_option('SLOW_REQUEST_MS')
+        if slow or random.random() < metrics.get_option('SAMPLE_RATE'):
+            logger.warning(
+                '%s request %s took %.1f ms, %d queries (%.1f ms, '
+                '%d duplicate, %d similar):\n%s',
+                'Slow' if slow else 'Sampled',
+                route,
+                seconds * 1000,
+                len(recorder.queries),
+                recorder.seconds * 1000,
+                recorder.duplicates,
+                recorder.similar,
+                metrics.format_trace(recorder),
+            )
+
+    def get_route(self, request: HttpRequest) -> str:
+        match = request.resolver_match
+        route = match.route if match is not None else '<unresolved>'
+        return f'{request.method} {route}'
+
+    def is_recorded(
+        self, request: HttpRequest, response: HttpResponseBase
+    ) -> bool:
+        if response.streaming:
+            return False
+        match = request.resolver_match
+        view = getattr(match.func, 'view_class', None) if match else None
+        return getattr(view, 'record_metrics', True)
@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+def fill_participants_key(apps, schema_editor):
+    """
+    Set `participants_key` for existing threads with 2 participants.
+
+    If several threads have the same participants,
+    only the oldest one gets the key.
+    """
+    Thread = apps.get_model('chats', 'Thread')
+    through = Thread.participants.through
+    participants: dict[int, list[int]] = {}
+    rows = through.objects.values_list('thread_id', 'user_id').iterator()
+    for thread_id, user_id in rows:
+        participants.setdefault(thread_id, []).append(user_id)
+
+    used_keys = set()
+    threads = []
+    for thread in Thread.objects.order_by('id').only('id').iterator():
+        ids = participants.get(thread.id, [])
+        if len(ids) != 2:
+            continue
+        key = ':'.join(str(pk) for pk in sorted(ids))
+        if key in used_keys:
+            continue
+        used_keys.add(key)
+        thread.participants_key = key
+        threads.append(thread)
+    Thread.objects.bulk_update(threads, ['participants_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0003_alter_thread_participants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='participants_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, verbose_name='Sorted ids of thread participants'),
+        ),
+        migrations.RunPython(
+            fill_participants_key, migrations.RunPython.noop
+        ),
+        migrations.AlterField(
+            model_name='thread',
+            name='participants_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='Sorted ids of thread participants'),
+        ),
+    ]
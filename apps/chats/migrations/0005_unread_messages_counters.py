@@ -0,0 +1,77 @@
+# Generated by Django 4.2 on 2026-10-18 18:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    """
+    Count unread messages of existing threads.
+
+    `manage.py recount_unread_messages` does the same on a live database.
+    """
+    Thread = apps.get_model('chats', 'Thread')
+    UnreadMessagesCounter = apps.get_model('chats', 'UnreadMessagesCounter')
+    ThreadUnreadMessagesCounter = apps.get_model(
+        'chats', 'ThreadUnreadMessagesCounter'
+    )
+    unread = models.Q(thread__messages__is_read=False) & ~models.Q(
+        thread__messages__sender=models.F('user_id')
+    )
+    rows = Thread.participants.through.objects.values('user_id', 'thread_id')
+    rows = rows.annotate(number=models.Count('thread__messages', filter=unread))
+    counters = []
+    totals: dict[int, int] = {}
+    for row in rows.iterator():
+        if not row['number']:
+            continue
+        counters.append(ThreadUnreadMessagesCounter(**row))
+        totals[row['user_id']] = totals.get(row['user_id'], 0) + row['number']
+    ThreadUnreadMessagesCounter.objects.bulk_create(counters, batch_size=1000)
+    UnreadMessagesCounter.objects.bulk_create(
+        [
+            UnreadMessagesCounter(user_id=user_id, number=number)
+            for user_id, number in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chats', '0004_thread_participants_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadMessagesCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_messages_counter', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Owner of a counter')),
+                ('number', models.PositiveIntegerField(default=0, verbose_name='Number of unread messages')),
+            ],
+            options={
+                'db_table': 'unread_messages_counter',
+            },
+        ),
+        migrations.CreateModel(
+            name='ThreadUnreadMessagesCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(default=0, verbose_name='Number of unread messages')),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unread_messages_counters', to='chats.thread', verbose_name='Thread with unread messages')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thread_unread_messages_counters', to=settings.AUTH_USER_MODEL, verbose_name='Owner of a counter')),
+            ],
+            options={
+                'db_table': 'thread_unread_messages_counter',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='threadunreadmessagescounter',
+            constraint=models.UniqueConstraint(fields=('user', 'thread'), name='unique_thread_unread_counter'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 18:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_last_message(apps, schema_editor):
+    Thread = apps.get_model('chats', 'Thread')
+    Message = apps.get_model('chats', 'Message')
+    messages = Message.objects.filter(thread=models.OuterRef('pk'))
+    messages = messages.order_by('-created', '-id').values('id')[:1]
+    Thread.objects.update(last_message=models.Subquery(messages))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0006_chats_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='last_message',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chats.message', verbose_name='Last message of a thread'),
+        ),
+        migrations.RunPython(fill_last_message, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2 on 2026-10-18 19:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chats', '0007_thread_last_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('message.created', 'Message is created'), ('messages.read', 'Messages are read'), ('thread.created', 'Thread is created'), ('thread.deleted', 'Thread is deleted'), ('participants.added', 'Participants are added'), ('participants.removed', 'Participants are removed')], max_length=32, verbose_name='Type of a change')),
+                ('thread_id', models.BigIntegerField(verbose_name='Id of a changed thread')),
+                ('object_id', models.BigIntegerField(null=True, verbose_name='Id of a changed object')),
+                ('data', models.JSONField(default=dict, verbose_name='Details of a change')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Change date and time')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='changes', to=settings.AUTH_USER_MODEL, verbose_name='User that sees a change')),
+            ],
+            options={
+                'db_table': 'change',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user', 'id'], name='change_user_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2 on 2026-10-18 20:10
+
+from django.db import migrations
+
+# FTS5 index of message texts with triggers that keep it in sync
+# with the `message` table, including bulk inserts and cascade deletes.
+CREATE_SQL = [
+    '''
+    CREATE VIRTUAL TABLE message_search USING fts5(
+        text, content='message', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TRIGGER message_search_insert AFTER INSERT ON message BEGIN
+        INSERT INTO message_search(rowid, text) VALUES (new.id, new.text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER message_search_delete AFTER DELETE ON message BEGIN
+        INSERT INTO message_search(message_search, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER message_search_update AFTER UPDATE OF text ON message
+    WHEN old.text IS NOT new.text BEGIN
+        INSERT INTO message_search(message_search, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO message_search(rowid, text) VALUES (new.id, new.text);
+    END
+    ''',
+    "INSERT INTO message_search(message_search) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS message_search_update',
+    'DROP TRIGGER IF EXISTS message_search_delete',
+    'DROP TRIGGER IF EXISTS message_search_insert',
+    'DROP TABLE IF EXISTS message_search',
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0008_change_log'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-18 19:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chats', '0009_message_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField(max_length=4096, verbose_name='Message text')),
+                ('created', models.DateTimeField(verbose_name='Message creation date and time')),
+                ('is_read', models.BooleanField(default=True, verbose_name='Message is read by all participants of a thread')),
+                ('sender', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='User that sent this message')),
+                ('thread', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='chats.thread', verbose_name='Thread a message belongs to')),
+            ],
+            options={
+                'db_table': 'archived_message',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedmessage',
+            index=models.Index(fields=['thread', 'created', 'id'], name='archived_thread_created_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0010_archived_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='deleted',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Thread deletion date and time'),
+        ),
+        migrations.AddIndex(
+            model_name='thread',
+            index=models.Index(condition=models.Q(('deleted__isnull', False)), fields=['deleted'], name='thread_deleted_idx'),
+        ),
+    ]
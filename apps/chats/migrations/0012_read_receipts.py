@@ -0,0 +1,113 @@
+# Generated by Django 4.2 on 2026-10-18 19:56
+
+from typing import Iterator
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_read_receipts(apps, schema_editor):
+    """
+    Point receipts of participants at the newest message sent to them
+    that is read, or at the newest archived message, which are read.
+    """
+    Thread = apps.get_model('chats', 'Thread')
+    Message = apps.get_model('chats', 'Message')
+    ArchivedMessage = apps.get_model('chats', 'ArchivedMessage')
+    ReadReceipt = apps.get_model('chats', 'ReadReceipt')
+    read = Message.objects.filter(
+        thread_id=models.OuterRef('thread_id'), is_read=True
+    ).exclude(sender_id=models.OuterRef('user_id'))
+    read = read.order_by('-created', '-id')
+    archived = ArchivedMessage.objects.filter(
+        thread_id=models.OuterRef('thread_id')
+    ).order_by('-created', '-id')
+    rows = Thread.participants.through.objects.annotate(
+        read_created=models.Subquery(read.values('created')[:1]),
+        read_id=models.Subquery(read.values('id')[:1]),
+        archived_created=models.Subquery(archived.values('created')[:1]),
+        archived_id=models.Subquery(archived.values('id')[:1]),
+    ).values_list(
+        'thread_id', 'user_id',
+        'read_created', 'read_id', 'archived_created', 'archived_id',
+    )
+
+    def build_receipts() -> Iterator[models.Model]:
+        for thread_id, user_id, *positions in rows.iterator():
+            found = [
+                (created, pk)
+                for created, pk in (positions[:2], positions[2:])
+                if pk is not None
+            ]
+            if found:
+                created, pk = max(found)
+                yield ReadReceipt(
+                    thread_id=thread_id, user_id=user_id,
+                    last_read_id=pk, last_read_created=created,
+                )
+
+    ReadReceipt.objects.bulk_create(build_receipts(), batch_size=1000)
+
+
+def fill_is_read(apps, schema_editor):
+    Message = apps.get_model('chats', 'Message')
+    ReadReceipt = apps.get_model('chats', 'ReadReceipt')
+    for receipt in ReadReceipt.objects.iterator():
+        Message.objects.filter(
+            models.Q(created__lt=receipt.last_read_created)
+            | models.Q(
+                created=receipt.last_read_created,
+                id__lte=receipt.last_read_id,
+            ),
+            thread_id=receipt.thread_id,
+        ).exclude(sender_id=receipt.user_id).update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chats', '0011_thread_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_id', models.BigIntegerField(verbose_name='Id of the last read message')),
+                ('last_read_created', models.DateTimeField(verbose_name='Creation date and time of the last read message')),
+            ],
+            options={
+                'db_table': 'read_receipt',
+            },
+        ),
+        migrations.AddField(
+            model_name='readreceipt',
+            name='thread',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_receipts', to='chats.thread', verbose_name='Read thread'),
+        ),
+        migrations.AddField(
+            model_name='readreceipt',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_receipts', to=settings.AUTH_USER_MODEL, verbose_name='Reader of a thread'),
+        ),
+        migrations.AddConstraint(
+            model_name='readreceipt',
+            constraint=models.UniqueConstraint(fields=('thread', 'user'), name='unique_read_receipt'),
+        ),
+        migrations.RunPython(fill_read_receipts, fill_is_read),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_unread_idx',
+        ),
+        migrations.RemoveField(
+            model_name='archivedmessage',
+            name='is_read',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
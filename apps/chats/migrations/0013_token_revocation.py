@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 20:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('chats', '0012_read_receipts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRevocation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='token_revocation', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Owner of revoked tokens')),
+                ('valid_after', models.DateTimeField(verbose_name='Tokens are valid if issued after')),
+            ],
+            options={
+                'db_table': 'token_revocation',
+            },
+        ),
+    ]
@@ -6,7 +6,8 @@ class Thread(models.Model):
     """
     Represents a chat with messages.
 
-    Can contain only 2 participants.
+    Can contain only 2 participants. A deleted thread has no
+    participants and `deleted` date until it is purged.
     """
 
     participants = models.ManyToManyField(
@@ -20,9 +21,55 @@ class Thread(models.Model):
     updated = models.DateTimeField(
         'Thread last update date and time', auto_now_add=True
     )
+    participants_key = models.CharField(
+        'Sorted ids of thread participants',
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Last message of a thread',
+    )
+    deleted = models.DateTimeField(
+        'Thread deletion date and time',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    # Set on threads of `services.get_user_threads_with_preview()`.
+    unread_number: int
 
     class Meta:
         db_table = 'thread'
+        indexes = [
+            models.Index(
+                fields=('updated', 'id'), name='thread_updated_idx'
+            ),
+            models.Index(
+                fields=('deleted',),
+                condition=models.Q(deleted__isnull=False),
+                name='thread_deleted_idx',
+            ),
+        ]
+
+    @staticmethod
+    def make_participants_key(participants: list[int]) -> str:
+        """
+        Build canonical key of a thread by ids of its participants.
+
+        The key does not depend on the order of ids, so
+        `[1, 2]` and `[2, 1]` give the same thread.
+        """
+        return ':'.join(str(pk) for pk in sorted(int(pk) for pk in participants))
 
     def __str__(self) -> str:
         return f'Thread: {self.id}'
@@ -49,13 +96,227 @@ class Message(models.Model):
     created = models.DateTimeField(
         'Message creation date and time', auto_now_add=True
     )
-    is_read = models.BooleanField(
-        'Message is read by all participants of a thread', default=False
-    )
+
+    # Set on messages found by `services.search_messages()`.
+    rank: float
+    highlight: str
 
     class Meta:
         db_table = 'message'
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=('thread', 'created', 'id'),
+                name='message_thread_created_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'Sent by {self.sender}'
+
+
+class ArchivedMessage(models.Model):
+    """
+    Message moved out of the `message` table by the retention job.
+
+    Keeps the id of the original message. Has no foreign key constraints
+    and no indexes besides the one for paging, so the table stays
+    compact; archived messages are deleted with their thread by Django.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    sender = models.ForeignKey(
+        AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='User that sent this message',
+        db_constraint=False,
+        db_index=False,
+    )
+    text = models.TextField('Message text', max_length=4096)
+    thread = models.ForeignKey(
+        Thread,
+        on_delete=models.CASCADE,
+        related_name='archived_messages',
+        verbose_name='Thread a message belongs to',
+        db_constraint=False,
+        db_index=False,
+    )
+    created = models.DateTimeField('Message creation date and time')
+
+    class Meta:
+        db_table = 'archived_message'
+        indexes = [
+            models.Index(
+                fields=('thread', 'created', 'id'),
+                name='archived_thread_created_idx',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'Sent by {self.sender}'
+
+
+class ReadReceipt(models.Model):
+    """
+    The last message of a thread read by a user.
+
+    All messages of the thread up to it by `(created, id)` are read
+    by the user, so reading any number of messages updates one row.
+    A user without a receipt has read nothing in the thread.
+    """
+
+    user = models.ForeignKey(
+        AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='read_receipts',
+        verbose_name='Reader of a thread',
+    )
+    thread = models.ForeignKey(
+        Thread,
+        on_delete=models.CASCADE,
+        related_name='read_receipts',
+        verbose_name='Read thread',
+    )
+    # Not a foreign key: the message may be archived or purged.
+    last_read_id = models.BigIntegerField('Id of the last read message')
+    last_read_created = models.DateTimeField(
+        'Creation date and time of the last read message'
+    )
+
+    class Meta:
+        db_table = 'read_receipt'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('thread', 'user'), name='unique_read_receipt'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'Read by {self.user_id} in {self.thread_id}'
+
+
+class UnreadMessagesCounter(models.Model):
+    """
+    Number of unread messages in all threads of a user.
+
+    Is kept in sync with `Message` objects,
+    so getting the number is a single row read.
+    """
+
+    user = models.OneToOneField(
+        AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_messages_counter',
+        verbose_name='Owner of a counter',
+    )
+    number = models.PositiveIntegerField('Number of unread messages', default=0)
+
+    class Meta:
+        db_table = 'unread_messages_counter'
+
+    def __str__(self) -> str:
+        return f'Unread by {self.user_id}: {self.number}'
+
+
+class ThreadUnreadMessagesCounter(models.Model):
+    """
+    Number of unread messages of a user in one thread.
+    """
+
+    user = models.ForeignKey(
+        AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='thread_unread_messages_counters',
+        verbose_name='Owner of a counter',
+    )
+    thread = models.ForeignKey(
+        Thread,
+        on_delete=models.CASCADE,
+        related_name='unread_messages_counters',
+        verbose_name='Thread with unread messages',
+    )
+    number = models.PositiveIntegerField('Number of unread messages', default=0)
+
+    class Meta:
+        db_table = 'thread_unread_messages_counter'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'thread'), name='unique_thread_unread_counter'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'Unread by {self.user_id} in {self.thread_id}: {self.number}'
+
+
+class Change(models.Model):
+    """
+    Change of a thread visible to a user.
+
+    Every change is stored once per participant, so changes of deleted
+    threads and threads the user left are still found by the user.
+    `id` is the monotonic sync token.
+    """
+
+    MESSAGE_CREATED = 'message.created'
+    MESSAGES_READ = 'messages.read'
+    THREAD_CREATED = 'thread.created'
+    THREAD_DELETED = 'thread.deleted'
+    PARTICIPANTS_ADDED = 'participants.added'
+    PARTICIPANTS_REMOVED = 'participants.removed'
+    TYPES = (
+        (MESSAGE_CREATED, 'Message is created'),
+        (MESSAGES_READ, 'Messages are read'),
+        (THREAD_CREATED, 'Thread is created'),
+        (THREAD_DELETED, 'Thread is deleted'),
+        (PARTICIPANTS_ADDED, 'Participants are added'),
+        (PARTICIPANTS_REMOVED, 'Participants are removed'),
+    )
+
+    user = models.ForeignKey(
+        AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='changes',
+        verbose_name='User that sees a change',
+        db_index=False,
+    )
+    type = models.CharField('Type of a change', max_length=32, choices=TYPES)
+    thread_id = models.BigIntegerField('Id of a changed thread')
+    object_id = models.BigIntegerField('Id of a changed object', null=True)
+    data = models.JSONField('Details of a change', default=dict)
+    created = models.DateTimeField(
+        'Change date and time', auto_now_add=True
+    )
+
+    class Meta:
+        db_table = 'change'
+        indexes = [
+            models.Index(fields=('user', 'id'), name='change_user_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.type} in {self.thread_id}'
+
+
+class TokenRevocation(models.Model):
+    """
+    Time before which access tokens of a user are revoked,
+    e.g. by a password change.
+    """
+
+    user = models.OneToOneField(
+        AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='token_revocation',
+        verbose_name='Owner of revoked tokens',
+    )
+    valid_after = models.DateTimeField('Tokens are valid if issued after')
+
+    class Meta:
+        db_table = 'token_revocation'
+
+    def __str__(self) -> str:
+        return f'Tokens of {self.user_id} valid after {self.valid_after}'
@@ -0,0 +1,259 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import APIView
+
+from django.db.models import Model, Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.views import View
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with an additional keyset (cursor) mode.
+
+    Keyset mode is used when `before` or `after` parameter is given:
+
+    ?before=<cursor>&limit=100 - objects older than the cursor
+    ?after=<cursor>&limit=100 - objects newer than the cursor
+
+    Empty `before` returns the newest objects, empty `after`
+    returns the oldest ones. Objects are always returned from newer
+    to older ones and no total count is calculated, so every page costs
+    a single indexed range query.
+
+    If the view has `get_archive_queryset()`, pages continue to its
+    objects that are older than all objects of the view queryset.
+    """
+
+    keyset_fields: tuple[str, str] = ('created', 'id')
+    before_query_param = 'before'
+    after_query_param = 'after'
+    keyset_default_limit = 100
+    keyset_max_limit = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request,
+        view: APIView | None = None,
+    ) -> list | None:
+        if not self.init_keyset(request):
+            return super().paginate_queryset(queryset, request, view)
+        querysets = self.get_keyset_querysets(queryset, view)
+        page: list[Model] = []
+        for queryset in querysets:
+            queryset = self.filter_keyset(queryset, page)
+            page += queryset[:self.keyset_limit + 1 - len(page)]
+            if len(page) > self.keyset_limit:
+                break
+        return self.set_keyset_page(page)
+
+    async def apaginate_queryset(
+        self, queryset: QuerySet, request: Request, view: View | None = None
+    ) -> list | None:
+        """
+        Version of `paginate_queryset()` for async views.
+        """
+        if not self.init_keyset(request):
+            return await self.apaginate_limit_offset(queryset, request)
+        querysets = self.get_keyset_querysets(queryset, view)
+        page: list[Model] = []
+        for queryset in querysets:
+            queryset = self.filter_keyset(queryset, page)
+            page += [
+                obj async for obj in queryset[
+                    :self.keyset_limit + 1 - len(page)
+                ]
+            ]
+            if len(page) > self.keyset_limit:
+                break
+        return self.set_keyset_page(page)
+
+    async def apaginate_limit_offset(
+        self, queryset: QuerySet, request: Request
+    ) -> list | None:
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        if self.count == 0 or self.offset > self.count:
+            return []
+        queryset = queryset[self.offset:self.offset + self.limit]
+        return [obj async for obj in queryset]
+
+    def init_keyset(self, request: Request) -> bool:
+        """
+        Read keyset parameters of the request.
+        Return whether keyset mode is used.
+        """
+        params = request.query_params
+        if self.before_query_param in params:
+            self.is_older = True
+            cursor = params[self.before_query_param]
+        elif self.after_query_param in params:
+            self.is_older = False
+            cursor = params[self.after_query_param]
+        else:
+            self.keyset = False
+            return False
+
+        self.keyset = True
+        self.url = request.build_absolute_uri()
+        self.keyset_limit = self.get_keyset_limit(request)
+        self.limit = self.keyset_limit
+        self.cursor = self.decode_cursor(cursor) if cursor else None
+        return True
+
+    def get_keyset_querysets(
+        self, queryset: QuerySet, view: APIView | View | None = None
+    ) -> list[QuerySet]:
+        """
+        Return querysets a page is taken from in order, so a page
+        can cross the boundary between them.
+        """
+        querysets = [queryset]
+        archive = self.get_archive_queryset(view)
+        if archive is not None:
+            querysets.append(archive)
+        if not self.is_older:
+            querysets.reverse()
+        return querysets
+
+    def get_archive_queryset(
+        self, view: APIView | View | None = None
+    ) -> QuerySet | None:
+        """
+        Return queryset of objects older than all objects of the main
+        queryset from `get_archive_queryset()` of the view if it has one.
+        """
+        get_archive_queryset = getattr(view, 'get_archive_queryset', None)
+        return get_archive_queryset() if get_archive_queryset else None
+
+    def filter_keyset(self, queryset: QuerySet, page: list[Model]) -> QuerySet:
+        """
+        Return ordered objects of the queryset after the last object
+        of the page or after the cursor if the page is empty.
+        """
+        time_field, id_field = self.keyset_fields
+        if self.is_older:
+            ordering = (f'-{time_field}', f'-{id_field}')
+            lookup = 'lt'
+        else:
+            ordering = (time_field, id_field)
+            lookup = 'gt'
+        queryset = queryset.order_by(*ordering)
+        cursor = self.cursor
+        if page:
+            cursor = (
+                getattr(page[-1], time_field), getattr(page[-1], id_field)
+            )
+        if cursor is not None:
+            time, pk = cursor
+            queryset = queryset.filter(
+                Q(**{f'{time_field}__{lookup}': time})
+                | Q(**{time_field: time, f'{id_field}__{lookup}': pk})
+            )
+        return queryset
+
+    def set_keyset_page(self, page: list[Model]) -> list[Model]:
+        """
+        Keep up to `limit` objects of up to `limit + 1` fetched ones
+        in order from newer to older ones.
+        """
+        self.has_more = len(page) > self.keyset_limit
+        page = page[:self.keyset_limit]
+        if not self.is_older:
+            page.reverse()
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data: Any) -> Response:
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_keyset_limit(self, request: Request) -> int:
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.keyset_default_limit
+        if limit <= 0:
+            return self.keyset_default_limit
+        return min(limit, self.keyset_max_limit)
+
+    def get_next_link(self) -> str | None:
+        """
+        Return link to older objects.
+        """
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.page or (self.is_older and not self.has_more):
+            return None
+        return self.build_link(self.before_query_param, self.page[-1])
+
+    def get_previous_link(self) -> str | None:
+        """
+        Return link to newer objects.
+
+        Is kept on the last page of newer objects
+        so clients can poll it for new ones.
+        """
+        if not self.keyset:
+            return super().get_previous_link()
+        if self.page:
+            return self.build_link(self.after_query_param, self.page[0])
+        if not self.is_older and self.cursor is not None:
+            return replace_query_param(
+                self.url, self.limit_query_param, self.keyset_limit
+            )
+        return None
+
+    def build_link(self, param: str, obj: Model) -> str:
+        url = replace_query_param(
+            self.url, self.limit_query_param, self.keyset_limit
+        )
+        url = remove_query_param(url, self.offset_query_param)
+        url = remove_query_param(url, self.before_query_param)
+        url = remove_query_param(url, self.after_query_param)
+        return replace_query_param(url, param, self.encode_cursor(obj))
+
+    def encode_cursor(self, obj: Model) -> str:
+        time_field, id_field = self.keyset_fields
+        position = [getattr(obj, time_field).isoformat(), getattr(obj, id_field)]
+        data = json.dumps(position, separators=(',', ':')).encode()
+        return urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> tuple[datetime, int]:
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            data = urlsafe_b64decode(cursor + padding)
+            time, pk = json.loads(data)
+            parsed_time = parse_datetime(time)
+            if parsed_time is None:
+                raise ValueError(time)
+            return parsed_time, int(pk)
+        except (BinasciiError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class MessagePagination(KeysetPagination):
+    keyset_fields = ('created', 'id')
+
+
+class ThreadPagination(KeysetPagination):
+    keyset_fields = ('updated', 'id')
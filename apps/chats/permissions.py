@@ -2,37 +2,64 @@ from rest_framework.permissions import BasePermission
 from rest_framework.request import Request
 from rest_framework.views import APIView
 
+from django.views import View
+
 from . import services
+from .authentication import get_request_user
+
+
+class AsyncPermission(BasePermission):
+    """
+    Permission that async views check with `ahas_permission()`.
+    """
+
+    async def ahas_permission(self, request: Request, view: View) -> bool:
+        return True
 
 
-class IsThreadParticipant(BasePermission):
+class IsThreadParticipant(AsyncPermission):
     """
     Allows access only to participant users.
     """
 
     def has_permission(self, request: Request, view: APIView) -> bool:
         pk = view.kwargs['pk']
-        user = request.user
+        user = get_request_user(request)
         return services.check_user_have_thread(pk, user)
 
+    async def ahas_permission(self, request: Request, view: View) -> bool:
+        pk = view.kwargs['pk']
+        user = get_request_user(request)
+        return await services.acheck_user_have_thread(pk, user)
+
 
-class IsThreadMessageParticipant(BasePermission):
+class IsThreadMessageParticipant(AsyncPermission):
     """
     Allows access only to participant of a thread that has the message.
     """
 
     def has_permission(self, request: Request, view: APIView) -> bool:
         pk = view.kwargs['pk']
-        user = request.user
+        user = get_request_user(request)
         return services.check_user_have_message(pk, user)
 
+    async def ahas_permission(self, request: Request, view: View) -> bool:
+        pk = view.kwargs['pk']
+        user = get_request_user(request)
+        return await services.acheck_user_have_message(pk, user)
+
 
-class IsNotSender(BasePermission):
+class IsNotSender(AsyncPermission):
     """
     Allows access only to user that is not sender of the message.
     """
 
     def has_permission(self, request: Request, view: APIView) -> bool:
         pk = view.kwargs['pk']
-        user = request.user
+        user = get_request_user(request)
         return not services.is_user_sender(pk, user)
+
+    async def ahas_permission(self, request: Request, view: View) -> bool:
+        pk = view.kwargs['pk']
+        user = get_request_user(request)
+        return not await services.ais_user_sender(pk, user)
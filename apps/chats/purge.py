@@ -0,0 +1,143 @@
+"""
+Purge of deleted threads.
+
+`services.delete_thread()` only hides a thread from its participants.
+Its messages are deleted here by batches of raw `DELETE` queries,
+without loading them to memory as the cascade collector of
+`Thread.delete()` does, and then the empty thread is deleted.
+
+Threads are purged by a background thread of the process after
+the deletion is committed (if `CHATS_THREAD_PURGE['BACKGROUND']` is
+true) and by `purge_deleted_threads` command, which also finishes
+purges interrupted by restarts.
+"""
+import logging
+import queue
+import threading
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+from django.db.models import QuerySet
+
+from . import database
+from .models import ArchivedMessage, Thread, Message
+
+logger = logging.getLogger('chats.purge')
+
+DEFAULTS = {
+    'BACKGROUND': False,
+    'BATCH_SIZE': 1000,
+}
+
+
+def get_option(name: str) -> Any:
+    options = getattr(settings, 'CHATS_THREAD_PURGE', {})
+    return options.get(name, DEFAULTS[name])
+
+
+def delete_in_batches(queryset: QuerySet, batch_size: int) -> int:
+    """
+    Delete objects of the queryset by batches without signals and
+    cascades. Return number of deleted objects.
+    """
+    queryset = queryset.order_by()
+    db_connection = connections[queryset.db]
+    opts = queryset.model._meta
+    sql = 'DELETE FROM {} WHERE {} IN ({{}})'.format(
+        db_connection.ops.quote_name(opts.db_table),
+        db_connection.ops.quote_name(opts.pk.column),
+    )
+    deleted = 0
+    while True:
+        with database.atomic_immediate(queryset.db):
+            ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            with db_connection.cursor() as cursor:
+                cursor.execute(sql.format(', '.join(['%s'] * len(ids))), ids)
+                deleted += cursor.rowcount
+
+
+def purge_thread(thread_id: int, batch_size: int = None) -> int:
+    """
+    Delete messages of a deleted thread and the thread itself.
+    Return number of deleted messages.
+    """
+    batch_size = batch_size or get_option('BATCH_SIZE')
+    threads = Thread.objects.filter(id=thread_id, deleted__isnull=False)
+    # The last message is referenced by the thread.
+    if not threads.update(last_message=None):
+        return 0
+    deleted = delete_in_batches(
+        Message.objects.filter(thread_id=thread_id), batch_size
+    )
+    delete_in_batches(
+        ArchivedMessage.objects.filter(thread_id=thread_id), batch_size
+    )
+    threads.delete()
+    return deleted
+
+
+def purge_deleted_threads(
+    batch_size: int = None, progress: Callable[[int, int], None] = None
+) -> int:
+    """
+    Purge all deleted threads.
+
+    `progress` is called with id of every purged thread and number
+    of its deleted messages. Return number of deleted messages.
+    """
+    threads = Thread.objects.filter(deleted__isnull=False).order_by('id')
+    total = 0
+    for thread_id in list(threads.values_list('id', flat=True)):
+        deleted = purge_thread(thread_id, batch_size)
+        total += deleted
+        if progress is not None:
+            progress(thread_id, deleted)
+    return total
+
+
+class PurgeWorker:
+    """
+    Purges threads from a queue one by one in a daemon thread,
+    which is started with the first scheduled thread.
+    """
+
+    def __init__(self) -> None:
+        self.queue: queue.Queue[int] = queue.Queue()
+        self.thread: threading.Thread | None = None
+        self.lock = threading.Lock()
+
+    def schedule(self, thread_id: int) -> None:
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='chats-purge', daemon=True
+                )
+                self.thread.start()
+        self.queue.put(thread_id)
+
+    def run(self) -> None:
+        while True:
+            thread_id = self.queue.get()
+            close_old_connections()
+            try:
+                purge_thread(thread_id)
+            except Exception:
+                # The thread stays deleted and is purged by the command.
+                logger.exception('Purge of thread %s failed', thread_id)
+            finally:
+                connection.close()
+                self.queue.task_done()
+
+
+_worker = PurgeWorker()
+
+
+def schedule_purge(thread_id: int) -> None:
+    """
+    Purge the thread in background if it is enabled.
+    """
+    if get_option('BACKGROUND'):
+        _worker.schedule(thread_id)
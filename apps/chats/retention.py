@@ -0,0 +1,185 @@
+"""
+Retention of messages.
+
+Messages older than `MAX_AGE_DAYS` or beyond the newest
+`MAX_MESSAGES_PER_THREAD` of a thread are moved to the compact
+`archived_message` table (or deleted if `ARCHIVE` is false) in batches
+of `BATCH_SIZE`. Every batch is one short transaction that can be
+repeated, so the job can be stopped and started again at any time.
+The last message of a thread is always kept.
+
+Archived messages are older than all messages of their thread, so
+read receipts give their read state as before and unread ones stay
+in unread counters until they are read.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import caching, database, services
+from .models import ArchivedMessage, Thread, Message
+
+DEFAULTS = {
+    'MAX_AGE_DAYS': 0,
+    'MAX_MESSAGES_PER_THREAD': 0,
+    'ARCHIVE': True,
+    'BATCH_SIZE': 1000,
+}
+
+
+def get_option(name: str) -> Any:
+    options = getattr(settings, 'CHATS_RETENTION', {})
+    return options.get(name, DEFAULTS[name])
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    Zero `max_age_days` or `max_messages` means no limit.
+    """
+
+    max_age_days: int = 0
+    max_messages: int = 0
+    archive: bool = True
+    batch_size: int = 1000
+
+    @classmethod
+    def from_settings(cls, **overrides) -> 'RetentionPolicy':
+        options = {
+            'max_age_days': get_option('MAX_AGE_DAYS'),
+            'max_messages': get_option('MAX_MESSAGES_PER_THREAD'),
+            'archive': get_option('ARCHIVE'),
+            'batch_size': get_option('BATCH_SIZE'),
+        }
+        options.update(
+            (key, value) for key, value in overrides.items()
+            if value is not None
+        )
+        return cls(**options)
+
+    @property
+    def is_limited(self) -> bool:
+        return bool(self.max_age_days or self.max_messages)
+
+    def get_cutoff(self) -> datetime | None:
+        if not self.max_age_days:
+            return None
+        return timezone.now() - timedelta(days=self.max_age_days)
+
+
+def get_thread_ids(
+    after: int, cutoff: datetime | None, chunk_size: int = 1000
+) -> Iterator[int]:
+    """
+    Return ids of threads after `after` in order, without threads that
+    are too new to have expired messages.
+
+    Ids are read by chunks, so no cursor is kept open between batches.
+    """
+    threads = Thread.objects.filter(deleted__isnull=True).order_by('id')
+    if cutoff is not None:
+        threads = threads.filter(created__lt=cutoff)
+    while True:
+        thread_ids = list(
+            threads.filter(id__gt=after).values_list('id', flat=True)
+            [:chunk_size]
+        )
+        yield from thread_ids
+        if len(thread_ids) < chunk_size:
+            return
+        after = thread_ids[-1]
+
+
+def get_expired_messages(thread_id: int, policy: RetentionPolicy) -> Q | None:
+    """
+    Return filter of expired messages of a thread or `None`
+    if all its messages are kept.
+    """
+    messages = Message.objects.filter(thread_id=thread_id)
+    messages = messages.order_by('-created', '-id')
+    keep = max(policy.max_messages, 1)
+    boundary = messages.values_list('created', 'id')[keep - 1:keep].first()
+    if boundary is None:
+        return None
+    created, pk = boundary
+    expired = Q(created__lt=created) | Q(created=created, id__lt=pk)
+    cutoff = policy.get_cutoff()
+    if cutoff is not None:
+        expired &= Q(created__lt=cutoff)
+    return Q(thread_id=thread_id) & expired
+
+
+def move_messages(
+    thread_id: int, rows: list[tuple[int, int, str, datetime]], archive: bool
+) -> None:
+    """
+    Archive or delete messages of a thread with one transaction.
+
+    `rows` are ordered by creation. Archived messages keep their read
+    state, which read receipts give, and stay in unread counters.
+    Deleted messages can not be read any more, so counters of receivers
+    are decreased by the ones they have not read.
+    """
+    ids = [row[0] for row in rows]
+    participants = services.get_thread_participants(thread_id)
+    with database.atomic_immediate():
+        if archive:
+            ArchivedMessage.objects.bulk_create(
+                (ArchivedMessage(
+                    id=pk, thread_id=thread_id, sender_id=sender_id,
+                    text=text, created=created,
+                ) for pk, sender_id, text, created in rows),
+                ignore_conflicts=True,
+            )
+        else:
+            receipts = services.get_read_receipts(thread_id)
+            for user_id in participants:
+                receipt = receipts.get(user_id)
+                number = sum(
+                    1
+                    for pk, sender_id, _, created in rows
+                    if sender_id != user_id
+                    and (receipt is None or (created, pk) > receipt)
+                )
+                services.change_unread_messages_number(
+                    thread_id, [user_id], -number
+                )
+        Message.objects.filter(id__in=ids).delete()
+        caching.invalidate(participants, [thread_id])
+
+
+def apply_retention(
+    policy: RetentionPolicy,
+    after_thread: int = 0,
+    progress: Callable[[int, int], None] = None,
+) -> int:
+    """
+    Apply the policy to threads with ids greater than `after_thread`.
+
+    `progress` is called with id of every processed thread and number
+    of its moved messages. Return number of moved messages.
+    """
+    if not policy.is_limited:
+        return 0
+    total = 0
+    for thread_id in get_thread_ids(after_thread, policy.get_cutoff()):
+        expired = get_expired_messages(thread_id, policy)
+        moved = 0
+        while expired is not None:
+            messages = Message.objects.filter(expired)
+            messages = messages.order_by('created', 'id')
+            rows = list(messages.values_list(
+                'id', 'sender_id', 'text', 'created'
+            )[:policy.batch_size])
+            if not rows:
+                break
+            move_messages(thread_id, rows, policy.archive)
+            moved += len(rows)
+        total += moved
+        if progress is not None:
+            progress(thread_id, moved)
+    return total
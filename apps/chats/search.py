@@ -0,0 +1,151 @@
+"""
+Full-text search of messages.
+
+Search is done by a backend from `CHATS_SEARCH` setting, so the index
+can be moved from SQLite FTS5 to another database (e.g. PostgreSQL
+`tsvector`) by adding a backend. Backends return ids of messages
+visible to the user with rank and highlighted text, ordered by rank.
+"""
+import html
+import re
+import threading
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Thread, Message
+
+# Markers of matches in highlighted text before it is escaped.
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+
+@dataclass
+class SearchResult:
+    message_id: int
+    rank: float
+    highlight: str
+
+
+class BaseSearchBackend:
+    """
+    Interface of a full-text index of messages.
+
+    The index must follow created, changed and deleted messages,
+    including bulk inserts, without calls from the application.
+    """
+
+    def search(
+        self, query: str, user_id: int, limit: int,
+        after: tuple[float, int] = None, thread_id: int = None
+    ) -> list[SearchResult]:
+        """
+        Return results of threads of the user ordered by rank, then by id.
+        Lower rank is better.
+
+        Only results after the `(rank, message_id)` position are returned
+        if it is given. Ranks change with the index, so a position is
+        exact only while no messages are indexed or removed; otherwise
+        the next page may skip or repeat results.
+        """
+        raise NotImplementedError
+
+    def rebuild(self) -> None:
+        """
+        Build the index from all messages again.
+        """
+        raise NotImplementedError
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    Search by the `message_search` FTS5 table that is kept in sync
+    with the `message` table by triggers.
+    """
+
+    table = 'message_search'
+
+    def search(
+        self, query: str, user_id: int, limit: int,
+        after: tuple[float, int] = None, thread_id: int = None
+    ) -> list[SearchResult]:
+        match = self.build_match(query)
+        if not match:
+            return []
+        participants = Thread.participants.through._meta.db_table
+        # Only messages of the user threads are ranked and only
+        # the page is highlighted.
+        sql = f'''
+            SELECT rowid AS id, rank
+            FROM {self.table}
+            WHERE {self.table} MATCH %s AND rowid IN (
+                SELECT m.id FROM {Message._meta.db_table} AS m
+                WHERE m.thread_id IN (
+                    SELECT p.thread_id FROM {participants} AS p
+                    WHERE p.user_id = %s
+                )
+        '''
+        params: list = [match, user_id]
+        if thread_id is not None:
+            sql += ' AND m.thread_id = %s'
+            params.append(thread_id)
+        sql += ')'
+        if after is not None:
+            sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+            params.extend([after[0], after[0], after[1]])
+        sql = f'''
+            WITH page AS ({sql} ORDER BY rank, rowid LIMIT %s)
+            SELECT page.id, page.rank, highlight({self.table}, 0, %s, %s)
+            FROM page
+            INNER JOIN {self.table} ON {self.table}.rowid = page.id
+            WHERE {self.table} MATCH %s
+            ORDER BY page.rank, page.id
+        '''
+        params.extend([limit, MATCH_START, MATCH_END, match])
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [SearchResult(*row) for row in cursor.fetchall()]
+
+    def rebuild(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')"
+            )
+
+    @staticmethod
+    def build_match(query: str) -> str:
+        """
+        Return FTS5 query that matches messages with all words
+        of the query, so its syntax can not be broken by user input.
+        """
+        words = re.findall(r'\w+', query)
+        return ' '.join(f'"{word}"' for word in words)
+
+
+_backend: BaseSearchBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> BaseSearchBackend:
+    """
+    Return backend from `CHATS_SEARCH` setting.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            options = dict(getattr(settings, 'CHATS_SEARCH', {}))
+            backend_class = import_string(
+                options.pop('BACKEND', 'chats.search.SQLiteSearchBackend')
+            )
+            _backend = backend_class(**options.pop('OPTIONS', {}))
+        return _backend
+
+
+def format_highlight(text: str) -> str:
+    """
+    Escape highlighted text and mark matches with `<mark>` tags.
+    """
+    text = html.escape(text)
+    return text.replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
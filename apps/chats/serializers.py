@@ -1,18 +1,37 @@
+from typing import TYPE_CHECKING
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
 from rest_framework import serializers
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import prefetch_related_objects
 
 from . import services
-from .models import Thread, Message
+from .models import Change, Thread, Message
 
-User = get_user_model()
+if TYPE_CHECKING:
+    from django.contrib.auth.models import User
+else:
+    User = get_user_model()
 
 
 class ThreadSerializer(serializers.ModelSerializer):
+    """
+    Serializes a thread with its participants.
+
+    With `preview` in the context also adds the last message and
+    number of unread messages, so `Thread` objects must come from
+    `services.get_user_threads_with_preview()`.
+    """
+
+    preview_length = 100
 
     class Meta:
         model = Thread
-        fields = '__all__'
+        exclude = ('participants_key', 'last_message', 'deleted')
         read_only_fields = ('created', 'updated')
 
     def validate_participants(self, value: list[User]) -> list[User]:
@@ -31,8 +50,24 @@ class ThreadSerializer(serializers.ModelSerializer):
         ]
         representation = super().to_representation(data)
         representation['participants'] = participants
+        if self.context.get('preview'):
+            representation['last_message'] = self.get_last_message(data)
+            representation['unread_number'] = data.unread_number
         return representation
 
+    def get_last_message(self, data: Thread) -> dict | None:
+        message = data.last_message
+        if message is None:
+            return None
+        return {
+            'id': message.id,
+            'text': message.text[:self.preview_length],
+            'sender': str(message.sender),
+            'created': serializers.DateTimeField().to_representation(
+                message.created
+            ),
+        }
+
     def to_internal_value(self, data: dict) -> dict:
         participants = data.get('participants')
         validated_data = super().to_internal_value(data)
@@ -44,14 +79,157 @@ class ThreadSerializer(serializers.ModelSerializer):
         thread, _ = services.get_by_participants_or_create_thread(
             validated_data, participants
         )
+        prefetch_related_objects([thread], services.get_participants_prefetch())
         return thread
 
 
 class MessageSerializer(serializers.ModelSerializer):
+    """
+    `is_read` comes from `services.get_read_by_receivers()` annotation,
+    messages without it (e.g. just created ones) are not read.
+    """
+
     sender = serializers.StringRelatedField()
     thread = serializers.StringRelatedField()
+    is_read = serializers.BooleanField(read_only=True, default=False)
 
     class Meta:
         model = Message
         fields = '__all__'
-        read_only_fields = ('created', 'is_read')
+        read_only_fields = ('created',)
+
+    def create(self, validated_data: dict) -> Message:
+        return services.create_message(
+            validated_data['thread'],
+            validated_data['sender'],
+            validated_data['text'],
+        )
+
+
+class MessageBatchItemSerializer(serializers.Serializer):
+    thread = serializers.IntegerField(min_value=1)
+    text = serializers.CharField(max_length=4096)
+
+
+class MessageBatchSerializer(serializers.Serializer):
+    """
+    Messages of the user to create in one or more threads.
+    """
+
+    messages = serializers.ListField(
+        child=MessageBatchItemSerializer(), allow_empty=False, max_length=500
+    )
+
+
+class MessageSearchResultSerializer(MessageSerializer):
+    highlight = serializers.CharField(read_only=True)
+    rank = serializers.FloatField(read_only=True)
+
+
+class MessageSearchSerializer(serializers.Serializer):
+    """
+    Search query, optional thread to search in and position
+    of the last result of the previous page.
+    """
+
+    q = serializers.CharField(max_length=200)
+    thread = serializers.IntegerField(required=False, min_value=1)
+    after = serializers.CharField(required=False)
+    limit = serializers.IntegerField(
+        required=False, default=20, min_value=1, max_value=100
+    )
+
+    def validate_after(self, value: str) -> tuple[float, int]:
+        try:
+            padding = '=' * (-len(value) % 4)
+            rank, pk = json.loads(urlsafe_b64decode(value + padding))
+            return float(rank), int(pk)
+        except (BinasciiError, TypeError, ValueError):
+            raise serializers.ValidationError('Invalid cursor')
+
+    @staticmethod
+    def encode_after(message: Message) -> str:
+        data = json.dumps([message.rank, message.id], separators=(',', ':'))
+        return urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+class ExportSerializer(serializers.Serializer):
+    """
+    Format of exported messages and whether to compress them with gzip.
+    """
+
+    type = serializers.ChoiceField(
+        choices=['jsonl', 'csv'], required=False, default='jsonl'
+    )
+    gzip = serializers.BooleanField(required=False, default=False)
+
+
+class ThreadReadingSerializer(serializers.Serializer):
+    """
+    Bounds of messages to mark as read in a thread.
+
+    All messages are marked if no bound is given.
+    """
+
+    message = serializers.IntegerField(required=False, min_value=1)
+    created = serializers.DateTimeField(required=False)
+
+
+class MessageWaitSerializer(serializers.Serializer):
+    """
+    Seconds to wait for new messages, up to `LONG_POLL_TIMEOUT`
+    of `CHATS_EVENTS` setting.
+    """
+
+    timeout = serializers.IntegerField(required=False, default=25, min_value=0)
+
+    def validate_timeout(self, value: int) -> int:
+        options = getattr(settings, 'CHATS_EVENTS', {})
+        return min(value, options.get('LONG_POLL_TIMEOUT', 30))
+
+
+class SyncSerializer(serializers.Serializer):
+    """
+    Sync token of the last received change and size of a batch.
+    """
+
+    token = serializers.IntegerField(required=False, default=0, min_value=0)
+    limit = serializers.IntegerField(
+        required=False, default=500, min_value=1, max_value=1000
+    )
+
+
+class ChangeSerializer(serializers.ModelSerializer):
+    """
+    Change with the created message or the thread the user joined.
+
+    Context must have `messages` and `threads` dicts by ids.
+    Deleted objects are serialized as `None`.
+    """
+
+    message = serializers.SerializerMethodField()
+    thread = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Change
+        fields = (
+            'id', 'type', 'thread_id', 'data', 'created', 'message', 'thread'
+        )
+
+    def get_message(self, change: Change) -> dict | None:
+        if change.type != Change.MESSAGE_CREATED:
+            return None
+        message = self.context['messages'].get(change.object_id)
+        if message is None:
+            return None
+        return MessageSerializer(message).data
+
+    def get_thread(self, change: Change) -> dict | None:
+        if change.type not in (
+            Change.THREAD_CREATED, Change.PARTICIPANTS_ADDED
+        ):
+            return None
+        thread = self.context['threads'].get(change.thread_id)
+        if thread is None:
+            return None
+        return ThreadSerializer(thread).data
@@ -1,85 +1,972 @@
+from collections import Counter
 from datetime import datetime
+from typing import TYPE_CHECKING, Callable
+
+from asgiref.sync import sync_to_async
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Prefetch, QuerySet, Q
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    QuerySet,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 
-from .models import Thread, Message
+from . import caching, database, events, membership, purge, search, writes
+from .models import (
+    ArchivedMessage,
+    Change,
+    Thread,
+    Message,
+    ReadReceipt,
+    ThreadUnreadMessagesCounter,
+    UnreadMessagesCounter,
+)
 
-User = get_user_model()
+if TYPE_CHECKING:
+    from django.contrib.auth.models import User
+else:
+    User = get_user_model()
 
 
 def get_thread_by_participants(participants: list[int]) -> Thread:
     """
     Return `Thread` object by m2m field `participants`.
+
+    Uses the unique `participants_key`, so it is a single index lookup.
     """
-    users = User.objects.only('id')
-    prefetch = Prefetch('participants', queryset=users)
-    threads = Thread.objects.prefetch_related(prefetch)
-    threads = threads.filter(participants=participants[0])
-    threads = threads.filter(participants=participants[1])
-    return threads.distinct().get()
+    key = Thread.make_participants_key(participants)
+    return Thread.objects.get(participants_key=key)
 
 
 def create_thread(data: dict, participants: list[int] = None) -> Thread:
-    thread = Thread.objects.create(**data)
-    if participants is not None:
-        thread.participants.add(*participants)
+    if participants is None:
+        return Thread.objects.create(**data)
+    key = Thread.make_participants_key(participants)
+    user_ids = list(set(int(pk) for pk in participants))
+    with transaction.atomic():
+        thread = Thread.objects.create(**data, participants_key=key)
+        # The thread is new, so there is nothing to check
+        # or recount as `participants.add()` would do.
+        Thread.participants.through.objects.bulk_create(
+            Thread.participants.through(thread_id=thread.id, user_id=pk)
+            for pk in user_ids
+        )
+        log_changes(Change.THREAD_CREATED, thread.id, user_ids, thread.id)
+    membership.invalidate_user_threads(user_ids)
     return thread
 
 
+@database.retry_on_locked
+def delete_thread(thread_id: int) -> None:
+    """
+    Hide a thread from its participants at once.
+
+    Messages of the thread are deleted later by `purge.purge_thread()`,
+    so the request does not wait for them.
+    """
+    participants = get_thread_participants(thread_id)
+    with transaction.atomic():
+        log_changes(Change.THREAD_DELETED, thread_id, participants, thread_id)
+        reset_thread_unread_messages_number(thread_id)
+        Thread.participants.through.objects.filter(
+            thread_id=thread_id
+        ).delete()
+        Thread.objects.filter(id=thread_id).update(
+            deleted=timezone.now(), participants_key=None
+        )
+        transaction.on_commit(lambda: purge.schedule_purge(thread_id))
+    membership.invalidate_user_threads(participants)
+
+
+@database.retry_on_locked
 def get_by_participants_or_create_thread(
     data: dict, participants: list[int]
 ) -> tuple[Thread, bool]:
     """
     `get_or_create()` method but getting `Thread`
     object by m2m field `participants`.
+
+    If a concurrent request creates the same thread first,
+    the unique `participants_key` rejects the second insert
+    and the already created thread is returned.
     """
     try:
         return get_thread_by_participants(participants), False
     except ObjectDoesNotExist:
-        return create_thread(data, participants), True
+        pass
+    try:
+        with transaction.atomic():
+            return create_thread(data, participants), True
+    except IntegrityError:
+        return get_thread_by_participants(participants), False
 
 
-def set_thread_last_update(thread_id: int, created: datetime) -> None:
+def refresh_participants_key(thread: Thread) -> None:
     """
-    Update `updated` field of a `Thread` object.
+    Recalculate `participants_key` of a thread from its participants.
+
+    Is needed when participants are changed not by `create_thread()`.
+    Only threads with 2 participants get a key.
+    """
+    participants = list(thread.participants.values_list('id', flat=True))
+    key = None
+    if len(participants) == 2:
+        key = Thread.make_participants_key(participants)
+    Thread.objects.filter(id=thread.id).update(participants_key=key)
+    thread.participants_key = key
+
+
+def get_participants_prefetch() -> Prefetch:
+    """
+    Return prefetch of thread participants.
+
+    Only `id` and `username` of participants are loaded,
+    because only they are serialized.
+    """
+    users = User.objects.only('id', 'username')
+    return Prefetch('participants', queryset=users)
+
+
+def get_user_threads(user: User) -> QuerySet[Thread]:
+    """
+    Return threads of the user with prefetched participants.
+    """
+    threads = Thread.objects.filter(participants=user.id)
+    return threads.prefetch_related(get_participants_prefetch())
+
+
+def get_user_threads_with_preview(user: User) -> QuerySet[Thread]:
+    """
+    Return threads of the user with the last message and
+    number of messages unread by the user, newest threads first.
+
+    Everything is loaded with one query besides participants prefetch.
+    """
+    counters = ThreadUnreadMessagesCounter.objects.filter(
+        thread=OuterRef('pk'), user_id=user.id
+    )
+    unread_number = Coalesce(
+        Subquery(counters.values('number')[:1]), Value(0)
+    )
+    threads = get_user_threads(user).select_related('last_message__sender')
+    threads = threads.annotate(unread_number=unread_number)
+    return threads.order_by('-updated', '-id')
+
+
+def get_read_by_receivers() -> Exists:
+    """
+    Return expression that is true for messages read by all
+    participants of their thread except the sender.
+
+    A message is read by a user if the read receipt of the user
+    in the thread is at the message or after it.
+    """
+    receipts = ReadReceipt.objects.filter(
+        thread_id=OuterRef('thread_id'), user_id=OuterRef('user_id')
+    ).filter(
+        Q(last_read_created__gt=OuterRef(OuterRef('created')))
+        | Q(
+            last_read_created=OuterRef(OuterRef('created')),
+            last_read_id__gte=OuterRef(OuterRef('id')),
+        )
+    )
+    not_read_by = Thread.participants.through.objects.filter(
+        thread_id=OuterRef('thread_id')
+    ).exclude(user_id=OuterRef('sender_id')).exclude(Exists(receipts))
+    return ~Exists(not_read_by)
+
+
+def get_thread_messages(thread_id: int) -> QuerySet[Message]:
+    """
+    Return messages of a thread with their senders, the thread
+    and `is_read` state.
+    """
+    messages = Message.objects.filter(thread_id=thread_id)
+    messages = messages.annotate(is_read=get_read_by_receivers())
+    return messages.select_related('sender', 'thread')
+
+
+def get_thread_archived_messages(thread_id: int) -> QuerySet[ArchivedMessage]:
+    """
+    Return archived messages of a thread, which are older than
+    all messages in the `message` table.
+    """
+    messages = ArchivedMessage.objects.filter(thread_id=thread_id)
+    messages = messages.annotate(is_read=get_read_by_receivers())
+    return messages.select_related('sender', 'thread')
+
+
+def set_thread_last_update(
+    thread_id: int, created: datetime, last_message_id: int = None
+) -> None:
+    """
+    Update `updated` and `last_message` fields of a `Thread` object.
 
     Is needed after creating new message in a thread.
     """
-    Thread.objects.filter(id=thread_id).update(updated=created)
+    data: dict = {'updated': created}
+    if last_message_id is not None:
+        data['last_message_id'] = last_message_id
+    Thread.objects.filter(id=thread_id).update(**data)
+
+
+@database.retry_on_locked
+def write_messages(messages: list[Message]) -> list[Message]:
+    """
+    Save new messages of any senders and threads with one transaction.
+
+    Messages are inserted with one query, every thread gets its new
+    `updated` and `last_message` once, unread messages counters of
+    receivers are changed by one query per thread and number, and
+    changes are logged with one query. `post_save` receivers are not
+    sent by `bulk_create()`. Messages are returned in the given order.
+    """
+    for message in messages:
+        # Ids of a rolled back attempt are not kept.
+        message.pk = None
+    with database.atomic_immediate():
+        messages = Message.objects.bulk_create(messages)
+        last_messages = {
+            int(message.thread_id): message for message in messages
+        }
+        if len(last_messages) == 1:
+            [(thread_id, message)] = last_messages.items()
+            set_thread_last_update(thread_id, message.created, message.id)
+        else:
+            Thread.objects.filter(id__in=list(last_messages)).update(
+                updated=Case(*(
+                    When(id=thread_id, then=Value(message.created))
+                    for thread_id, message in last_messages.items()
+                )),
+                last_message_id=Case(*(
+                    When(id=thread_id, then=Value(message.id))
+                    for thread_id, message in last_messages.items()
+                )),
+            )
+
+        participants: dict[int, list[int]] = {}
+        rows = Thread.participants.through.objects.filter(
+            thread_id__in=list(last_messages)
+        )
+        for thread_id, user_id in rows.values_list('thread_id', 'user_id'):
+            participants.setdefault(thread_id, []).append(user_id)
+        numbers: Counter[tuple[int, int]] = Counter(
+            (int(message.thread_id), user_id)
+            for message in messages
+            for user_id in participants.get(int(message.thread_id), [])
+            if user_id != message.sender_id
+        )
+        receivers: dict[tuple[int, int], list[int]] = {}
+        for (thread_id, user_id), number in numbers.items():
+            receivers.setdefault((thread_id, number), []).append(user_id)
+        for (thread_id, number), user_ids in receivers.items():
+            change_unread_messages_number(thread_id, user_ids, number)
+        Change.objects.bulk_create(
+            Change(
+                user_id=user_id,
+                type=Change.MESSAGE_CREATED,
+                thread_id=int(message.thread_id),
+                object_id=message.id,
+            )
+            for message in messages
+            for user_id in participants.get(int(message.thread_id), [])
+        )
+        caching.invalidate(
+            {pk for user_ids in participants.values() for pk in user_ids},
+            list(last_messages),
+        )
+        transaction.on_commit(
+            lambda: notify_messages_created(messages, participants)
+        )
+    return messages
 
 
-def mark_message_as_read(pk: int) -> None:
-    Message.objects.filter(id=pk).update(is_read=True)
+_message_writer = writes.MessageWriter(write_messages)
 
 
-def get_unread_messages_number(user: User) -> QuerySet[Message]:
+def create_message(thread: Thread, sender: User, text: str) -> Message:
+    """
+    Create message of the sender in a thread.
+
+    Messages of concurrent requests are written together if
+    coalescing is enabled, see `writes`.
+    """
+    message = Message(thread=thread, sender=sender, text=text)
+    return writes.write_message(message, _message_writer)
+
+
+def create_messages(sender: User, items: list[dict]) -> list[Message]:
+    """
+    Create messages of the sender in one or more threads.
+
+    `items` are dicts with `thread` id and `text`.
+    Messages are returned in order of the items.
+    """
+    threads = {item['thread']: Thread(id=item['thread']) for item in items}
+    return write_messages([
+        Message(thread=threads[item['thread']], sender=sender,
+                text=item['text'])
+        for item in items
+    ])
+
+
+def get_messages_after(created: datetime, pk: int) -> Q:
+    """
+    Return filter of messages after the position `(created, pk)`.
+    """
+    return Q(created__gt=created) | Q(created=created, id__gt=pk)
+
+
+def get_read_receipts(thread_id: int) -> dict[int, tuple[datetime, int]]:
+    """
+    Return positions `(created, id)` of the last read messages of
+    the thread by ids of their readers.
+    """
+    receipts = ReadReceipt.objects.filter(thread_id=thread_id)
+    return {
+        user_id: (created, pk)
+        for user_id, created, pk in receipts.values_list(
+            'user_id', 'last_read_created', 'last_read_id'
+        )
+    }
+
+
+def set_read_receipt(
+    thread_id: int, user_id: int, message_id: int, created: datetime
+) -> bool:
+    """
+    Move the read receipt of the user in the thread to the message
+    with one upsert. Receipts are never moved back.
+
+    Return whether the receipt is moved.
+    """
+    receipts = ReadReceipt.objects.filter(thread_id=thread_id, user_id=user_id)
+    earlier = Q(last_read_created__lt=created) | Q(
+        last_read_created=created, last_read_id__lt=message_id
+    )
+    values = {'last_read_id': message_id, 'last_read_created': created}
+    if receipts.filter(earlier).update(**values):
+        return True
+    if receipts.exists():
+        return False
+    try:
+        with transaction.atomic():
+            ReadReceipt.objects.create(
+                thread_id=thread_id, user_id=user_id, **values
+            )
+    except IntegrityError:
+        # Created by a concurrent request.
+        return bool(receipts.filter(earlier).update(**values))
+    return True
+
+
+def mark_message_as_read(pk: int, user: User) -> None:
+    """
+    Mark the message and all earlier messages of its thread
+    as read by the user.
+    """
+    messages = Message.objects.filter(id=pk)
+    thread_id = messages.values_list('thread_id', flat=True).first()
+    if thread_id is None:
+        return
+    try:
+        mark_thread_as_read(thread_id, user, message_id=pk)
+    except ObjectDoesNotExist:
+        # Deleted after the check.
+        pass
+
+
+async def amark_message_as_read(pk: int, user: User) -> None:
+    """
+    Version of `mark_message_as_read()` for async views.
+
+    The async ORM has no transactions, so only the check of an already
+    read message, the most common case, is done without a thread.
+    """
+    messages = Message.objects.filter(id=pk)
+    message = await messages.values_list('thread_id', 'created').afirst()
+    if message is None:
+        return
+    thread_id, created = message
+    receipts = ReadReceipt.objects.filter(thread_id=thread_id, user_id=user.id)
+    read = receipts.filter(
+        Q(last_read_created__gt=created)
+        | Q(last_read_created=created, last_read_id__gte=pk)
+    )
+    if not await read.aexists():
+        await sync_to_async(mark_message_as_read)(pk, user)
+
+
+@database.retry_on_locked
+def mark_thread_as_read(
+    thread_id: int,
+    user: User,
+    message_id: int = None,
+    created: datetime = None,
+) -> int:
+    """
+    Mark messages of a thread as read by the user by moving
+    the read receipt of the user.
+
+    The receipt is moved to the newest message, to the message with
+    `message_id` or to the newest message created not later than
+    `created` if they are given. Return number of messages sent
+    to the user that became read.
+    """
+    messages = Message.objects.filter(thread_id=thread_id)
+    with database.atomic_immediate():
+        if message_id is not None:
+            last = messages.filter(id=message_id)
+            last_created = last.values_list('created', flat=True).get()
+            messages = messages.filter(
+                Q(created__lt=last_created)
+                | Q(created=last_created, id__lte=message_id)
+            )
+        if created is not None:
+            messages = messages.filter(created__lte=created)
+        newest = messages.order_by('-created', '-id')
+        last_read = newest.values_list('created', 'id').first()
+        if last_read is None:
+            return 0
+
+        receipts = ReadReceipt.objects.select_for_update().filter(
+            thread_id=thread_id, user_id=user.id
+        )
+        receipt = receipts.values_list(
+            'last_read_created', 'last_read_id'
+        ).first()
+        if receipt is not None and receipt >= last_read:
+            return 0
+        unread = messages.exclude(sender_id=user.id)
+        if receipt is not None:
+            unread = unread.filter(get_messages_after(*receipt))
+        # Archived messages are older than all messages, so the ones
+        # after the receipt are read now too.
+        archived = ArchivedMessage.objects.filter(thread_id=thread_id)
+        archived = archived.exclude(sender_id=user.id)
+        if created is not None:
+            archived = archived.filter(created__lte=created)
+        if receipt is not None:
+            archived = archived.filter(get_messages_after(*receipt))
+        archived_number = archived.order_by().values('thread_id').annotate(
+            number=Count('id')
+        ).values('number')
+        number = unread.aggregate(
+            number=Count('id') + Coalesce(Subquery(archived_number), 0)
+        )['number']
+        set_read_receipt(thread_id, user.id, last_read[1], last_read[0])
+        if not number:
+            return 0
+
+        change_unread_messages_number(thread_id, [user.id], -number)
+        participants = get_thread_participants(thread_id)
+        read = {
+            'thread': thread_id,
+            'user': user.id,
+            'message': last_read[1],
+            'created': last_read[0].isoformat(),
+        }
+        log_changes(
+            Change.MESSAGES_READ, thread_id, participants, last_read[1], read
+        )
+        transaction.on_commit(
+            lambda: notify_messages_read(read, participants, [user.id])
+        )
+    return number
+
+
+def get_unread_messages_number(user: User) -> int:
     """
     Get number of all unread messages of threads that the user have.
     """
-    threads = Thread.objects.filter(participants=user)
-    messages = Message.objects.select_related('sender', 'thread')
-    return messages.filter(~Q(sender=user), is_read=False, thread__in=threads).count()
+    counters = UnreadMessagesCounter.objects.filter(user_id=user.id)
+    return counters.values_list('number', flat=True).first() or 0
+
+
+async def aget_unread_messages_number(user: User) -> int:
+    """
+    Version of `get_unread_messages_number()` for async views.
+    """
+    counters = UnreadMessagesCounter.objects.filter(user_id=user.id)
+    return await counters.values_list('number', flat=True).afirst() or 0
+
+
+def get_thread_participants(thread_id: int) -> list[int]:
+    """
+    Return ids of thread participants.
+    """
+    participants = Thread.participants.through.objects.filter(
+        thread_id=thread_id
+    )
+    return list(participants.values_list('user_id', flat=True))
+
+
+def get_participant_threads(user_id: int) -> list[int]:
+    """
+    Return ids of threads the user participates in.
+    """
+    participants = Thread.participants.through.objects.filter(
+        user_id=user_id
+    )
+    return list(participants.values_list('thread_id', flat=True))
+
+
+def get_message_receivers(thread_id: int, sender_id: int) -> list[int]:
+    """
+    Return ids of thread participants except the sender.
+    """
+    participants = Thread.participants.through.objects.filter(
+        thread_id=thread_id
+    )
+    participants = participants.exclude(user_id=sender_id)
+    return list(participants.values_list('user_id', flat=True))
+
+
+def change_unread_messages_number(
+    thread_id: int, user_ids: list[int], delta: int
+) -> None:
+    """
+    Add `delta` to unread messages counters of the users.
+
+    Both the thread counter and the total counter are changed.
+    Counters are created if the users do not have them yet.
+    """
+    if not user_ids or not delta:
+        return
+    number = Greatest(F('number') + delta, Value(0))
+    # Nothing is retried on errors, so no savepoint is needed
+    # inside transactions of callers.
+    with transaction.atomic(savepoint=False):
+        counters = ThreadUnreadMessagesCounter.objects.filter(
+            thread_id=thread_id, user_id__in=user_ids
+        )
+        if counters.update(number=number) < len(user_ids) and delta > 0:
+            existing = set(counters.values_list('user_id', flat=True))
+            missing = [pk for pk in user_ids if pk not in existing]
+            ThreadUnreadMessagesCounter.objects.bulk_create(
+                [
+                    ThreadUnreadMessagesCounter(thread_id=thread_id, user_id=pk)
+                    for pk in missing
+                ],
+                ignore_conflicts=True,
+            )
+            counters.filter(user_id__in=missing).update(number=number)
+
+        totals = UnreadMessagesCounter.objects.filter(user_id__in=user_ids)
+        if totals.update(number=number) < len(user_ids) and delta > 0:
+            existing = set(totals.values_list('user_id', flat=True))
+            missing = [pk for pk in user_ids if pk not in existing]
+            UnreadMessagesCounter.objects.bulk_create(
+                [UnreadMessagesCounter(user_id=pk) for pk in missing],
+                ignore_conflicts=True,
+            )
+            totals.filter(user_id__in=missing).update(number=number)
+
+
+def increase_unread_messages_number(message: Message) -> None:
+    """
+    Count new message as unread for every participant except the sender.
+    """
+    thread_id = int(message.thread_id)
+    receivers = get_message_receivers(thread_id, int(message.sender_id))
+    change_unread_messages_number(thread_id, receivers, 1)
+
+
+def reset_thread_unread_messages_number(
+    thread_id: int, user_ids: list[int] = None
+) -> None:
+    """
+    Remove thread counters of the users and subtract them from totals.
+
+    Is needed when a thread is deleted or users leave it.
+    All participants are affected if `user_ids` is not given.
+    """
+    counters = ThreadUnreadMessagesCounter.objects.filter(thread_id=thread_id)
+    if user_ids is not None:
+        counters = counters.filter(user_id__in=user_ids)
+    with transaction.atomic():
+        for user_id, number in counters.values_list('user_id', 'number'):
+            UnreadMessagesCounter.objects.filter(user_id=user_id).update(
+                number=Greatest(F('number') - number, Value(0))
+            )
+        counters.delete()
+
+
+def count_unread_messages(
+    thread_id: int = None,
+    user_ids: list[int] = None,
+    thread_ids: list[int] = None,
+) -> dict[tuple[int, int], int]:
+    """
+    Count unread messages by `(user_id, thread_id)` in `Message` and
+    `ArchivedMessage` tables, i.e. messages of other users after
+    the read receipt of the user.
+
+    Is the source of truth for unread messages counters.
+    """
+    participants = Thread.participants.through.objects.all()
+    if thread_id is not None:
+        participants = participants.filter(thread_id=thread_id)
+    if thread_ids is not None:
+        participants = participants.filter(thread_id__in=thread_ids)
+    if user_ids is not None:
+        participants = participants.filter(user_id__in=user_ids)
+    receipts = ReadReceipt.objects.filter(
+        thread_id=OuterRef('thread_id'), user_id=OuterRef('user_id')
+    )
+    read_created = Subquery(receipts.values('last_read_created')[:1])
+    read_id = Subquery(receipts.values('last_read_id')[:1])
+    numbers: Counter[tuple[int, int]] = Counter()
+    # Counted apart, so rows of both tables are not multiplied by a join.
+    for messages in ('thread__messages', 'thread__archived_messages'):
+        after_receipt = (
+            Q(**{f'{messages}__created__gt': read_created})
+            | Q(**{
+                f'{messages}__created': read_created,
+                f'{messages}__id__gt': read_id,
+            })
+            | ~Exists(receipts)
+        )
+        unread = after_receipt & ~Q(**{f'{messages}__sender': F('user_id')})
+        rows = participants.values('user_id', 'thread_id').annotate(
+            number=Count(messages, filter=unread)
+        )
+        numbers.update({
+            (row['user_id'], row['thread_id']): row['number']
+            for row in rows
+            if row['number']
+        })
+    return dict(numbers)
+
+
+def add_thread_unread_messages_number(
+    thread_id: int, user_ids: list[int] = None
+) -> None:
+    """
+    Count existing unread messages of a thread for users that joined it.
+    """
+    numbers = count_unread_messages(thread_id, user_ids)
+    for (user_id, _), number in numbers.items():
+        change_unread_messages_number(thread_id, [user_id], number)
+
+
+def recount_unread_messages_number(
+    batch_size: int = 1000, thread_ids: list[int] = None
+) -> int:
+    """
+    Recalculate unread messages counters from `Message` and
+    `ArchivedMessage` tables: all of them or the ones of `thread_ids`
+    threads and totals of their participants.
+
+    Only counters that differ from the actual numbers are written.
+    Return number of repaired counters.
+    """
+    numbers = count_unread_messages(thread_ids=thread_ids)
+    thread_counters = ThreadUnreadMessagesCounter.objects.all()
+    counters = UnreadMessagesCounter.objects.all()
+    user_numbers = numbers
+    if thread_ids is not None:
+        thread_counters = thread_counters.filter(thread_id__in=thread_ids)
+        user_ids = list(
+            Thread.participants.through.objects
+            .filter(thread_id__in=thread_ids)
+            .values_list('user_id', flat=True).distinct()
+        )
+        counters = counters.filter(user_id__in=user_ids)
+        # Totals include other threads of the users.
+        user_numbers = count_unread_messages(user_ids=user_ids)
+    totals: dict[int, int] = {}
+    for (user_id, _), number in user_numbers.items():
+        totals[user_id] = totals.get(user_id, 0) + number
+
+    with transaction.atomic():
+        repaired = _repair_counters(
+            thread_counters,
+            numbers,
+            lambda counter: (counter.user_id, counter.thread_id),
+            lambda key, number: ThreadUnreadMessagesCounter(
+                user_id=key[0], thread_id=key[1], number=number
+            ),
+            batch_size,
+        )
+        repaired += _repair_counters(
+            counters,
+            totals,
+            lambda counter: counter.user_id,
+            lambda key, number: UnreadMessagesCounter(
+                user_id=key, number=number
+            ),
+            batch_size,
+        )
+    return repaired
+
+
+def _repair_counters(
+    counters: QuerySet,
+    numbers: dict,
+    get_key: Callable,
+    build: Callable,
+    batch_size: int,
+) -> int:
+    """
+    Make `counters` match `numbers` with bulk queries.
+    """
+    changed = []
+    redundant = []
+    existing = set()
+    for counter in counters.iterator(chunk_size=batch_size):
+        key = get_key(counter)
+        existing.add(key)
+        number = numbers.get(key, 0)
+        if not number:
+            redundant.append(counter.pk)
+        elif counter.number != number:
+            counter.number = number
+            changed.append(counter)
+    missing = [
+        build(key, number)
+        for key, number in numbers.items()
+        if key not in existing
+    ]
+    model = counters.model
+    model.objects.bulk_update(changed, ['number'], batch_size=batch_size)
+    model.objects.bulk_create(missing, batch_size=batch_size)
+    for i in range(0, len(redundant), batch_size):
+        model.objects.filter(pk__in=redundant[i:i + batch_size]).delete()
+    return len(changed) + len(missing) + len(redundant)
+
+
+def log_changes(
+    change_type: str,
+    thread_id: int,
+    user_ids: list[int],
+    object_id: int = None,
+    data: dict = None,
+) -> None:
+    """
+    Save change of a thread for every user that must see it.
+
+    Cached responses of the thread and the users are invalidated.
+    """
+    caching.invalidate(user_ids, [thread_id])
+    Change.objects.bulk_create(
+        Change(
+            user_id=user_id,
+            type=change_type,
+            thread_id=thread_id,
+            object_id=object_id,
+            data=data or {},
+        )
+        for user_id in user_ids
+    )
+
+
+def log_message_created(message: Message) -> None:
+    thread_id = int(message.thread_id)
+    log_changes(
+        Change.MESSAGE_CREATED,
+        thread_id,
+        get_thread_participants(thread_id),
+        message.id,
+    )
+
+
+def log_participants_changed(
+    change_type: str, thread_id: int, user_ids: list[int] = None
+) -> None:
+    """
+    Save change of thread participants for all of them.
+
+    Is called after adding and before removing participants,
+    so both the remaining and the changed participants see it.
+    """
+    participants = get_thread_participants(thread_id)
+    if user_ids is None:
+        user_ids = participants
+    log_changes(
+        change_type, thread_id, participants, data={'users': list(user_ids)}
+    )
+
+
+def get_changes(
+    user: User, token: int, limit: int
+) -> tuple[list[Change], bool]:
+    """
+    Return changes visible to the user after the sync `token`
+    and whether there are more of them.
+    """
+    changes = Change.objects.filter(user_id=user.id, id__gt=token)
+    changes = changes.order_by('id')
+    page = list(changes[:limit + 1])
+    return page[:limit], len(page) > limit
+
+
+def get_messages(message_ids: list[int]) -> dict[int, Message]:
+    messages = Message.objects.filter(id__in=message_ids)
+    messages = messages.annotate(is_read=get_read_by_receivers())
+    messages = messages.select_related('sender', 'thread')
+    return {message.id: message for message in messages}
+
+
+def search_messages(
+    user: User, query: str, limit: int,
+    after: tuple[float, int] = None, thread_id: int = None
+) -> tuple[list[Message], bool]:
+    """
+    Return messages of the user threads that match the query, best
+    first, and whether there are more of them.
+
+    Messages have `rank` and `highlight` (escaped text with matches
+    in `<mark>` tags) attributes.
+    """
+    results = search.get_backend().search(
+        query, user.id, limit + 1, after=after, thread_id=thread_id
+    )
+    messages = get_messages([result.message_id for result in results[:limit]])
+    found = []
+    for result in results[:limit]:
+        message = messages.get(result.message_id)
+        if message is None:
+            # Deleted after the search.
+            continue
+        message.rank = result.rank
+        message.highlight = search.format_highlight(result.highlight)
+        found.append(message)
+    return found, len(results) > limit
+
+
+def rebuild_search_index() -> None:
+    search.get_backend().rebuild()
+
+
+def notify_message_created(message: Message) -> None:
+    """
+    Send new message to thread participants and new unread numbers
+    to the receivers.
+    """
+    participants = get_thread_participants(int(message.thread_id))
+    data = {
+        'id': message.id,
+        'sender': str(message.sender),
+        'text': message.text,
+        'thread': int(message.thread_id),
+        'created': message.created.isoformat(),
+        'is_read': False,
+    }
+    events.get_hub().publish('message.created', participants, data)
+    receivers = [pk for pk in participants if pk != message.sender_id]
+    notify_unread_messages_number(receivers)
+
+
+def notify_messages_created(
+    messages: list[Message], participants: dict[int, list[int]]
+) -> None:
+    """
+    Send new messages to participants of their threads and
+    new unread numbers to the receivers once.
+    """
+    hub = events.get_hub()
+    receivers: set[int] = set()
+    for message in messages:
+        thread_id = int(message.thread_id)
+        hub.publish('message.created', participants.get(thread_id, []), {
+            'id': message.id,
+            'sender': str(message.sender),
+            'text': message.text,
+            'thread': thread_id,
+            'created': message.created.isoformat(),
+            'is_read': False,
+        })
+        receivers.update(
+            pk for pk in participants.get(thread_id, [])
+            if pk != message.sender_id
+        )
+    notify_unread_messages_number(sorted(receivers))
+
+
+def notify_messages_read(
+    read: dict, participants: list[int], receivers: list[int]
+) -> None:
+    """
+    Send read state change of a thread to its participants and
+    new unread numbers to the users that read messages.
+    """
+    events.get_hub().publish('messages.read', participants, read)
+    notify_unread_messages_number(receivers)
+
+
+def notify_unread_messages_number(user_ids: list[int]) -> None:
+    if not user_ids:
+        return
+    counters = UnreadMessagesCounter.objects.filter(user_id__in=user_ids)
+    numbers = dict(counters.values_list('user_id', 'number'))
+    hub = events.get_hub()
+    for user_id in user_ids:
+        hub.publish(
+            'unread.changed', [user_id], {'number': numbers.get(user_id, 0)}
+        )
 
 
 def check_user_have_thread(thread_pk: int, user: User) -> bool:
     """
     Check whether user have a thread with a `thread_id`.
     """
-    return user.threads.filter(id=thread_pk).exists()
+    return int(thread_pk) in membership.get_user_thread_ids(user)
+
+
+def check_user_have_threads(thread_pks: list[int], user: User) -> bool:
+    """
+    Check whether user have all threads with the ids.
+    """
+    return set(thread_pks) <= membership.get_user_thread_ids(user)
 
 
 def check_user_have_message(message_pk: int, user: User) -> bool:
     """
     Check whether user has thread with the message.
     """
-    return user.threads.filter(messages=message_pk).exists()
+    access = membership.get_message_access(message_pk, user)
+    return access is not None and access[2]
 
 
 def is_user_sender(message_pk: int, user: User) -> bool:
     """
     Check whether user is sender of the message.
     """
-    return user.messages.filter(id=message_pk).exists()
+    access = membership.get_message_access(message_pk, user)
+    return access is not None and access[1] == user.id
+
+
+async def acheck_user_have_thread(thread_pk: int, user: User) -> bool:
+    """
+    Version of `check_user_have_thread()` for async views.
+    """
+    return int(thread_pk) in await membership.aget_user_thread_ids(user)
+
+
+async def acheck_user_have_message(message_pk: int, user: User) -> bool:
+    """
+    Version of `check_user_have_message()` for async views.
+    """
+    access = await membership.aget_message_access(message_pk, user)
+    return access is not None and access[2]
 
+
+async def ais_user_sender(message_pk: int, user: User) -> bool:
+    """
+    Version of `is_user_sender()` for async views.
+    """
+    access = await membership.aget_message_access(message_pk, user)
+    return access is not None and access[1] == user.id
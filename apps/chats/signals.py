@@ -1,15 +1,185 @@
-from django.db.models.signals import post_save
+from typing import TYPE_CHECKING
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_init, post_save, pre_delete
+)
 from django.dispatch import receiver
 
-from . import services
-from .models import Message
+from . import authentication, database, membership, services, writes
+from .models import Change, Message, Thread
+
+if TYPE_CHECKING:
+    from django.contrib.auth.models import User
+else:
+    User = get_user_model()
+
+
+@receiver(connection_created)
+def configure_connection(
+    sender: type[BaseDatabaseWrapper], connection: BaseDatabaseWrapper,
+    **kwargs
+) -> None:
+    database.configure_connection(connection)
 
 
 @receiver(post_save, sender=Message)
 def set_thread_last_update(
     sender: Message, instance: Message, created: bool, **kwargs
 ) -> None:
-    if created:
+    if created and writes.get_option('SIGNALS'):
         services.set_thread_last_update(
-            int(instance.thread_id), instance.created
+            int(instance.thread_id), instance.created, instance.id
+        )
+
+
+@receiver(post_save, sender=Message)
+def increase_unread_messages_number(
+    sender: Message, instance: Message, created: bool, **kwargs
+) -> None:
+    if created and writes.get_option('SIGNALS'):
+        services.increase_unread_messages_number(instance)
+
+
+@receiver(post_save, sender=Message)
+def log_message_created(
+    sender: Message, instance: Message, created: bool, **kwargs
+) -> None:
+    if created and writes.get_option('SIGNALS'):
+        services.log_message_created(instance)
+
+
+@receiver(post_save, sender=Message)
+def notify_message_created(
+    sender: Message, instance: Message, created: bool, **kwargs
+) -> None:
+    if created and writes.get_option('SIGNALS'):
+        transaction.on_commit(
+            lambda: services.notify_message_created(instance)
+        )
+
+
+@receiver(pre_delete, sender=Thread)
+def reset_thread_unread_messages_number(
+    sender: Thread, instance: Thread, **kwargs
+) -> None:
+    services.reset_thread_unread_messages_number(instance.id)
+
+
+@receiver(pre_delete, sender=Thread)
+def log_thread_deleted(sender: Thread, instance: Thread, **kwargs) -> None:
+    services.log_changes(
+        Change.THREAD_DELETED,
+        instance.id,
+        services.get_thread_participants(instance.id),
+        instance.id,
+    )
+
+
+@receiver(m2m_changed, sender=Thread.participants.through)
+def update_participants_unread_messages_number(
+    sender: type, instance: Thread, action: str, reverse: bool,
+    pk_set: set[int] | None, **kwargs
+) -> None:
+    """
+    Keep unread messages counters in sync with thread participants.
+    """
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    pairs: list[tuple[int, list[int] | None]]
+    if reverse:
+        pairs = [(pk, [instance.pk]) for pk in pk_set or []]
+        if action == 'pre_clear':
+            pairs = [
+                (pk, [instance.pk])
+                for pk in services.get_participant_threads(instance.pk)
+            ]
+    else:
+        user_ids = list(pk_set) if pk_set is not None else None
+        pairs = [(instance.pk, user_ids)]
+    for thread_id, user_ids in pairs:
+        if action == 'post_add':
+            services.add_thread_unread_messages_number(thread_id, user_ids)
+        else:
+            services.reset_thread_unread_messages_number(thread_id, user_ids)
+
+
+@receiver(m2m_changed, sender=Thread.participants.through)
+def log_participants_changed(
+    sender: type, instance: Thread, action: str, reverse: bool,
+    pk_set: set[int] | None, **kwargs
+) -> None:
+    if action == 'post_add':
+        change_type = Change.PARTICIPANTS_ADDED
+    elif action in ('pre_remove', 'pre_clear'):
+        change_type = Change.PARTICIPANTS_REMOVED
+    else:
+        return
+    if reverse:
+        thread_ids = pk_set
+        if action == 'pre_clear':
+            thread_ids = set(services.get_participant_threads(instance.pk))
+        for thread_id in thread_ids or ():
+            services.log_participants_changed(
+                change_type, thread_id, [instance.pk]
+            )
+    else:
+        user_ids = list(pk_set) if pk_set is not None else None
+        services.log_participants_changed(change_type, instance.pk, user_ids)
+
+
+@receiver(pre_delete, sender=Thread)
+def invalidate_thread_membership(
+    sender: Thread, instance: Thread, **kwargs
+) -> None:
+    membership.invalidate_user_threads(
+        services.get_thread_participants(instance.id)
+    )
+
+
+@receiver(m2m_changed, sender=Thread.participants.through)
+def invalidate_participants_membership(
+    sender: type, instance: Thread, action: str, reverse: bool,
+    pk_set: set[int] | None, **kwargs
+) -> None:
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        user_ids = [instance.pk]
+    elif pk_set is None:
+        user_ids = services.get_thread_participants(instance.pk)
+    else:
+        user_ids = list(pk_set)
+    membership.invalidate_user_threads(user_ids)
+
+
+@receiver(post_init, sender=User)
+def remember_user_is_active(sender: User, instance: User, **kwargs) -> None:
+    setattr(instance, '_chats_is_active', instance.__dict__.get('is_active'))
+
+
+@receiver(post_save, sender=User)
+def update_user_state(
+    sender: User, instance: User, created: bool, **kwargs
+) -> None:
+    # `set_password()` keeps the raw password until the save is finished.
+    password_changed = getattr(instance, '_password', None) is not None
+    # Deferred `is_active` is not loaded, it is not changed then.
+    is_active = instance.__dict__.get('is_active')
+    is_active_changed = (
+        is_active != getattr(instance, '_chats_is_active', None)
+    )
+    # Other changes, e.g. of `last_login`, do not change the state.
+    if created or password_changed or is_active_changed:
+        authentication.update_user_state(
+            instance, revoke_tokens=password_changed and not created
         )
+    setattr(instance, '_chats_is_active', is_active)
+
+
+@receiver(post_delete, sender=User)
+def delete_user_state(sender: User, instance: User, **kwargs) -> None:
+    authentication.delete_user_state(instance.pk)
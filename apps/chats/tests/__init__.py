@@ -0,0 +1,12 @@
+import os
+import tempfile
+
+# A cache shared by processes as in production, for tests of cached
+# authorization and responses. Checks fall back to queries with the
+# per-process `LocMemCache` of the settings.
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'chats-test-cache'),
+    },
+}
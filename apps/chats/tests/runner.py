@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs tests with metrics turned off, so requests of tests are not
+    recorded and slow ones are not logged. Tests of metrics turn them on.
+    """
+
+    def setup_test_environment(self, **kwargs) -> None:
+        super().setup_test_environment(**kwargs)
+        self.metrics_settings = override_settings(
+            CHATS_METRICS={**settings.CHATS_METRICS, 'ENABLED': False}
+        )
+        self.metrics_settings.enable()
+
+    def teardown_test_environment(self, **kwargs) -> None:
+        self.metrics_settings.disable()
+        super().teardown_test_environment(**kwargs)
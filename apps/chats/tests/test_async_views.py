@@ -0,0 +1,305 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework import status
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+
+from chats import authentication, metrics, services
+from chats.models import Thread, Message
+from chats.pagination import MessagePagination
+
+User = get_user_model()
+
+
+class AsyncViewTestCase(TestCase):
+    """
+    Requests async views through the ASGI handler.
+    """
+
+    def setUp(self) -> None:
+        cache.clear()
+        authentication.user_cache.clear()
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.token = AccessToken.for_user(self.user)
+        self.headers = {'Authorization': f'Bearer {self.token}'}
+        self.thread = Thread.objects.create()
+        self.thread.participants.set([self.user, self.user2])
+        self.base_url = 'http://127.0.0.1:8000/api/v1/chats/async/'
+
+    def create_message(self, sender: User = None) -> Message:
+        return services.create_message(
+            text="Test text", sender=sender or self.user2, thread=self.thread)
+
+
+class AsyncMessageListViewTest(AsyncViewTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.url = f'{self.base_url}thread/{self.thread.id}/message/list/'
+        self.messages = [self.create_message() for _ in range(3)]
+
+    async def test_authentication_required(self) -> None:
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('detail', response.json())
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+    async def test_participant_required(self) -> None:
+        thread = await Thread.objects.acreate()
+        response = await self.async_client.get(
+            f'{self.base_url}thread/{thread.id}/message/list/',
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_all_messages(self) -> None:
+        response = await self.async_client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [obj['id'] for obj in response.json()],
+            [message.id for message in reversed(self.messages)],
+        )
+        self.assertEqual(response.json()[0]['sender'], 'test_user2')
+
+    async def test_limit_offset_pages(self) -> None:
+        response = await self.async_client.get(
+            f'{self.url}?limit=1&offset=1', headers=self.headers)
+        data = response.json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(
+            [obj['id'] for obj in data['results']], [self.messages[1].id])
+        self.assertIn('offset=2', data['next'])
+
+    async def test_keyset_pages(self) -> None:
+        response = await self.async_client.get(
+            f'{self.url}?before=&limit=2', headers=self.headers)
+        data = response.json()
+        self.assertNotIn('count', data)
+        self.assertEqual(
+            [obj['id'] for obj in data['results']],
+            [self.messages[2].id, self.messages[1].id],
+        )
+        response = await self.async_client.get(
+            data['next'], headers=self.headers)
+        data = response.json()
+        self.assertEqual(
+            [obj['id'] for obj in data['results']], [self.messages[0].id])
+        self.assertIsNone(data['next'])
+
+    async def test_invalid_cursor_rejected(self) -> None:
+        response = await self.async_client.get(
+            f'{self.url}?before=invalid', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AsyncMessageCreationViewTest(AsyncViewTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.url = f'{self.base_url}thread/{self.thread.id}/message/create/'
+
+    async def test_message_created(self) -> None:
+        response = await self.async_client.post(
+            self.url, {'text': 'Hello'}, content_type='application/json',
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = response.json()
+        self.assertEqual(data['text'], 'Hello')
+        self.assertEqual(data['sender'], 'test_user')
+        message = await Message.objects.aget(id=data['id'])
+        thread = await Thread.objects.aget(id=self.thread.id)
+        self.assertEqual(thread.last_message_id, message.id)
+        self.assertEqual(
+            await services.aget_unread_messages_number(self.user2), 1)
+
+    async def test_text_required(self) -> None:
+        response = await self.async_client.post(
+            self.url, {}, content_type='application/json',
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('text', response.json())
+        self.assertFalse(await Message.objects.aexists())
+
+
+class AsyncMarkingAsReadViewTest(AsyncViewTestCase):
+
+    async def test_message_marked(self) -> None:
+        message = await sync_to_async(services.create_message)(
+            text="Test text", sender=self.user2, thread=self.thread)
+        url = f'{self.base_url}message/{message.id}/read/'
+        response = await self.async_client.patch(url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        messages = services.get_thread_messages(self.thread.id)
+        self.assertTrue((await messages.aget(id=message.id)).is_read)
+        self.assertEqual(
+            await services.aget_unread_messages_number(self.user), 0)
+        response = await self.async_client.patch(url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    async def test_sender_can_not_mark(self) -> None:
+        message = await sync_to_async(services.create_message)(
+            text="Test text", sender=self.user, thread=self.thread)
+        response = await self.async_client.patch(
+            f'{self.base_url}message/{message.id}/read/',
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_thread_marked(self) -> None:
+        for _ in range(2):
+            await sync_to_async(services.create_message)(
+                text="Test text", sender=self.user2, thread=self.thread)
+        response = await self.async_client.patch(
+            f'{self.base_url}thread/{self.thread.id}/read/',
+            {}, content_type='application/json', headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'number': 2})
+
+
+class AsyncUnreadMessagesNumberViewTest(AsyncViewTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.url = f'{self.base_url}message/number-unread/'
+        metrics.registry.reset()
+
+    def tearDown(self) -> None:
+        metrics.registry.reset()
+
+    async def test_number(self) -> None:
+        await sync_to_async(services.create_message)(
+            text="Test text", sender=self.user2, thread=self.thread)
+        response = await self.async_client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), 1)
+
+    @override_settings(CHATS_METRICS={'ENABLED': True})
+    async def test_queries_recorded(self) -> None:
+        metrics.registry.reset()
+        await self.async_client.get(self.url, headers=self.headers)
+        route = metrics.registry.as_dict()[
+            'GET api/v1/chats/async/message/number-unread/'
+        ]
+        self.assertEqual(route['requests'], 1)
+        # Only the counter, the user state is cached when it is saved.
+        self.assertEqual(route['queries_max'], 1)
+
+
+class ThreadExportViewTest(AsyncViewTestCase):
+
+    async def test_streamed_by_async_iterator(self) -> None:
+        messages = [
+            await sync_to_async(self.create_message)() for _ in range(3)
+        ]
+        response = await self.async_client.get(
+            f'http://127.0.0.1:8000/api/v1/chats/thread/{self.thread.id}'
+            f'/export/',
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # A sync iterator would be read to a list before the first chunk.
+        self.assertTrue(response.is_async)
+        content = b''.join([
+            chunk async for chunk in response.streaming_content
+        ])
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [row['id'] for row in rows], [message.id for message in messages])
+
+
+# Sync-only middleware would hold the thread of the test while waiting.
+@override_settings(MIDDLEWARE=[
+    name for name in settings.MIDDLEWARE if 'debug_toolbar' not in name
+])
+class MessageWaitViewTest(AsyncViewTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.first = self.create_message()
+        self.url = f'{self.base_url}thread/{self.thread.id}/message/wait/'
+        # The wait view is not under the async prefix.
+        self.url = self.url.replace('/async/', '/')
+        self.cursor = MessagePagination().encode_cursor(self.first)
+
+    def create_message_and_notify(self, thread: Thread = None) -> Message:
+        with self.captureOnCommitCallbacks(execute=True):
+            return services.create_message(
+                text="Test text", sender=self.user2,
+                thread=thread or self.thread,
+            )
+
+    async def get(self, params: str) -> HttpResponse:
+        return await self.async_client.get(
+            f'{self.url}?{params}', headers=self.headers)
+
+    async def test_cursor_required(self) -> None:
+        response = await self.get('timeout=0')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_newer_messages_returned_at_once(self) -> None:
+        message = await sync_to_async(self.create_message)()
+        response = await self.get(f'after={self.cursor}&timeout=30')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(
+            [obj['id'] for obj in data['results']], [message.id])
+        self.assertIn('after=', data['previous'])
+        self.assertIn('timeout=30', data['previous'])
+
+    async def test_timeout(self) -> None:
+        response = await self.get(f'after={self.cursor}&timeout=0')
+        data = response.json()
+        self.assertEqual(data['results'], [])
+        self.assertIn(self.cursor, data['previous'])
+
+    @override_settings(CHATS_METRICS={'SLOW_REQUEST_MS': 0})
+    async def test_not_recorded_by_metrics(self) -> None:
+        metrics.registry.reset()
+        with self.assertNoLogs('chats.metrics', 'WARNING'):
+            await self.get(f'after={self.cursor}&timeout=0')
+        self.assertEqual(metrics.registry.as_dict(), {})
+
+    async def test_woken_by_new_message(self) -> None:
+        request = asyncio.ensure_future(
+            self.get(f'after={self.cursor}&timeout=10'))
+        await asyncio.sleep(0.2)
+        self.assertFalse(request.done())
+        other_thread = await Thread.objects.acreate()
+        await other_thread.participants.aset([self.user, self.user2])
+        await sync_to_async(self.create_message_and_notify)(other_thread)
+        await asyncio.sleep(0.2)
+        self.assertFalse(request.done())
+
+        start = time.monotonic()
+        message = await sync_to_async(self.create_message_and_notify)()
+        response = await asyncio.wait_for(request, 5)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(
+            [obj['id'] for obj in response.json()['results']], [message.id])
+
+    @override_settings(
+        CHATS_EVENTS={**settings.CHATS_EVENTS, 'RECHECK_INTERVAL': 0.1})
+    async def test_message_of_other_process_rechecked(self) -> None:
+        request = asyncio.ensure_future(
+            self.get(f'after={self.cursor}&timeout=10'))
+        await asyncio.sleep(0.2)
+        self.assertFalse(request.done())
+        # No event is delivered, as if created by another process.
+        message = await sync_to_async(self.create_message)()
+        response = await asyncio.wait_for(request, 5)
+        self.assertEqual(
+            [obj['id'] for obj in response.json()['results']], [message.id])
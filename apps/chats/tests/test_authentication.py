@@ -0,0 +1,159 @@
+from datetime import timedelta
+
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from chats import authentication
+from chats.models import TokenRevocation
+
+User = get_user_model()
+
+
+class StatelessJWTAuthenticationTest(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        authentication.user_cache.clear()
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.url = 'http://127.0.0.1:8000/api/v1/chats/thread/list/'
+        self.authorize(AccessToken.for_user(self.user))
+
+    def authorize(self, token: AccessToken) -> None:
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def get_token(self, issued: timedelta) -> AccessToken:
+        token = AccessToken.for_user(self.user)
+        token.set_exp(from_time=token.current_time + issued)
+        return token
+
+    def test_user_row_is_not_loaded(self) -> None:
+        url = 'http://127.0.0.1:8000/api/v1/chats/message/number-unread/'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user_table = User._meta.db_table
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn(user_table, context.captured_queries[0]['sql'])
+
+    @override_settings(CHATS_RESPONSE_CACHE={'ENABLED': False})
+    def test_state_is_loaded_once(self) -> None:
+        cache.clear()
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_inactive_user(self) -> None:
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = True
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deleted_user(self) -> None:
+        self.user.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes_tokens(self) -> None:
+        self.authorize(self.get_token(-timedelta(seconds=5)))
+        self.user.set_password('new_pass')
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.authorize(self.get_token(timedelta(seconds=5)))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_token_of_revocation_second_accepted(self) -> None:
+        self.user.set_password('new_pass')
+        self.user.save()
+        self.authorize(AccessToken.for_user(self.user))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_state_not_updated_by_other_changes(self) -> None:
+        self.user.first_name = 'Test'
+        # Only the update of the user row.
+        with self.assertNumQueries(1):
+            self.user.save()
+        self.user.is_active = False
+        with self.assertNumQueries(2):
+            self.user.save()
+
+    def test_revocation_outlives_cache(self) -> None:
+        self.authorize(self.get_token(-timedelta(seconds=5)))
+        self.user.set_password('new_pass')
+        self.user.save()
+        self.assertTrue(
+            TokenRevocation.objects.filter(user=self.user).exists())
+        # As in another process or after a restart.
+        cache.clear()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_without_cached_state(self) -> None:
+        self.client.get(self.url)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.delete(authentication.STATE_KEY.format(self.user.pk))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_account_changed_and_tokens_revoked(self) -> None:
+        self.authorize(self.get_token(-timedelta(seconds=5)))
+        response = self.client.post(
+            'http://127.0.0.1:8000/auth/users/set_password/',
+            {
+                'new_password': 'N3w-secret-pass',
+                'current_password': 'test_pass',
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('N3w-secret-pass'))
+        response = self.client.get('http://127.0.0.1:8000/auth/users/me/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_lazy_user_is_loaded_on_attribute(self) -> None:
+        token = AccessToken.for_user(self.user)
+        user = authentication.StatelessJWTAuthentication().get_user(token)
+        with self.assertNumQueries(0):
+            self.assertEqual(user.id, self.user.id)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.username, 'test_user')
+            self.assertEqual(user.email, self.user.email)
+        user = authentication.StatelessJWTAuthentication().get_user(token)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(user), 'test_user')
+
+
+class UserCacheTest(SimpleTestCase):
+
+    def test_least_recently_used_are_evicted(self) -> None:
+        users = authentication.UserCache(size=2, timeout=60)
+        for pk in (1, 2):
+            users.set(User(id=pk))
+        users.get(1)
+        users.set(User(id=3))
+        self.assertIsNone(users.get(2))
+        self.assertEqual(users.get(1).id, 1)
+        self.assertEqual(users.get(3).id, 3)
+
+    def test_expired_are_not_returned(self) -> None:
+        users = authentication.UserCache(size=2, timeout=-1)
+        users.set(User(id=1))
+        self.assertIsNone(users.get(1))
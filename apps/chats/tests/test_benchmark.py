@@ -0,0 +1,60 @@
+import random
+
+from django.test import TestCase
+
+from chats import benchmark, services
+from chats.models import ReadReceipt, Thread, Message
+
+
+class BenchmarkTest(TestCase):
+
+    def test_dataset_generated(self) -> None:
+        dataset = benchmark.generate_dataset(5, 4, 50, seed=1)
+        self.assertEqual(len(dataset.users), 5)
+        self.assertEqual(Thread.objects.count(), 4)
+        self.assertEqual(Message.objects.count(), 50)
+        self.assertEqual(
+            sum(len(messages) for messages in dataset.messages.values()), 50)
+        thread = Thread.objects.first()
+        self.assertEqual(
+            services.get_thread_by_participants(
+                list(thread.participants.values_list('id', flat=True))),
+            thread,
+        )
+        self.assertFalse(
+            Thread.objects.filter(messages__isnull=False,
+                                  last_message__isnull=True).exists()
+        )
+        self.assertTrue(ReadReceipt.objects.exists())
+
+    def test_requests_reproducible_by_seed(self) -> None:
+        dataset = benchmark.generate_dataset(5, 4, 50, seed=1)
+        user_id = next(iter(dataset.threads))
+
+        def get_requests(seed: int) -> list[tuple]:
+            client = benchmark.BenchmarkClient(
+                dataset, user_id, random.Random(seed))
+            return [
+                getattr(client, f'get_{endpoint}')()
+                for endpoint in ('thread_create', 'message_create',
+                                 'message_list', 'message_read') * 5
+            ]
+
+        self.assertEqual(get_requests(1), get_requests(1))
+
+    def test_traffic_replayed(self) -> None:
+        dataset = benchmark.generate_dataset(5, 4, 50, seed=1)
+        mix = dict(benchmark.DEFAULT_MIX, thread_destroy=0)
+        samples, seconds = benchmark.replay(dataset, mix, 1, 30, seed=1)
+        report = benchmark.summarize(samples, seconds)
+        self.assertEqual(report['requests'], len(samples))
+        for stats in report['endpoints'].values():
+            self.assertEqual(stats['errors'], 0)
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+            self.assertGreater(stats['queries_mean'], 0)
+
+    def test_percentile(self) -> None:
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([], 99), 0.0)
@@ -0,0 +1,135 @@
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+
+from chats import authentication, services
+from chats.models import Thread, Message
+from chats.tests import SHARED_CACHES
+
+User = get_user_model()
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class ConditionalResponseTest(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        authentication.user_cache.clear()
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer  {self.token}')
+        self.thread = Thread.objects.create()
+        self.thread.participants.set([self.user, self.user2])
+        self.base_url = 'http://127.0.0.1:8000/api/v1/chats/'
+        self.thread_list_url = f'{self.base_url}thread/list/'
+        self.message_list_url = (
+            f'{self.base_url}thread/{self.thread.id}/message/list/'
+        )
+        self.unread_url = f'{self.base_url}message/number-unread/'
+
+    def create_message(self) -> Message:
+        return services.create_message(
+            text="Test text", sender=self.user2, thread=self.thread)
+
+    def test_validators(self) -> None:
+        response = self.client.get(self.thread_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
+
+    def test_not_modified_without_queries(self) -> None:
+        for url in (
+            self.thread_list_url, self.message_list_url, self.unread_url
+        ):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+
+    def test_not_modified_since(self) -> None:
+        modified = self.client.get(self.unread_url)['Last-Modified']
+        response = self.client.get(
+            self.unread_url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.create_message()
+        response = self.client.get(
+            self.unread_url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, 1)
+
+    def test_new_message_changes_versions(self) -> None:
+        etags = {
+            url: self.client.get(url)['ETag']
+            for url in (
+                self.thread_list_url, self.message_list_url, self.unread_url
+            )
+        }
+        self.create_message()
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data, 1)
+
+    def test_first_page_cached(self) -> None:
+        self.create_message()
+        url = f'{self.message_list_url}?before=&limit=10'
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached.data, response.data)
+        # Other pages are not cached.
+        url = f'{self.message_list_url}?limit=10&offset=1'
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+    def test_marking_as_read_invalidates_messages(self) -> None:
+        message = self.create_message()
+        response = self.client.get(self.message_list_url)
+        self.assertFalse(response.data[0]['is_read'])
+        self.client.patch(f'{self.base_url}message/{message.id}/read/')
+        response = self.client.get(self.message_list_url)
+        self.assertTrue(response.data[0]['is_read'])
+        response = self.client.get(self.unread_url)
+        self.assertEqual(response.data, 0)
+
+    def test_thread_destroy_invalidates_threads(self) -> None:
+        response = self.client.get(self.thread_list_url)
+        self.assertEqual(len(response.data), 1)
+        self.client.delete(f'{self.base_url}thread/{self.thread.id}/destroy/')
+        response = self.client.get(self.thread_list_url)
+        self.assertEqual(response.data, [])
+
+    def test_thread_creation_invalidates_threads(self) -> None:
+        self.client.get(self.thread_list_url)
+        user3 = User.objects.create_user(username='test_user3')
+        self.client.post(
+            f'{self.base_url}thread/create/',
+            {'participants': [self.user.id, user3.id]}, format='json',
+        )
+        response = self.client.get(self.thread_list_url)
+        self.assertEqual(len(response.data), 2)
+
+    @override_settings(CHATS_RESPONSE_CACHE={'ENABLED': False})
+    def test_disabled(self) -> None:
+        response = self.client.get(self.thread_list_url)
+        self.assertNotIn('ETag', response)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_not_cached_by_process(self) -> None:
+        response = self.client.get(self.thread_list_url)
+        self.assertNotIn('ETag', response)
@@ -0,0 +1,279 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+
+from chats import services
+from chats.models import (
+    ArchivedMessage,
+    Thread,
+    Message,
+    ReadReceipt,
+    ThreadUnreadMessagesCounter,
+    UnreadMessagesCounter,
+)
+
+User = get_user_model()
+
+
+class RecountUnreadMessagesCommandTest(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.thread = Thread.objects.create()
+        self.thread.participants.set([self.user, self.user2])
+        services.create_message(
+            text="Test text1", sender=self.user2, thread=self.thread)
+        services.create_message(
+            text="Test text2", sender=self.user2, thread=self.thread)
+
+    def test_counters_in_sync(self) -> None:
+        out = StringIO()
+        call_command('recount_unread_messages', stdout=out)
+        self.assertIn('Repaired 0', out.getvalue())
+        self.assertEqual(services.get_unread_messages_number(self.user), 2)
+
+    def test_drifted_counters_repaired(self) -> None:
+        UnreadMessagesCounter.objects.filter(user=self.user).update(number=7)
+        ThreadUnreadMessagesCounter.objects.all().delete()
+        UnreadMessagesCounter.objects.create(user=self.user2, number=3)
+        out = StringIO()
+        call_command('recount_unread_messages', stdout=out)
+        self.assertIn('Repaired 3', out.getvalue())
+        self.assertEqual(services.get_unread_messages_number(self.user), 2)
+        self.assertEqual(services.get_unread_messages_number(self.user2), 0)
+        counter = ThreadUnreadMessagesCounter.objects.get()
+        self.assertEqual(counter.user, self.user)
+        self.assertEqual(counter.number, 2)
+
+
+class RebuildSearchIndexCommandTest(TestCase):
+
+    def test_index_rebuilt(self) -> None:
+        user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        thread = Thread.objects.create()
+        thread.participants.set([user])
+        message = services.create_message(
+            text="Test text", sender=user, thread=thread)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO message_search(message_search) "
+                "VALUES ('delete-all')"
+            )
+        self.assertEqual(services.search_messages(user, 'text', 10)[0], [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Rebuilt', out.getvalue())
+        messages, _ = services.search_messages(user, 'text', 10)
+        self.assertEqual([found.id for found in messages], [message.id])
+
+
+class ExportMessagesCommandTest(TestCase):
+
+    def setUp(self) -> None:
+        user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.threads = [Thread.objects.create() for _ in range(2)]
+        for thread in self.threads:
+            thread.participants.set([user])
+            Message.objects.bulk_create(
+                Message(text=f"Text {i}", sender=user, thread=thread)
+                for i in range(5)
+            )
+
+    def test_export_of_threads(self) -> None:
+        out = StringIO()
+        call_command(
+            'export_messages', str(self.threads[1].id), '--chunk-size=2',
+            stdout=out,
+        )
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({row['thread'] for row in rows}, {self.threads[1].id})
+
+    def test_export_of_all_threads_to_file(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'messages.csv.gz')
+            call_command(
+                'export_messages', '--format=csv', '--gzip', f'--output={path}'
+            )
+            with gzip.open(path, 'rt') as file:
+                rows = list(csv.reader(file))
+        self.assertEqual(len(rows), 11)
+
+
+class BulkLoadCommandTest(TestCase):
+
+    def test_fixture_loaded(self) -> None:
+        out = StringIO()
+        path = os.path.join(settings.BASE_DIR, 'data.json')
+        call_command('bulk_load', path, '--chunk-size=2', stdout=out)
+        self.assertIn('chats.Message: 8', out.getvalue())
+        self.assertEqual(User.objects.count(), 3)
+        self.assertTrue(Message._meta.get_field('created').auto_now_add)
+
+        thread = Thread.objects.get(id=3)
+        self.assertEqual(thread.participants_key, '2:3')
+        self.assertEqual(thread.last_message_id, 8)
+        self.assertEqual(thread.updated, thread.last_message.created)
+        self.assertEqual(thread.last_message.created.isoformat(),
+                         '2023-04-16T16:05:10.527000+00:00')
+        self.assertEqual(
+            services.get_unread_messages_number(User.objects.get(id=2)), 1)
+        self.assertEqual(
+            services.get_unread_messages_number(User.objects.get(id=3)), 1)
+        # Ids of new objects follow the loaded ones.
+        self.assertEqual(Thread.objects.create().id, 4)
+
+    def test_jsonl_loaded_from_stdin(self) -> None:
+        user = User.objects.create_user(username='test_user')
+        records = [
+            {'model': 'chats.thread', 'pk': 10,
+             'fields': {'participants': [user.id]}},
+            {'model': 'chats.message', 'pk': 20,
+             'fields': {'sender': user.id, 'thread': 10, 'text': 'Text',
+                        'created': '2023-04-16T16:05:10Z'}},
+        ]
+        stdin = StringIO(''.join(json.dumps(record) + '\n' for record in records))
+        with mock.patch('sys.stdin', stdin):
+            call_command('bulk_load', '-', stdout=StringIO())
+        thread = Thread.objects.get(id=10)
+        self.assertEqual(list(thread.participants.all()), [user])
+        self.assertEqual(thread.last_message_id, 20)
+        self.assertEqual(thread.updated.year, 2023)
+
+    def test_other_threads_not_updated(self) -> None:
+        user = User.objects.create_user(username='test_user')
+        user2 = User.objects.create_user(username='test_user2')
+        thread = Thread.objects.create()
+        thread.participants.set([user, user2])
+        services.create_message(text='Text', sender=user2, thread=thread)
+        ThreadUnreadMessagesCounter.objects.update(number=7)
+        Thread.objects.update(last_message=None)
+        records = [
+            {'model': 'chats.thread', 'pk': 10,
+             'fields': {'participants': [user.id, user2.id]}},
+            {'model': 'chats.message', 'pk': 20,
+             'fields': {'sender': user2.id, 'thread': 10, 'text': 'Text',
+                        'created': '2023-04-16T16:05:10Z'}},
+        ]
+        stdin = StringIO(''.join(json.dumps(record) + '\n' for record in records))
+        with mock.patch('sys.stdin', stdin):
+            call_command('bulk_load', '-', stdout=StringIO())
+        thread.refresh_from_db()
+        self.assertIsNone(thread.last_message_id)
+        self.assertEqual(
+            ThreadUnreadMessagesCounter.objects.get(thread=thread).number, 7)
+        self.assertEqual(
+            ThreadUnreadMessagesCounter.objects.get(thread_id=10).number, 1)
+        # The total of the participant is counted from both threads.
+        self.assertEqual(services.get_unread_messages_number(user), 2)
+
+    def test_threads_without_pair_loaded(self) -> None:
+        records = [
+            {'model': 'chats.thread', 'pk': 10,
+             'fields': {'participants': [],
+                        'deleted': '2023-04-16T16:05:10Z'}},
+            {'model': 'chats.thread', 'pk': 11,
+             'fields': {'participants': []}},
+        ]
+        stdin = StringIO(''.join(json.dumps(record) + '\n' for record in records))
+        with mock.patch('sys.stdin', stdin):
+            call_command('bulk_load', '-', stdout=StringIO())
+        self.assertEqual(
+            list(Thread.objects.values_list('participants_key', flat=True)),
+            [None, None],
+        )
+
+    def test_generated(self) -> None:
+        out = StringIO()
+        call_command(
+            'bulk_load', '--generate', '--users=20', '--threads=30',
+            '--messages=500', '--seed=1', '--chunk-size=100', stdout=out,
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Thread.objects.count(), 30)
+        self.assertEqual(Message.objects.count(), 500)
+        self.assertEqual(
+            Thread.participants.through.objects.count(), 60)
+        self.assertFalse(
+            Thread.objects.filter(messages__isnull=False,
+                                  last_message__isnull=True).exists()
+        )
+        self.assertTrue(ReadReceipt.objects.exists())
+        unread = sum(services.count_unread_messages().values())
+        self.assertEqual(
+            sum(UnreadMessagesCounter.objects.values_list('number', flat=True)),
+            unread,
+        )
+
+    def test_path_or_generate_required(self) -> None:
+        with self.assertRaises(CommandError):
+            call_command('bulk_load')
+
+
+class ApplyRetentionCommandTest(TestCase):
+
+    def setUp(self) -> None:
+        user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.threads = [Thread.objects.create() for _ in range(2)]
+        for thread in self.threads:
+            thread.participants.set([user])
+            Message.objects.bulk_create(
+                Message(text=f"Text {i}", sender=user, thread=thread)
+                for i in range(5)
+            )
+
+    def test_messages_archived(self) -> None:
+        out = StringIO()
+        call_command(
+            'apply_retention', '--max-messages=2', '--batch-size=2',
+            f'--after-thread={self.threads[0].id}', stdout=out,
+        )
+        self.assertIn(f'Thread {self.threads[1].id}: 3', out.getvalue())
+        self.assertIn('Archived 3 messages', out.getvalue())
+        self.assertEqual(ArchivedMessage.objects.count(), 3)
+        self.assertEqual(Message.objects.count(), 7)
+
+    def test_messages_deleted(self) -> None:
+        out = StringIO()
+        call_command('apply_retention', '--max-messages=4', '--delete',
+                     stdout=out)
+        self.assertIn('Deleted 2 messages', out.getvalue())
+        self.assertFalse(ArchivedMessage.objects.exists())
+        self.assertEqual(Message.objects.count(), 8)
+
+    def test_limits_required(self) -> None:
+        with self.assertRaises(CommandError):
+            call_command('apply_retention')
+
+
+class PurgeDeletedThreadsCommandTest(TestCase):
+
+    def test_deleted_threads_purged(self) -> None:
+        user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        threads = [Thread.objects.create() for _ in range(2)]
+        for thread in threads:
+            thread.participants.set([user])
+            services.create_message(text="Text", sender=user, thread=thread)
+        services.delete_thread(threads[0].id)
+        out = StringIO()
+        call_command('purge_deleted_threads', '--batch-size=10', stdout=out)
+        self.assertIn(f'Thread {threads[0].id}: 1', out.getvalue())
+        self.assertIn('Deleted 1 messages', out.getvalue())
+        self.assertEqual(list(Thread.objects.all()), [threads[1]])
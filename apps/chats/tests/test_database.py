@@ -0,0 +1,190 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing
+from unittest import mock
+
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+
+from chats import database, services
+from chats.models import Message, ThreadUnreadMessagesCounter
+
+User = get_user_model()
+
+
+class ConnectionProfileTest(TestCase):
+
+    @override_settings(CHATS_DATABASE={'MMAP_SIZE': None})
+    def test_unset_pragma_skipped(self) -> None:
+        self.assertEqual(database.get_pragmas(), [
+            'PRAGMA journal_mode = WAL',
+            'PRAGMA synchronous = NORMAL',
+        ])
+
+    def test_write_in_transaction_not_repeated(self) -> None:
+        write = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            database.retry_on_locked(write)()
+        self.assertEqual(write.call_count, 1)
+
+
+@override_settings(CHATS_DATABASE={'WRITE_RETRIES': 2, 'RETRY_BACKOFF_MS': 0})
+class RetryOnLockedTest(SimpleTestCase):
+
+    def test_locked_write_repeated(self) -> None:
+        write = mock.Mock(side_effect=[
+            OperationalError('database is locked'),
+            OperationalError('database table is locked'),
+            'result',
+        ])
+        self.assertEqual(database.retry_on_locked(write)(1, a=2), 'result')
+        self.assertEqual(write.call_count, 3)
+        write.assert_called_with(1, a=2)
+
+    def test_retries_limited(self) -> None:
+        write = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            database.retry_on_locked(write)()
+        self.assertEqual(write.call_count, 3)
+
+    def test_other_errors_not_repeated(self) -> None:
+        write = mock.Mock(side_effect=OperationalError('no such table: x'))
+        with self.assertRaises(OperationalError):
+            database.retry_on_locked(write)()
+        self.assertEqual(write.call_count, 1)
+
+
+class ConcurrentWritesTest(TransactionTestCase):
+    """
+    Writes of many threads with their own connections, as of workers
+    of a server, to a copy of the test database in a temporary file,
+    which has the WAL journal unlike the in-memory one.
+    """
+
+    workers = 8
+    requests = 10
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.memory_name = connection.settings_dict['NAME']
+        # Keeps the in-memory database while no connection uses it.
+        cls.memory = sqlite3.connect(cls.memory_name, uri=True)
+        path = os.path.join(cls.directory.name, 'test.sqlite3')
+        with closing(sqlite3.connect(path)) as target:
+            cls.memory.backup(target)
+        # Connections of all threads share the settings.
+        connection.settings_dict['NAME'] = path
+        connection.close()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        connection.close()
+        connection.settings_dict['NAME'] = cls.memory_name
+        cls.memory.close()
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.thread, _ = services.get_by_participants_or_create_thread(
+            {}, [self.user.id, self.user2.id])
+        self.url = f'/api/v1/chats/thread/{self.thread.id}/message/create/'
+        self.read_url = f'/api/v1/chats/thread/{self.thread.id}/read/'
+
+    def test_pragmas_set(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            # NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def is_write_locked(self) -> bool:
+        path = connection.settings_dict['NAME']
+        with closing(sqlite3.connect(path, timeout=0)) as other:
+            try:
+                other.execute('BEGIN IMMEDIATE')
+            except sqlite3.OperationalError:
+                return True
+            other.rollback()
+            return False
+
+    def test_write_lock_taken_by_atomic_immediate(self) -> None:
+        with database.atomic_immediate():
+            self.assertTrue(self.is_write_locked())
+        self.assertFalse(self.is_write_locked())
+
+    def test_write_lock_not_taken_by_atomic(self) -> None:
+        with transaction.atomic():
+            User.objects.count()
+            self.assertFalse(self.is_write_locked())
+
+    def post_messages(
+        self, user: User, barrier: threading.Barrier, errors: list
+    ) -> None:
+        client = APIClient()
+        token = AccessToken.for_user(user)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        barrier.wait()
+        try:
+            for i in range(self.requests):
+                response = client.post(
+                    self.url, data=json.dumps({'text': f'Text {i}'}),
+                    content_type='application/json',
+                )
+                if response.status_code != status.HTTP_201_CREATED:
+                    errors.append(response.status_code)
+                # Reads before writes, so its transaction can find
+                # the database changed by another writer.
+                response = client.patch(self.read_url)
+                if response.status_code != status.HTTP_200_OK:
+                    errors.append(response.status_code)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    def test_concurrent_messages_written(self) -> None:
+        errors: list = []
+        barrier = threading.Barrier(self.workers)
+        workers = [
+            threading.Thread(
+                target=self.post_messages,
+                args=([self.user, self.user2][i % 2], barrier, errors),
+            )
+            for i in range(self.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            Message.objects.count(), self.workers * self.requests)
+        counters = ThreadUnreadMessagesCounter.objects.filter(
+            thread=self.thread).exclude(number=0)
+        self.assertEqual(
+            {
+                (counter.user_id, counter.thread_id): counter.number
+                for counter in counters
+            },
+            services.count_unread_messages(self.thread.id),
+        )
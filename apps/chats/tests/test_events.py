@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.tokens import AccessToken
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from chats import events, services
+from chats.models import Thread
+
+User = get_user_model()
+
+
+class EventHubTest(SimpleTestCase):
+
+    async def test_event_delivered_to_recipients(self) -> None:
+        hub = events.EventHub(events.InMemoryEventBackend())
+        with hub.subscribe(1) as queue, hub.subscribe(2) as queue2:
+            thread = threading.Thread(
+                target=hub.publish, args=('message.created', [1], {'id': 1})
+            )
+            thread.start()
+            event = await asyncio.wait_for(queue.get(), 1)
+            thread.join()
+            self.assertEqual(event['type'], 'message.created')
+            self.assertEqual(event['data'], {'id': 1})
+            self.assertTrue(queue2.empty())
+        self.assertEqual(hub.subscribers, {})
+
+    def test_file_backend_shares_events(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'events.log')
+            backend = events.FileEventBackend(path, poll_interval=0.01)
+            backend2 = events.FileEventBackend(path, poll_interval=0.01)
+            received: list[dict] = []
+            backend2.start(received.append)
+            backend.publish({'type': 'test', 'users': [1], 'data': {}})
+            deadline = time.monotonic() + 2
+            while not received and time.monotonic() < deadline:
+                time.sleep(0.01)
+            backend2.stop()
+        self.assertEqual(received, [{'type': 'test', 'users': [1], 'data': {}}])
+
+    def test_file_backend_rotates_file(self) -> None:
+        sent = [
+            {'type': 'test', 'users': [1], 'data': {'id': i}}
+            for i in range(10)
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'events.log')
+            backend = events.FileEventBackend(
+                path, max_bytes=100, poll_interval=0.01)
+            backend2 = events.FileEventBackend(path, poll_interval=0.01)
+            received: list[dict] = []
+            backend2.start(received.append)
+            for event in sent:
+                backend.publish(event)
+                time.sleep(0.02)
+            deadline = time.monotonic() + 2
+            while len(received) < len(sent) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            backend2.stop()
+            self.assertLess(os.path.getsize(path), 100)
+            self.assertLess(os.path.getsize(f'{path}.1'), 200)
+        self.assertEqual(received, sent)
+
+
+class EventStreamViewTest(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.token = AccessToken.for_user(self.user)
+        self.thread = Thread.objects.create()
+        self.thread.participants.set([self.user, self.user2])
+        self.url = 'http://127.0.0.1:8000/api/v1/chats/events/'
+
+    async def test_authentication_required(self) -> None:
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(f'{self.url}?token=invalid')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_new_message_streamed(self) -> None:
+        response = await self.async_client.get(f'{self.url}?token={self.token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        self.assertEqual(await anext(content), b'retry: 3000\n\n')
+        self.assertEqual(
+            await anext(content),
+            b'event: unread.changed\ndata: {"number":0}\n\n',
+        )
+
+        message = await sync_to_async(services.create_message)(
+            text="Test text", sender=self.user2, thread=self.thread)
+        await sync_to_async(services.notify_message_created)(message)
+        chunk = await asyncio.wait_for(anext(content), 1)
+        event_type, data = chunk.decode().split('\n')[:2]
+        self.assertEqual(event_type, 'event: message.created')
+        self.assertEqual(json.loads(data[len('data: '):])['id'], message.id)
+        chunk = await asyncio.wait_for(anext(content), 1)
+        self.assertEqual(
+            chunk, b'event: unread.changed\ndata: {"number":1}\n\n')
+        await content.aclose()
@@ -0,0 +1,96 @@
+from typing import Callable
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from chats import services
+from chats.models import Thread, Message
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked on SQLite')
+class ServicesQueryPlanTest(TestCase):
+    """
+    Check that hot queries search by an index instead of scanning a table.
+    """
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.thread, _ = services.get_by_participants_or_create_thread(
+            {}, [self.user.id, self.user2.id]
+        )
+        self.message = services.create_message(
+            text="Test text", sender=self.user2, thread=self.thread)
+
+    def get_query_plans(self, func: Callable) -> list[tuple[str, list[str]]]:
+        with CaptureQueriesContext(connection) as context:
+            func()
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if sql.split()[0] in ('SAVEPOINT', 'RELEASE', 'ROLLBACK'):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+        return plans
+
+    def assertUsesIndex(self, func: Callable, ordered: bool = False) -> None:
+        plans = self.get_query_plans(func)
+        self.assertTrue(plans)
+        for sql, details in plans:
+            for detail in details:
+                if detail.endswith(('CONSTANT ROW', 'CONSTANT ROWS')):
+                    continue
+                self.assertFalse(detail.startswith('SCAN'), f'{detail}: {sql}')
+                if ordered:
+                    self.assertNotIn('TEMP B-TREE', detail, sql)
+
+    def test_get_thread_by_participants(self) -> None:
+        self.assertUsesIndex(lambda: services.get_thread_by_participants(
+            [self.user2.id, self.user.id]))
+
+    def test_set_thread_last_update(self) -> None:
+        self.assertUsesIndex(lambda: services.set_thread_last_update(
+            self.thread.id, self.message.created))
+
+    def test_mark_message_as_read(self) -> None:
+        self.assertUsesIndex(
+            lambda: services.mark_message_as_read(self.message.id, self.user))
+
+    def test_get_unread_messages_number(self) -> None:
+        self.assertUsesIndex(
+            lambda: services.get_unread_messages_number(self.user))
+
+    def test_increase_unread_messages_number(self) -> None:
+        self.assertUsesIndex(
+            lambda: services.increase_unread_messages_number(self.message))
+
+    def test_reset_thread_unread_messages_number(self) -> None:
+        self.assertUsesIndex(
+            lambda: services.reset_thread_unread_messages_number(
+                self.thread.id))
+
+    def test_check_user_have_thread(self) -> None:
+        self.assertUsesIndex(lambda: services.check_user_have_thread(
+            self.thread.id, self.user))
+
+    def test_check_user_have_message(self) -> None:
+        self.assertUsesIndex(lambda: services.check_user_have_message(
+            self.message.id, self.user))
+
+    def test_is_user_sender(self) -> None:
+        self.assertUsesIndex(
+            lambda: services.is_user_sender(self.message.id, self.user))
+
+    def test_message_list_page(self) -> None:
+        messages = Message.objects.filter(thread_id=self.thread.id)
+        messages = messages.order_by('-created', '-id')
+        self.assertUsesIndex(lambda: list(messages[:100]), ordered=True)
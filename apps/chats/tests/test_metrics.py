@@ -0,0 +1,81 @@
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+
+from chats import metrics
+from chats.models import Thread
+
+User = get_user_model()
+
+
+# Metrics are turned off for other tests by the test runner.
+@override_settings(CHATS_METRICS={'ENABLED': True})
+class QueryMetricsMiddlewareTest(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        metrics.registry.reset()
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass', is_staff=True)
+        self.token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer  {self.token}')
+        self.url = 'http://127.0.0.1:8000/api/v1/chats/metrics/'
+        self.route = 'GET api/v1/chats/thread/list/'
+
+    def tearDown(self) -> None:
+        metrics.registry.reset()
+
+    def test_admin_required(self) -> None:
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_requests_recorded_by_route(self) -> None:
+        for _ in range(2):
+            thread = Thread.objects.create()
+            thread.participants.set([self.user])
+            self.client.get('http://127.0.0.1:8000/api/v1/chats/thread/list/')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        route = response.data[self.route]
+        self.assertEqual(route['requests'], 2)
+        self.assertEqual(route['errors'], 0)
+        self.assertEqual(route['queries_max'], 2)
+        self.assertEqual(route['duplicate_queries'], 0)
+        self.assertEqual(sum(route['histogram'].values()), 2)
+        self.assertGreater(route['p99_ms'], 0)
+
+    @override_settings(CHATS_METRICS={'SLOW_REQUEST_MS': 0})
+    def test_slow_request_logged(self) -> None:
+        with self.assertLogs('chats.metrics', 'WARNING') as logs:
+            self.client.get('http://127.0.0.1:8000/api/v1/chats/thread/list/')
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn(f'Slow request {self.route}', logs.output[0])
+        self.assertIn('FROM "thread"', logs.output[0])
+
+    @override_settings(CHATS_METRICS={'SLOW_REQUEST_MS': 0})
+    def test_streaming_response_not_recorded(self) -> None:
+        thread = Thread.objects.create()
+        thread.participants.set([self.user])
+        with self.assertNoLogs('chats.metrics', 'WARNING'):
+            response = self.client.get(
+                f'http://127.0.0.1:8000/api/v1/chats/thread/{thread.id}/export/')
+            b''.join(response.streaming_content)
+        self.assertEqual(metrics.registry.as_dict(), {})
+
+    @override_settings(CHATS_METRICS={'ENABLED': False})
+    def test_disabled(self) -> None:
+        self.client.get('http://127.0.0.1:8000/api/v1/chats/thread/list/')
+        self.assertEqual(metrics.registry.as_dict(), {})
+
+    def test_duplicate_queries_counted(self) -> None:
+        recorder = metrics.QueryRecorder()
+        for params in ([1], [1], [2]):
+            recorder(lambda *args: None, 'SELECT %s', params, False, {})
+        self.assertEqual(recorder.duplicates, 1)
+        self.assertEqual(recorder.similar, 2)
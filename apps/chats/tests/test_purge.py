@@ -0,0 +1,72 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from chats import purge, services
+from chats.models import ArchivedMessage, Thread, Message
+
+User = get_user_model()
+
+
+class PurgeThreadTest(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.threads = [Thread.objects.create() for _ in range(2)]
+        for thread in self.threads:
+            thread.participants.set([self.user])
+            Message.objects.bulk_create(
+                Message(text=f"Text {i}", sender=self.user, thread=thread)
+                for i in range(5)
+            )
+        self.thread = self.threads[0]
+        last = Message.objects.filter(thread=self.thread).last()
+        services.set_thread_last_update(self.thread.id, last.created, last.id)
+        ArchivedMessage.objects.create(
+            id=1000, thread=self.thread, sender=self.user, text="Text",
+            created=last.created,
+        )
+
+    def test_deleted_thread_purged(self) -> None:
+        services.delete_thread(self.thread.id)
+        self.assertEqual(purge.purge_thread(self.thread.id, batch_size=2), 5)
+        self.assertFalse(Thread.objects.filter(id=self.thread.id).exists())
+        self.assertFalse(ArchivedMessage.objects.exists())
+        self.assertEqual(Message.objects.count(), 5)
+        messages, _ = services.search_messages(self.user, 'text', 10)
+        self.assertEqual(len(messages), 5)
+
+    def test_not_deleted_thread_kept(self) -> None:
+        self.assertEqual(purge.purge_thread(self.thread.id), 0)
+        self.assertEqual(Message.objects.count(), 10)
+
+    def test_all_deleted_threads_purged(self) -> None:
+        for thread in self.threads:
+            services.delete_thread(thread.id)
+        purged = []
+        deleted = purge.purge_deleted_threads(
+            progress=lambda thread_id, number: purged.append(thread_id))
+        self.assertEqual(deleted, 10)
+        self.assertEqual(purged, [thread.id for thread in self.threads])
+        self.assertFalse(Thread.objects.exists())
+
+
+class PurgeWorkerTest(SimpleTestCase):
+
+    def test_scheduled_threads_purged(self) -> None:
+        worker = purge.PurgeWorker()
+        with mock.patch('chats.purge.purge_thread',
+                        side_effect=[Exception, 0]) as purge_thread, \
+                mock.patch('chats.purge.close_old_connections'), \
+                mock.patch('chats.purge.connection'), \
+                self.assertLogs('chats.purge', 'ERROR') as logs:
+            worker.schedule(1)
+            worker.schedule(2)
+            worker.queue.join()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Purge of thread 1 failed', logs.output[0])
+        self.assertEqual(
+            purge_thread.call_args_list, [mock.call(1), mock.call(2)])
+        self.assertTrue(worker.thread.is_alive())
@@ -0,0 +1,207 @@
+import json
+
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+
+from chats import authentication, membership, services
+from chats.models import Thread, Message
+from chats.tests import SHARED_CACHES
+
+User = get_user_model()
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class QueriesNumberTestCase(APITestCase):
+    """
+    Base test case that creates users and threads between them.
+    """
+
+    def setUp(self) -> None:
+        # Ids are reused after rollback of every test.
+        cache.clear()
+        authentication.user_cache.clear()
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer  {self.token}')
+        self.users = User.objects.bulk_create(
+            User(username=f'test_user{i}') for i in range(10)
+        )
+
+    def create_threads(self, number: int) -> list[Thread]:
+        return [
+            services.get_by_participants_or_create_thread(
+                {}, [self.user.id, user.id]
+            )[0]
+            for user in self.users[:number]
+        ]
+
+
+class ThreadListViewQueriesTest(QueriesNumberTestCase):
+    url = 'http://127.0.0.1:8000/api/v1/chats/thread/list/'
+
+    def test_queries_number_does_not_depend_on_threads(self) -> None:
+        self.create_threads(1)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 1)
+        self.create_threads(10)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 10)
+
+    def test_preview_queries_number_does_not_depend_on_threads(self) -> None:
+        for thread in self.create_threads(10):
+            services.create_message(
+                text="Test text", sender=self.users[0], thread=thread)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'{self.url}?preview=true')
+        self.assertEqual(len(response.data), 10)
+
+    def test_keyset_page_queries_number(self) -> None:
+        self.create_threads(10)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'{self.url}?before=&limit=5')
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class MessageListViewQueriesTest(QueriesNumberTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.thread = self.create_threads(1)[0]
+        self.url = f'http://127.0.0.1:8000/api/v1/chats/' \
+                   f'thread/{self.thread.id}/message/list/'
+
+    @override_settings(CHATS_RESPONSE_CACHE={'ENABLED': False})
+    def test_queries_number_does_not_depend_on_messages(self) -> None:
+        services.create_message(
+            text="Test text", sender=self.users[0], thread=self.thread)
+        # Threads of the user are cached by the first request.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 1)
+        Message.objects.bulk_create(
+            Message(text="Test text", sender=sender, thread=self.thread)
+            for sender in [self.user, self.users[0]] * 5
+        )
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 11)
+        self.assertEqual(response.data[0]['thread'], str(self.thread))
+
+
+class CreationViewsQueriesTest(QueriesNumberTestCase):
+
+    def test_thread_creation_queries_number(self) -> None:
+        url = 'http://127.0.0.1:8000/api/v1/chats/thread/create/'
+        data = json.dumps(dict(participants=[self.user.id, self.users[0].id]))
+        with self.assertNumQueries(11):
+            response = self.client.post(
+                url, data=data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(4):
+            response = self.client.post(
+                url, data=data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_message_creation_queries_number(self) -> None:
+        thread = self.create_threads(1)[0]
+        url = f'http://127.0.0.1:8000/api/v1/chats/' \
+              f'thread/{thread.id}/message/create/'
+        services.create_message(
+            text="Test text", sender=self.user, thread=thread)
+        data = json.dumps(dict(text="Test text"))
+        # The sender is loaded once for the response.
+        with self.assertNumQueries(10):
+            response = self.client.post(
+                url, data=data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(8):
+            response = self.client.post(
+                url, data=data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_batch_message_creation_queries_number(self) -> None:
+        threads = self.create_threads(2)
+        url = 'http://127.0.0.1:8000/api/v1/chats/message/batch-create/'
+
+        def post(number: int) -> None:
+            data = json.dumps({'messages': [
+                {'thread': threads[i % 2].id, 'text': 'Test text'}
+                for i in range(number)
+            ]})
+            response = self.client.post(
+                url, data=data, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        post(2)
+        # Counters are updated once per thread.
+        with self.assertNumQueries(10):
+            post(2)
+        with self.assertNumQueries(10):
+            post(20)
+
+
+class MembershipQueriesTest(QueriesNumberTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.thread = self.create_threads(1)[0]
+        self.message = services.create_message(
+            text="Test text", sender=self.users[0], thread=self.thread)
+
+    def get_user(self) -> User:
+        # A new object as in every request.
+        return User(id=self.user.id)
+
+    def test_thread_check_is_cached(self) -> None:
+        user = self.get_user()
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                services.check_user_have_thread(self.thread.id, user))
+            self.assertFalse(services.check_user_have_thread(0, user))
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                services.check_user_have_thread(self.thread.id, self.get_user()))
+
+    def test_message_checks_take_one_query(self) -> None:
+        user = self.get_user()
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                services.check_user_have_message(self.message.id, user))
+            self.assertFalse(services.is_user_sender(self.message.id, user))
+        membership.get_user_thread_ids(user)
+        with self.assertNumQueries(0):
+            self.assertTrue(services.check_user_have_message(
+                self.message.id, self.get_user()))
+
+    def test_threads_are_invalidated(self) -> None:
+        thread = self.create_threads(2)[1]
+        self.assertIn(thread.id, membership.get_user_thread_ids(self.get_user()))
+        thread.participants.remove(self.user)
+        self.assertNotIn(
+            thread.id, membership.get_user_thread_ids(self.get_user()))
+        thread.participants.add(self.user)
+        self.assertIn(thread.id, membership.get_user_thread_ids(self.get_user()))
+        thread_id = thread.id
+        thread.delete()
+        self.assertNotIn(
+            thread_id, membership.get_user_thread_ids(self.get_user()))
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_not_cached_by_process(self) -> None:
+        for _ in range(2):
+            user = self.get_user()
+            with self.assertNumQueries(1):
+                self.assertTrue(
+                    services.check_user_have_thread(self.thread.id, user))
+                self.assertTrue(
+                    services.check_user_have_thread(self.thread.id, user))
@@ -0,0 +1,190 @@
+import json
+from datetime import timedelta
+
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from chats import export, services
+from chats.models import ArchivedMessage, Thread, Message
+from chats.retention import RetentionPolicy, apply_retention
+
+User = get_user_model()
+
+
+class RetentionTestMixin:
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.thread = Thread.objects.create()
+        self.thread.participants.set([self.user, self.user2])
+
+    def create_messages(self, number: int, days_ago: int = 0) -> list[Message]:
+        messages = [
+            services.create_message(
+                text=f"Test text{i}", sender=self.user2, thread=self.thread)
+            for i in range(number)
+        ]
+        if days_ago:
+            created = timezone.now() - timedelta(days=days_ago)
+            for i, message in enumerate(messages):
+                message.created = created + timedelta(seconds=i)
+            Message.objects.bulk_update(messages, ['created'])
+            Thread.objects.filter(id=self.thread.id).update(created=created)
+        return messages
+
+
+class ApplyRetentionTest(RetentionTestMixin, TestCase):
+
+    def test_messages_archived_by_age(self) -> None:
+        old = self.create_messages(3, days_ago=40)
+        new = self.create_messages(2)
+        moved = apply_retention(RetentionPolicy(max_age_days=30, batch_size=2))
+        self.assertEqual(moved, 3)
+        self.assertEqual(
+            list(Message.objects.order_by('id').values_list('id', flat=True)),
+            [message.id for message in new],
+        )
+        archived = ArchivedMessage.objects.order_by('id')
+        self.assertEqual(
+            list(archived.values_list('id', 'text', 'sender_id')),
+            [(m.id, m.text, self.user2.id) for m in old],
+        )
+        self.assertEqual(services.get_unread_messages_number(self.user), 5)
+        counter = self.thread.unread_messages_counters.get(user=self.user)
+        self.assertEqual(counter.number, 5)
+
+    def test_messages_archived_by_number(self) -> None:
+        messages = self.create_messages(5)
+        moved = apply_retention(RetentionPolicy(max_messages=2))
+        self.assertEqual(moved, 3)
+        self.assertEqual(
+            list(Message.objects.order_by('id').values_list('id', flat=True)),
+            [messages[3].id, messages[4].id],
+        )
+        self.assertEqual(ArchivedMessage.objects.count(), 3)
+
+    def test_last_message_kept(self) -> None:
+        messages = self.create_messages(2, days_ago=40)
+        apply_retention(RetentionPolicy(max_age_days=30))
+        self.assertEqual(
+            list(Message.objects.values_list('id', flat=True)),
+            [messages[-1].id],
+        )
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.last_message_id, messages[-1].id)
+
+    def test_messages_deleted(self) -> None:
+        self.create_messages(3, days_ago=40)
+        moved = apply_retention(
+            RetentionPolicy(max_age_days=30, archive=False))
+        self.assertEqual(moved, 2)
+        self.assertEqual(Message.objects.count(), 1)
+        self.assertFalse(ArchivedMessage.objects.exists())
+        self.assertEqual(services.get_unread_messages_number(self.user), 1)
+
+    def test_unread_messages_kept_when_archived(self) -> None:
+        messages = self.create_messages(3, days_ago=40)
+        services.mark_thread_as_read(
+            self.thread.id, self.user, message_id=messages[0].id)
+        apply_retention(RetentionPolicy(max_age_days=30))
+        self.assertEqual(services.get_unread_messages_number(self.user), 2)
+        self.assertEqual(
+            services.count_unread_messages(self.thread.id),
+            {(self.user.id, self.thread.id): 2},
+        )
+        archived = services.get_thread_archived_messages(self.thread.id)
+        self.assertEqual(
+            list(archived.order_by('id').values_list('id', 'is_read')),
+            [(messages[0].id, True), (messages[1].id, False)],
+        )
+
+        self.assertEqual(
+            services.mark_thread_as_read(self.thread.id, self.user), 2)
+        self.assertEqual(services.get_unread_messages_number(self.user), 0)
+        self.assertEqual(services.count_unread_messages(self.thread.id), {})
+
+    def test_no_limits(self) -> None:
+        self.create_messages(3, days_ago=400)
+        self.assertEqual(apply_retention(RetentionPolicy()), 0)
+        self.assertEqual(Message.objects.count(), 3)
+
+    def test_progress_from_thread(self) -> None:
+        self.create_messages(3)
+        thread2 = Thread.objects.create()
+        thread2.participants.set([self.user])
+        Message.objects.bulk_create(
+            Message(text="Text", sender=self.user, thread=thread2)
+            for _ in range(3)
+        )
+        processed = []
+        moved = apply_retention(
+            RetentionPolicy(max_messages=1), self.thread.id,
+            lambda thread_id, number: processed.append((thread_id, number)),
+        )
+        self.assertEqual(moved, 2)
+        self.assertEqual(processed, [(thread2.id, 2)])
+        self.assertEqual(Message.objects.filter(thread=self.thread).count(), 3)
+
+    def test_export_includes_archive(self) -> None:
+        messages = self.create_messages(4)
+        apply_retention(RetentionPolicy(max_messages=2))
+        chunks = export.export_messages('jsonl', [self.thread.id])
+        rows = [json.loads(line) for line in ''.join(chunks).splitlines()]
+        self.assertEqual(
+            [row['id'] for row in rows], [message.id for message in messages])
+        self.assertEqual(rows[0]['sender'], self.user2.username)
+
+
+class ArchivedMessagesPaginationTest(RetentionTestMixin, APITestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer  {self.token}')
+        self.url = (
+            f'http://127.0.0.1:8000/api/v1/chats/thread/{self.thread.id}/'
+            'message/list/'
+        )
+        self.messages = self.create_messages(5)
+        apply_retention(RetentionPolicy(max_messages=2))
+
+    def get_ids(self, url: str, direction: str) -> list[int]:
+        ids = []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            page = [obj['id'] for obj in response.data['results']]
+            ids += page
+            url = response.data[direction] if page else None
+        return ids
+
+    def test_older_pages_continue_to_archive(self) -> None:
+        ids = self.get_ids(f'{self.url}?before=&limit=2', 'next')
+        self.assertEqual(
+            ids, [message.id for message in reversed(self.messages)])
+
+    def test_newer_pages_start_from_archive(self) -> None:
+        ids = []
+        url = f'{self.url}?after=&limit=2'
+        while url is not None:
+            response = self.client.get(url)
+            page = [obj['id'] for obj in response.data['results']]
+            ids = page + ids
+            url = response.data['previous'] if page else None
+        self.assertEqual(
+            ids, [message.id for message in reversed(self.messages)])
+        response = self.client.get(f'{self.url}?after=&limit=3')
+        self.assertEqual(
+            [obj['id'] for obj in response.data['results']],
+            [message.id for message in reversed(self.messages[:3])],
+        )
@@ -0,0 +1,111 @@
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from chats import search, services
+from chats.models import Thread, Message
+
+User = get_user_model()
+
+
+class MessageSearchViewTest(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.user3 = User.objects.create_user(
+            username='test_user3', password='test_pass3')
+        self.token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer  {self.token}')
+        self.thread = Thread.objects.create()
+        self.thread.participants.set([self.user, self.user2])
+        self.other_thread = Thread.objects.create()
+        self.other_thread.participants.set([self.user2, self.user3])
+        self.url = 'http://127.0.0.1:8000/api/v1/chats/message/search/'
+
+    def create_message(self, text: str, thread: Thread = None) -> Message:
+        return services.create_message(
+            text=text, sender=self.user2, thread=thread or self.thread)
+
+    def test_only_user_threads_are_searched(self) -> None:
+        message = self.create_message('Meet at the station')
+        self.create_message('Meet at the station', self.other_thread)
+        response = self.client.get(self.url, {'q': 'station'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['id'] for result in response.data['results']],
+            [message.id],
+        )
+        self.assertEqual(
+            response.data['results'][0]['highlight'],
+            'Meet at the <mark>station</mark>',
+        )
+        self.assertIsNone(response.data['next'])
+
+    def test_results_are_ranked(self) -> None:
+        weak = self.create_message('coffee and a long story about many things')
+        strong = self.create_message('coffee coffee')
+        response = self.client.get(self.url, {'q': 'coffee'})
+        self.assertEqual(
+            [result['id'] for result in response.data['results']],
+            [strong.id, weak.id],
+        )
+
+    def test_pages(self) -> None:
+        messages = [self.create_message('hello there') for _ in range(5)]
+        ids = []
+        url, params = self.url, {'q': 'hello', 'limit': 2}
+        while url is not None:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [result['id'] for result in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(sorted(ids), [message.id for message in messages])
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_index_follows_changes(self) -> None:
+        message = self.create_message('first version')
+        message.text = 'second version'
+        message.save()
+        response = self.client.get(self.url, {'q': 'first'})
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(self.url, {'q': 'second'})
+        self.assertEqual(len(response.data['results']), 1)
+        Message.objects.bulk_create([
+            Message(text='bulk text', sender=self.user2, thread=self.thread)
+        ])
+        self.thread.delete()
+        response = self.client.get(self.url, {'q': 'version'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_query_syntax_is_escaped(self) -> None:
+        message = self.create_message('Is it "quoted" OR NOT?')
+        response = self.client.get(self.url, {'q': '"quoted" OR ('})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['id'], message.id)
+        self.assertEqual(
+            response.data['results'][0]['highlight'],
+            'Is it &quot;<mark>quoted</mark>&quot; <mark>OR</mark> NOT?',
+        )
+
+    def test_thread_filter_and_invalid_cursor(self) -> None:
+        self.create_message('hello')
+        response = self.client.get(
+            self.url, {'q': 'hello', 'thread': self.other_thread.id})
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(self.url, {'q': 'hello', 'after': '!'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SQLiteSearchBackendTest(SimpleTestCase):
+
+    def test_match_has_only_quoted_words(self) -> None:
+        match = search.SQLiteSearchBackend.build_match('a "b" OR c* (d')
+        self.assertEqual(match, '"a" "b" "OR" "c" "d"')
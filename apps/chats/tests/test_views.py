@@ -1,12 +1,18 @@
+import csv
+import gzip
+import io
 import json
+from unittest import mock
 
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
-from chats.models import Thread, Message
+from chats import services
+from chats.models import Change, ReadReceipt, Thread, Message
 
 User = get_user_model()
 
@@ -43,6 +49,23 @@ class ThreadCreationViewTest(APITestCase):
         self.assertEqual(
             Thread.objects.first().participants.last(), self.user2
         )
+        self.assertEqual(
+            set(response.data),
+            {'id', 'participants', 'created', 'updated'},
+        )
+
+    def test_existing_thread_returned(self) -> None:
+        User.objects.create_user(username='test_user2', password='test_pass2')
+        response = self.client.post(
+            self.url, data=json.dumps(dict(participants=[1, 2])),
+            content_type='application/json')
+        response2 = self.client.post(
+            self.url, data=json.dumps(dict(participants=[2, 1])),
+            content_type='application/json')
+        self.assertEqual(response2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response2.data['id'], response.data['id'])
+        self.assertEqual(Thread.objects.count(), 1)
+        self.assertEqual(Thread.objects.get().participants_key, '1:2')
 
     def test_invalid_data_rejected(self) -> None:
         data = dict(participants=[1])
@@ -53,6 +76,7 @@ class ThreadCreationViewTest(APITestCase):
 class ThreadDestroyViewTest(APITestCase):
 
     def setUp(self) -> None:
+        cache.clear()
         self.user = User.objects.create_user(
             username='test_user', password='test_pass')
         self.token = AccessToken.for_user(self.user)
@@ -75,14 +99,38 @@ class ThreadDestroyViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
     def test_thread_destroyed(self) -> None:
+        services.create_message(
+            text="Test text", sender=self.user2, thread=self.thread)
         response = self.client.delete(self.url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(Thread.objects.count(), 0)
+        self.thread.refresh_from_db()
+        self.assertIsNotNone(self.thread.deleted)
+        self.assertIsNone(self.thread.participants_key)
+        self.assertFalse(self.thread.participants.exists())
+        self.assertEqual(services.get_unread_messages_number(self.user), 0)
+        self.assertEqual(
+            Change.objects.filter(type=Change.THREAD_DELETED).count(), 2)
+
+        response = self.client.get(
+            'http://127.0.0.1:8000/api/v1/chats/thread/list/')
+        self.assertEqual(response.data, [])
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_thread_purged_after_commit(self) -> None:
+        services.create_message(
+            text="Test text", sender=self.user2, thread=self.thread)
+        with self.settings(CHATS_THREAD_PURGE={'BACKGROUND': True}), \
+                mock.patch('chats.purge._worker.schedule') as schedule, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.url)
+        schedule.assert_called_once_with(self.thread.id)
 
 
 class ThreadListViewTest(APITestCase):
 
     def setUp(self) -> None:
+        cache.clear()
         self.user = User.objects.create_user(
             username='test_user', password='test_pass')
         self.token = AccessToken.for_user(self.user)
@@ -126,6 +174,41 @@ class ThreadListViewTest(APITestCase):
         self.assertEqual(response.data['results'][0]['id'], thread2.id)
         self.assertEqual(Thread.objects.count(), 2)
 
+    def test_get_threads_with_keyset_pagination(self) -> None:
+        thread = Thread.objects.create()
+        thread.participants.set([self.user])
+        thread2 = Thread.objects.create()
+        thread2.participants.set([self.user])
+        services.create_message(text="Test text", sender=self.user, thread=thread)
+        response = self.client.get(f'{self.url}?before=&limit=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['id'], thread.id)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['id'], thread2.id)
+        self.assertIsNone(response.data['next'])
+
+    def test_get_threads_with_preview(self) -> None:
+        user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        thread = Thread.objects.create()
+        thread.participants.set([self.user, user2])
+        thread2 = Thread.objects.create()
+        thread2.participants.set([self.user, user2])
+        services.create_message(text="Test text1", sender=user2, thread=thread)
+        message = services.create_message(
+            text="Test text2" * 100, sender=user2, thread=thread)
+        response = self.client.get(f'{self.url}?preview=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['id'], thread.id)
+        self.assertEqual(response.data[0]['unread_number'], 2)
+        last_message = response.data[0]['last_message']
+        self.assertEqual(last_message['id'], message.id)
+        self.assertEqual(last_message['sender'], user2.username)
+        self.assertEqual(len(last_message['text']), 100)
+        self.assertEqual(response.data[1]['id'], thread2.id)
+        self.assertEqual(response.data[1]['unread_number'], 0)
+        self.assertIsNone(response.data[1]['last_message'])
+
 
 class MessageCreationViewTest(APITestCase):
 
@@ -165,9 +248,84 @@ class MessageCreationViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class MessageBatchCreationViewTest(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer  {self.token}')
+        self.threads = [Thread.objects.create() for _ in range(2)]
+        for thread in self.threads:
+            thread.participants.set([self.user, self.user2])
+        self.url = 'http://127.0.0.1:8000/api/v1/chats/message/batch-create/'
+
+    def post(self, items: list[tuple[Thread, str]]):
+        data = json.dumps({'messages': [
+            {'thread': thread.id, 'text': text} for thread, text in items
+        ]})
+        return self.client.post(
+            self.url, data=data, content_type='application/json')
+
+    def test_authentication_required(self) -> None:
+        self.client.credentials()
+        response = self.post([(self.threads[0], 'Test text')])
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_participant_of_all_threads_required(self) -> None:
+        other = Thread.objects.create()
+        other.participants.set([self.user2])
+        response = self.post([(self.threads[0], 'Test'), (other, 'Test')])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Message.objects.exists())
+
+    def test_empty_data(self) -> None:
+        response = self.post([])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_too_many_messages(self) -> None:
+        response = self.post([(self.threads[0], 'Test')] * 501)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Message.objects.exists())
+
+    def test_messages_created_in_order(self) -> None:
+        first, second = self.threads
+        response = self.post(
+            [(first, 'one'), (second, 'two'), (first, 'three')])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [message['text'] for message in response.data],
+            ['one', 'two', 'three'],
+        )
+        self.assertEqual(response.data[0]['sender'], 'test_user')
+        self.assertEqual(response.data[0]['thread'], str(first))
+        messages = list(Message.objects.order_by('id'))
+        self.assertEqual(
+            [message.id for message in messages],
+            [message['id'] for message in response.data],
+        )
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.last_message, messages[2])
+        self.assertEqual(first.updated, messages[2].created)
+        self.assertEqual(second.last_message, messages[1])
+        self.assertEqual(services.get_unread_messages_number(self.user2), 3)
+        self.assertEqual(services.get_unread_messages_number(self.user), 0)
+        self.assertEqual(
+            Change.objects.filter(
+                user=self.user2, type=Change.MESSAGE_CREATED).count(),
+            3,
+        )
+
+
 class MessageListViewTest(APITestCase):
 
     def setUp(self) -> None:
+        cache.clear()
         self.user = User.objects.create_user(
             username='test_user', password='test_pass')
         self.token = AccessToken.for_user(self.user)
@@ -196,12 +354,12 @@ class MessageListViewTest(APITestCase):
             username='test_user2', password='test_pass2')
         thread2 = Thread.objects.create()
         thread2.participants.set([user2])
-        message = Message.objects.create(
+        message = services.create_message(
             text="Test text1", sender=self.user, thread=self.thread
         )
-        message2 = Message.objects.create(
+        message2 = services.create_message(
             text="Test text2", sender=user2, thread=self.thread)
-        Message.objects.create(text="Test text3", sender=user2, thread=thread2)
+        services.create_message(text="Test text3", sender=user2, thread=thread2)
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
@@ -215,12 +373,12 @@ class MessageListViewTest(APITestCase):
             username='test_user2', password='test_pass2')
         thread2 = Thread.objects.create()
         thread2.participants.set([user2])
-        message = Message.objects.create(
+        message = services.create_message(
             text="Test text1", sender=self.user, thread=self.thread
         )
-        Message.objects.create(
+        services.create_message(
             text="Test text2", sender=user2, thread=self.thread)
-        Message.objects.create(text="Test text3", sender=user2, thread=thread2)
+        services.create_message(text="Test text3", sender=user2, thread=thread2)
         response = self.client.get(f'{self.url}?limit=1&offset=1')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
@@ -229,6 +387,39 @@ class MessageListViewTest(APITestCase):
         self.assertEqual(Message.objects.count(), 3)
 
 
+    def test_get_messages_with_keyset_pagination(self) -> None:
+        messages = [
+            services.create_message(
+                text=f"Test text{i}", sender=self.user, thread=self.thread)
+            for i in range(3)
+        ]
+        response = self.client.get(f'{self.url}?before=&limit=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(
+            [obj['id'] for obj in response.data['results']],
+            [messages[2].id, messages[1].id],
+        )
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [obj['id'] for obj in response.data['results']],
+            [messages[0].id],
+        )
+        self.assertIsNone(response.data['next'])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [obj['id'] for obj in response.data['results']],
+            [messages[2].id, messages[1].id],
+        )
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(response.data['results'], [])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_invalid_cursor_rejected(self) -> None:
+        response = self.client.get(f'{self.url}?before=invalid')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
 class MessageMarkingAsReadViewTest(APITestCase):
 
     def setUp(self) -> None:
@@ -238,7 +429,7 @@ class MessageMarkingAsReadViewTest(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer  {self.token}')
         self.thread = Thread.objects.create()
         self.thread.participants.set([self.user])
-        self.message = Message.objects.create(
+        self.message = services.create_message(
             text="Test text1", sender=self.user, thread=self.thread
         )
         self.url = f'http://127.0.0.1:8000/api/v1/chats/' \
@@ -267,12 +458,180 @@ class MessageMarkingAsReadViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(Thread.objects.count(), 1)
         self.assertEqual(Message.objects.count(), 1)
-        self.assertEqual(Message.objects.get().is_read, True)
+        message = services.get_thread_messages(self.thread.id).get()
+        self.assertTrue(message.is_read)
+        self.assertEqual(
+            ReadReceipt.objects.get(user=self.user).last_read_id,
+            self.message.id,
+        )
+
+
+class ThreadExportViewTest(APITestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer  {self.token}')
+        self.thread = Thread.objects.create()
+        self.thread.participants.set([self.user, self.user2])
+        self.messages = [
+            services.create_message(
+                text=f'Text, "{i}"', sender=sender, thread=self.thread)
+            for i, sender in enumerate([self.user, self.user2] * 3)
+        ]
+        other = Thread.objects.create()
+        other.participants.set([self.user2])
+        services.create_message(text='Other', sender=self.user2, thread=other)
+        self.url = f'http://127.0.0.1:8000/api/v1/chats/thread/{self.thread.id}/export/'
+
+    def get_content(self, response) -> bytes:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_participant_required(self) -> None:
+        self.thread.participants.remove(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_jsonl(self) -> None:
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'application/jsonl')
+        lines = self.get_content(response).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [message.id for message in self.messages],
+        )
+        self.assertEqual(rows[1]['sender'], 'test_user2')
+        self.assertEqual(rows[1]['text'], 'Text, "1"')
+
+    def test_csv(self) -> None:
+        response = self.client.get(self.url, {'type': 'csv'})
+        self.assertIn('thread-', response['Content-Disposition'])
+        content = self.get_content(response).decode()
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][:3], ['id', 'thread', 'sender'])
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[2][4], 'Text, "1"')
+
+    def test_gzip(self) -> None:
+        response = self.client.get(self.url, {'gzip': 'true'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(self.get_content(response)).splitlines()
+        self.assertEqual(len(lines), 6)
+
+    def test_invalid_type(self) -> None:
+        response = self.client.get(self.url, {'type': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ThreadMarkingAsReadViewTest(APITestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer  {self.token}')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.thread = Thread.objects.create()
+        self.thread.participants.set([self.user, self.user2])
+        self.messages = [
+            services.create_message(
+                text=f"Test text{i}", sender=self.user2, thread=self.thread)
+            for i in range(3)
+        ]
+        services.create_message(
+            text="Test text", sender=self.user, thread=self.thread)
+        self.url = f'http://127.0.0.1:8000/api/v1/chats/' \
+                   f'thread/{self.thread.id}/read/'
+        self.unread_url = \
+            'http://127.0.0.1:8000/api/v1/chats/message/number-unread/'
+
+    def test_authentication_required(self) -> None:
+        self.client.credentials()
+        response = self.client.patch(self.url, data={})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_participant_required(self) -> None:
+        self.thread.participants.remove(self.user)
+        response = self.client.patch(self.url, data={})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_all_messages_marked_as_read(self) -> None:
+        response = self.client.patch(self.url, data={})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'number': 3})
+        messages = services.get_thread_messages(self.thread.id)
+        self.assertEqual(
+            messages.filter(is_read=False, sender=self.user2).count(), 0)
+        self.assertEqual(
+            messages.filter(is_read=False, sender=self.user).count(), 1)
+        self.assertEqual(self.client.get(self.unread_url).data, 0)
+        response = self.client.patch(self.url, data={})
+        self.assertEqual(response.data, {'number': 0})
+
+    def test_messages_marked_as_read_up_to_message(self) -> None:
+        data = dict(message=self.messages[1].id)
+        response = self.client.patch(self.url, data=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'number': 2})
+        messages = services.get_thread_messages(self.thread.id)
+        self.assertTrue(messages.get(id=self.messages[1].id).is_read)
+        self.assertFalse(messages.get(id=self.messages[2].id).is_read)
+        self.assertEqual(self.client.get(self.unread_url).data, 1)
+        # Receipts are not moved back.
+        data = dict(message=self.messages[0].id)
+        response = self.client.patch(self.url, data=data)
+        self.assertEqual(response.data, {'number': 0})
+        self.assertEqual(self.client.get(self.unread_url).data, 1)
+
+    def test_messages_read_by_every_participant(self) -> None:
+        user3 = User.objects.create_user(
+            username='test_user3', password='test_pass3')
+        self.thread.participants.add(user3)
+        self.assertEqual(services.get_unread_messages_number(user3), 4)
+        response = self.client.patch(self.url, data={})
+        self.assertEqual(response.data, {'number': 3})
+        self.assertEqual(services.get_unread_messages_number(user3), 4)
+        messages = services.get_thread_messages(self.thread.id)
+        self.assertFalse(messages.filter(is_read=True).exists())
+
+        services.mark_thread_as_read(
+            self.thread.id, user3, message_id=self.messages[1].id)
+        self.assertEqual(services.get_unread_messages_number(user3), 2)
+        self.assertEqual(
+            set(messages.filter(is_read=True).values_list('id', flat=True)),
+            {self.messages[0].id, self.messages[1].id},
+        )
+        self.assertEqual(services.count_unread_messages(self.thread.id), {
+            (self.user2.id, self.thread.id): 1,
+            (user3.id, self.thread.id): 2,
+        })
+
+    def test_messages_marked_as_read_up_to_created(self) -> None:
+        data = dict(created=self.messages[0].created.isoformat())
+        response = self.client.patch(self.url, data=data)
+        self.assertEqual(response.data, {'number': 1})
+        self.assertEqual(self.client.get(self.unread_url).data, 2)
+
+    def test_message_of_other_thread_rejected(self) -> None:
+        thread = Thread.objects.create()
+        message = services.create_message(
+            text="Test text", sender=self.user2, thread=thread)
+        response = self.client.patch(self.url, data=dict(message=message.id))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
 class UnreadMessagesNumberViewTest(APITestCase):
 
     def setUp(self) -> None:
+        cache.clear()
         self.user = User.objects.create_user(
             username='test_user', password='test_pass')
         self.token = AccessToken.for_user(self.user)
@@ -296,14 +655,127 @@ class UnreadMessagesNumberViewTest(APITestCase):
         thread.participants.set([self.user])
         thread2 = Thread.objects.create()
         thread2.participants.set([self.user, user2])
-        Message.objects.create(
+        services.create_message(
             text="Test text1", sender=self.user, thread=thread
         )
-        Message.objects.create(
+        services.create_message(
             text="Test text2", sender=self.user, thread=thread2)
-        Message.objects.create(text="Test text3", sender=user2, thread=thread2)
+        services.create_message(text="Test text3", sender=user2, thread=thread2)
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, 1)
         self.assertEqual(Thread.objects.count(), 2)
         self.assertEqual(Message.objects.count(), 3)
+
+    def test_read_message_not_counted(self) -> None:
+        user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        thread = Thread.objects.create()
+        thread.participants.set([self.user, user2])
+        message = services.create_message(
+            text="Test text1", sender=user2, thread=thread)
+        services.create_message(text="Test text2", sender=user2, thread=thread)
+        self.client.patch(
+            f'http://127.0.0.1:8000/api/v1/chats/message/{message.id}/read/')
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, 1)
+
+    def test_destroyed_thread_not_counted(self) -> None:
+        user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        thread = Thread.objects.create()
+        thread.participants.set([self.user, user2])
+        thread2 = Thread.objects.create()
+        thread2.participants.set([self.user, user2])
+        services.create_message(text="Test text1", sender=user2, thread=thread)
+        services.create_message(text="Test text2", sender=user2, thread=thread2)
+        thread.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, 1)
+
+    def test_joined_thread_counted(self) -> None:
+        user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        thread = Thread.objects.create()
+        thread.participants.set([user2])
+        services.create_message(text="Test text1", sender=user2, thread=thread)
+        thread.participants.add(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, 1)
+        thread.participants.remove(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, 0)
+
+
+class SyncViewTest(APITestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer  {self.token}')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.url = 'http://127.0.0.1:8000/api/v1/chats/sync/'
+
+    def test_authentication_required(self) -> None:
+        self.client.credentials()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_get_empty_data(self) -> None:
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data, {'token': 0, 'has_more': False, 'changes': []})
+
+    def test_get_changes_since_token(self) -> None:
+        thread, _ = services.get_by_participants_or_create_thread(
+            {}, [self.user.id, self.user2.id])
+        message = services.create_message(
+            text="Test text", sender=self.user2, thread=thread)
+        response = self.client.get(self.url)
+        changes = response.data['changes']
+        self.assertEqual(
+            [change['type'] for change in changes],
+            [Change.THREAD_CREATED, Change.MESSAGE_CREATED],
+        )
+        self.assertEqual(changes[0]['thread']['id'], thread.id)
+        self.assertEqual(changes[1]['message']['id'], message.id)
+        self.assertEqual(response.data['token'], changes[1]['id'])
+
+        token = response.data['token']
+        thread_id = thread.id
+        services.mark_message_as_read(message.id, self.user)
+        thread.delete()
+        response = self.client.get(f'{self.url}?token={token}')
+        changes = response.data['changes']
+        self.assertEqual(
+            [change['type'] for change in changes],
+            [Change.MESSAGES_READ, Change.THREAD_DELETED],
+        )
+        self.assertEqual(changes[0]['data']['message'], message.id)
+        self.assertEqual(changes[1]['thread_id'], thread_id)
+
+    def test_get_changes_in_batches(self) -> None:
+        thread, _ = services.get_by_participants_or_create_thread(
+            {}, [self.user.id, self.user2.id])
+        for i in range(3):
+            services.create_message(
+                text=f"Test text{i}", sender=self.user2, thread=thread)
+        response = self.client.get(f'{self.url}?limit=2')
+        self.assertTrue(response.data['has_more'])
+        self.assertEqual(len(response.data['changes']), 2)
+        response = self.client.get(
+            f'{self.url}?limit=2&token={response.data["token"]}')
+        self.assertFalse(response.data['has_more'])
+        self.assertEqual(len(response.data['changes']), 2)
+
+    def test_removed_participant_gets_change(self) -> None:
+        thread = Thread.objects.create()
+        thread.participants.set([self.user, self.user2])
+        thread.participants.remove(self.user)
+        response = self.client.get(self.url)
+        changes = response.data['changes']
+        self.assertEqual(changes[-1]['type'], Change.PARTICIPANTS_REMOVED)
+        self.assertEqual(changes[-1]['data'], {'users': [self.user.id]})
@@ -0,0 +1,136 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from chats import services, writes
+from chats.models import (
+    Change,
+    Message,
+    UnreadMessagesCounter,
+)
+
+User = get_user_model()
+
+
+class MessageWriteTest(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(
+            username='test_user', password='test_pass')
+        self.user2 = User.objects.create_user(
+            username='test_user2', password='test_pass2')
+        self.thread, _ = services.get_by_participants_or_create_thread(
+            {}, [self.user.id, self.user2.id])
+
+    def assertMessageWritten(self, message: Message) -> None:
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.last_message_id, message.id)
+        self.assertEqual(self.thread.updated, message.created)
+        self.assertEqual(services.get_unread_messages_number(self.user2), 1)
+        self.assertEqual(services.get_unread_messages_number(self.user), 0)
+        self.assertEqual(
+            Change.objects.filter(
+                type=Change.MESSAGE_CREATED, object_id=message.id).count(),
+            2,
+        )
+
+    def test_message_written(self) -> None:
+        message = services.create_message(
+            self.thread, self.user, "Test text")
+        self.assertMessageWritten(message)
+
+    def test_raw_orm_writes_skip_receivers(self) -> None:
+        Message.objects.create(
+            text="Test text", sender=self.user, thread=self.thread)
+        self.thread.refresh_from_db()
+        self.assertIsNone(self.thread.last_message_id)
+        self.assertFalse(UnreadMessagesCounter.objects.exists())
+
+    @override_settings(CHATS_MESSAGE_WRITES={'SIGNALS': True})
+    def test_raw_orm_writes_with_signals(self) -> None:
+        message = Message.objects.create(
+            text="Test text", sender=self.user, thread=self.thread)
+        self.assertMessageWritten(message)
+
+    @override_settings(CHATS_MESSAGE_WRITES={'COALESCE_MS': 1000})
+    def test_not_coalesced_in_transaction(self) -> None:
+        with mock.patch.object(writes.MessageWriter, 'submit') as submit:
+            message = services.create_message(
+                self.thread, self.user, "Test text")
+        submit.assert_not_called()
+        self.assertMessageWritten(message)
+
+    def test_messages_of_several_senders_written(self) -> None:
+        messages = services.write_messages([
+            Message(thread=self.thread, sender=self.user, text="Text 1"),
+            Message(thread=self.thread, sender=self.user2, text="Text 2"),
+            Message(thread=self.thread, sender=self.user2, text="Text 3"),
+        ])
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.last_message_id, messages[-1].id)
+        self.assertEqual(services.get_unread_messages_number(self.user), 2)
+        self.assertEqual(services.get_unread_messages_number(self.user2), 1)
+
+
+class MessageWriterTest(SimpleTestCase):
+
+    def setUp(self) -> None:
+        self.batches: list[list[str]] = []
+        self.writer = writes.MessageWriter(self.write)
+
+    def write(self, messages: list[Message]) -> list[Message]:
+        texts = [message.text for message in messages]
+        self.batches.append(texts)
+        if 'bad' in texts:
+            raise ValueError('Bad message')
+        for message in messages:
+            message.pk = len(message.text)
+        return messages
+
+    def submit_concurrently(
+        self, texts: list[str], window: float, max_batch: int = 100
+    ) -> dict[str, Message | Exception]:
+        results: dict[str, Message | Exception] = {}
+        barrier = threading.Barrier(len(texts))
+
+        def submit(text: str) -> None:
+            barrier.wait()
+            try:
+                results[text] = self.writer.submit(
+                    Message(text=text), window, max_batch)
+            except Exception as error:
+                results[text] = error
+
+        workers = [
+            threading.Thread(target=submit, args=(text,)) for text in texts
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(10)
+        return results
+
+    def test_messages_written_together(self) -> None:
+        texts = ['a', 'bb', 'ccc', 'dddd']
+        results = self.submit_concurrently(texts, 0.2)
+        self.assertEqual(len(self.batches), 1)
+        self.assertCountEqual(self.batches[0], texts)
+        for text in texts:
+            self.assertEqual(results[text].text, text)
+            self.assertEqual(results[text].pk, len(text))
+
+    def test_full_batch_written_before_window(self) -> None:
+        start = time.monotonic()
+        self.submit_concurrently(['a', 'bb'], 5, max_batch=2)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(self.batches, [self.batches[0]])
+
+    def test_failing_message_written_alone(self) -> None:
+        results = self.submit_concurrently(['a', 'bad', 'ccc'], 0.2)
+        self.assertIsInstance(results['bad'], ValueError)
+        self.assertEqual(results['a'].pk, 1)
+        self.assertEqual(results['ccc'].pk, 3)
+        self.assertEqual(len(self.batches), 4)
@@ -1,13 +1,31 @@
-from django.urls import path
+from django.urls import include, path
 
 from . import views
 
+# Async versions of the endpoints for ASGI workers.
+async_urlpatterns = [
+    path('thread/<int:pk>/message/create/', views.async_message_creation),
+    path('thread/<int:pk>/message/list/', views.async_message_list),
+    path('thread/<int:pk>/read/', views.async_thread_marking_as_read),
+    path('message/<int:pk>/read/', views.async_message_marking_as_read),
+    path('message/number-unread/', views.async_unread_messages_number),
+]
+
 urlpatterns = [
     path('thread/create/', views.thread_creation),
     path('thread/<int:pk>/destroy/', views.thread_destroy),
     path('thread/list/', views.thread_list),
     path('thread/<int:pk>/message/create/', views.message_creation),
     path('thread/<int:pk>/message/list/', views.message_list),
+    path('thread/<int:pk>/message/wait/', views.message_wait),
+    path('thread/<int:pk>/read/', views.thread_marking_as_read),
+    path('thread/<int:pk>/export/', views.thread_export),
     path('message/<int:pk>/read/', views.message_marking_as_read),
+    path('message/batch-create/', views.message_batch_creation),
     path('message/number-unread/', views.unread_messages_number),
+    path('message/search/', views.message_search),
+    path('sync/', views.sync),
+    path('events/', views.event_stream),
+    path('metrics/', views.metrics_view),
+    path('async/', include(async_urlpatterns)),
 ]
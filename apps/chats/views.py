@@ -1,18 +1,122 @@
-from requests import Request
+import asyncio
+import time
+from abc import ABCMeta, abstractmethod
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Iterator
+
+from asgiref.sync import sync_to_async
 from rest_framework import generics
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    NotFound,
+    PermissionDenied,
+    ValidationError,
+)
 from rest_framework.generics import get_object_or_404
-from rest_framework.pagination import LimitOffsetPagination
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.status import HTTP_200_OK
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import InvalidToken
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, connections
 from django.db.models import QuerySet
+from django.http import (
+    HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+)
+from django.http.response import HttpResponseBase
+from django.views import View
 
-from . import services
-from .models import Thread, Message
+from . import caching, events, export, metrics, services
+from .authentication import (
+    StatelessJWTAuthentication, get_model_user, get_request_user
+)
+from .models import ArchivedMessage, Change, Thread, Message
 from . import permissions
-from .serializers import ThreadSerializer, MessageSerializer
+from .pagination import MessagePagination, ThreadPagination
+from .serializers import (
+    ThreadSerializer,
+    MessageSerializer,
+    MessageBatchSerializer,
+    ThreadReadingSerializer,
+    SyncSerializer,
+    ChangeSerializer,
+    ExportSerializer,
+    MessageSearchSerializer,
+    MessageSearchResultSerializer,
+    MessageWaitSerializer,
+)
+
+if TYPE_CHECKING:
+    from django.contrib.auth.models import User
+else:
+    User = get_user_model()
+
+
+if TYPE_CHECKING:
+    # The mixin extends `get()` of generic views.
+    GenericView = generics.RetrieveAPIView
+else:
+    GenericView = object
+
+
+class ConditionalResponseMixin(GenericView, metaclass=ABCMeta):
+    """
+    Answers `304 Not Modified` if the client has the current version
+    of the data and keeps first pages in the cache by the version.
+    """
+    cache_first_page = True
+
+    @abstractmethod
+    def get_version_key(self) -> str:
+        """
+        Return cache key of the version of the data of the response.
+        """
+
+    @abstractmethod
+    def get_cache_scope(self) -> str:
+        """
+        Return part of keys of cached pages shared by users that get
+        the same pages.
+        """
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        if not caching.is_enabled():
+            return super().get(request, *args, **kwargs)
+        # The version is read before the data, so it is never newer.
+        version = caching.get_version(self.get_version_key())
+        variant = request.accepted_renderer.format
+        not_modified = caching.get_not_modified(request, version, variant)
+        if not_modified is None:
+            response = self.get_cached_response(
+                request, version, *args, **kwargs
+            )
+        else:
+            response = Response(status=not_modified.status_code)
+        caching.set_validators(response, version, variant)
+        return response
+
+    def get_cached_response(
+        self, request: Request, version: dict, *args: Any, **kwargs: Any
+    ) -> Response:
+        if not self.cache_first_page or not caching.is_first_page(request):
+            return super().get(request, *args, **kwargs)
+        key = caching.get_page_key(request, self.get_cache_scope(), version)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data, status=HTTP_200_OK)
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == HTTP_200_OK:
+            cache.set(key, response.data, caching.get_option('TIMEOUT'))
+        return response
 
 
 class ThreadCreationView(generics.CreateAPIView):
@@ -21,18 +125,45 @@ class ThreadCreationView(generics.CreateAPIView):
 
 
 class ThreadDestroyView(generics.DestroyAPIView):
+    """
+    Hides the thread at once, its messages are deleted in background.
+    """
+
     permission_classes = [IsAuthenticated, permissions.IsThreadParticipant]
-    queryset = Thread.objects
+    queryset = Thread.objects.filter(deleted__isnull=True)
+
+    def perform_destroy(self, instance: Thread) -> None:
+        services.delete_thread(instance.id)
 
 
-class ThreadListView(generics.ListAPIView):
+class ThreadListView(ConditionalResponseMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ThreadSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = ThreadPagination
+
+    def get_version_key(self) -> str:
+        return caching.USER_VERSION_KEY.format(self.request.user.id)
+
+    def get_cache_scope(self) -> str:
+        return f'user-{self.request.user.id}'
 
     def get_queryset(self) -> QuerySet[Thread]:
-        user = self.request.user
-        return Thread.objects.filter(participants=user)
+        user = get_request_user(self.request)
+        if self.is_preview():
+            return services.get_user_threads_with_preview(user)
+        return services.get_user_threads(user)
+
+    def get_serializer_context(self) -> dict:
+        context = super().get_serializer_context()
+        context['preview'] = self.is_preview()
+        return context
+
+    def is_preview(self) -> bool:
+        """
+        Check whether the last message and unread number are requested.
+        """
+        preview = self.request.query_params.get('preview', '')
+        return preview.lower() in ('1', 'true')
 
 
 class MessageCreationView(generics.CreateAPIView):
@@ -40,26 +171,76 @@ class MessageCreationView(generics.CreateAPIView):
     serializer_class = MessageSerializer
 
     def perform_create(self, serializer: MessageSerializer) -> None:
+        # The thread is known to exist from `IsThreadParticipant`,
+        # so it is not fetched again.
+        thread = Thread(id=self.kwargs['pk'])
+        user = get_request_user(self.request)
+        try:
+            serializer.save(thread=thread, sender=get_model_user(user))
+        except IntegrityError:
+            raise NotFound('Thread is not found')
+
+
+class MessageBatchCreationView(APIView):
+    """
+    View for creating messages of the user in several threads at once.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request) -> Response:
+        serializer = MessageBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['messages']
+        user = get_request_user(request)
+        thread_ids = [item['thread'] for item in items]
+        if not services.check_user_have_threads(thread_ids, user):
+            raise PermissionDenied('User is not a participant of the threads')
+        try:
+            messages = services.create_messages(get_model_user(user), items)
+        except IntegrityError:
+            raise NotFound('Thread is not found')
+        data = MessageSerializer(messages, many=True).data
+        return Response(data, status=HTTP_201_CREATED)
+
+
+class ThreadMessagesMixin:
+    """
+    Messages of the thread from the URL, with archived ones
+    for keyset pages.
+    """
+    kwargs: dict
+
+    def get_queryset(self) -> QuerySet[Message]:
         thread_id = self.kwargs['pk']
-        threads = Thread.objects.filter(id=thread_id)
-        thread = get_object_or_404(threads)
-        user = self.request.user
-        serializer.save(thread=thread, sender=user)
+        return services.get_thread_messages(thread_id)
+
+    def get_archive_queryset(self) -> QuerySet[ArchivedMessage]:
+        thread_id = self.kwargs['pk']
+        return services.get_thread_archived_messages(thread_id)
 
 
-class MessageListView(generics.ListAPIView):
+class MessageListView(
+    ConditionalResponseMixin, ThreadMessagesMixin, generics.ListAPIView
+):
+    """
+    Messages of a thread are the same for all its participants,
+    so first pages are cached once per thread.
+    """
     permission_classes = [IsAuthenticated, permissions.IsThreadParticipant]
     serializer_class = MessageSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = MessagePagination
 
-    def get_queryset(self) -> QuerySet[Message]:
-        thread_id = self.kwargs['pk']
-        return Message.objects.filter(thread_id=thread_id)
+    def get_version_key(self) -> str:
+        return caching.THREAD_VERSION_KEY.format(self.kwargs['pk'])
+
+    def get_cache_scope(self) -> str:
+        return f'thread-{self.kwargs["pk"]}'
 
 
 class MessageMarkingAsReadView(APIView):
     """
-    View for updating `is_read` field of a `Message` object.
+    View for marking a message and earlier messages of its thread
+    as read by the user.
     """
     permission_classes = [
         IsAuthenticated,
@@ -68,22 +249,445 @@ class MessageMarkingAsReadView(APIView):
     ]
 
     def patch(self, request: Request, pk: int) -> Response:
-        services.mark_message_as_read(pk)
+        services.mark_message_as_read(pk, get_request_user(request))
         return Response(status=HTTP_200_OK)
 
 
-class UnreadMessagesNumberView(APIView):
+class ThreadExportView(APIView):
+    """
+    View for streaming all messages of a thread as JSON Lines or CSV.
+    """
+    permission_classes = [IsAuthenticated, permissions.IsThreadParticipant]
+
+    def get(self, request: Request, pk: int) -> HttpResponseBase:
+        serializer = ExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        export_format = serializer.validated_data['type']
+        compressed = serializer.validated_data['gzip']
+        text = export.export_messages(export_format, [pk])
+        chunks: Iterator[str | bytes]
+        if compressed:
+            chunks = export.compress(text)
+        else:
+            chunks = text
+        content: Iterator[str | bytes] | AsyncIterator[str | bytes] = chunks
+        if isinstance(request._request, ASGIRequest):
+            content = export.aiterate(chunks)
+        filename = f'thread-{pk}.{export_format}'
+        if compressed:
+            content_type = 'application/gzip'
+            filename += '.gz'
+        else:
+            content_type = export.CONTENT_TYPES[export_format]
+        # Async iterators are streamed since Django 4.2, unlike in stubs.
+        response = StreamingHttpResponse(
+            content, content_type=content_type  # type: ignore[arg-type]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ThreadMarkingAsReadView(APIView):
+    """
+    View for marking all messages of a thread sent to the user as read.
+
+    Accepts optional `message` id or `created` date and time
+    to mark only messages up to them.
+    """
+    permission_classes = [IsAuthenticated, permissions.IsThreadParticipant]
+
+    def patch(self, request: Request, pk: int) -> Response:
+        serializer = ThreadReadingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            number = services.mark_thread_as_read(
+                pk,
+                get_request_user(request),
+                message_id=data.get('message'),
+                created=data.get('created'),
+            )
+        except ObjectDoesNotExist:
+            raise NotFound('Message is not found in the thread')
+        return Response({'number': number}, status=HTTP_200_OK)
+
+
+class UnreadMessagesNumberView(
+    ConditionalResponseMixin, generics.RetrieveAPIView
+):
     permission_classes = [IsAuthenticated]
+    cache_first_page = False
 
-    def get(self, request: Request) -> Response:
-        number = services.get_unread_messages_number(self.request.user)
+    def get_version_key(self) -> str:
+        return caching.USER_VERSION_KEY.format(self.request.user.id)
+
+    def get_cache_scope(self) -> str:
+        return f'user-{self.request.user.id}'
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        user = get_request_user(self.request)
+        number = services.get_unread_messages_number(user)
         return Response(number, status=HTTP_200_OK)
 
 
+class SyncView(APIView):
+    """
+    View for getting all changes of the user threads after a sync token.
+
+    The returned `token` is passed to the next request.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request: Request) -> Response:
+        serializer = SyncSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        token = serializer.validated_data['token']
+        user = get_request_user(request)
+        changes, has_more = services.get_changes(
+            user, token, serializer.validated_data['limit']
+        )
+        message_ids = [
+            change.object_id
+            for change in changes
+            if change.type == Change.MESSAGE_CREATED
+            and change.object_id is not None
+        ]
+        thread_ids = [
+            change.thread_id
+            for change in changes
+            if change.type in (Change.THREAD_CREATED, Change.PARTICIPANTS_ADDED)
+        ]
+        threads = services.get_user_threads(user).filter(id__in=thread_ids)
+        context = {
+            'messages': services.get_messages(message_ids) if message_ids else {},
+            'threads': {thread.id: thread for thread in threads}
+            if thread_ids else {},
+        }
+        data = ChangeSerializer(changes, many=True, context=context).data
+        return Response({
+            'token': changes[-1].id if changes else token,
+            'has_more': has_more,
+            'changes': data,
+        }, status=HTTP_200_OK)
+
+
+class MessageSearchView(APIView):
+    """
+    View for full-text search of messages in the user threads.
+
+    Results are ordered by relevance; `next` is a link to the next page.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request: Request) -> Response:
+        serializer = MessageSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        messages, has_more = services.search_messages(
+            get_request_user(request),
+            data['q'],
+            data['limit'],
+            after=data.get('after'),
+            thread_id=data.get('thread'),
+        )
+        next_link = None
+        if has_more and messages:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'after',
+                serializer.encode_after(messages[-1]),
+            )
+        return Response({
+            'next': next_link,
+            'results': MessageSearchResultSerializer(messages, many=True).data,
+        }, status=HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    """
+    Internal view with request metrics of this process by route.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request) -> Response:
+        return Response(metrics.registry.as_dict(), status=HTTP_200_OK)
+
+
+class EventStreamView(View):
+    """
+    Server-Sent Events stream of new messages, read state changes
+    and unread numbers of the user.
+
+    Needs ASGI. The access token can be passed in `token` parameter
+    because browsers can not set headers of `EventSource` requests.
+    """
+
+    authentication = StatelessJWTAuthentication()
+
+    async def get(self, request: HttpRequest) -> HttpResponseBase:
+        try:
+            user = await self.authenticate(request)
+        except (AuthenticationFailed, InvalidToken) as error:
+            return JsonResponse({'detail': str(error)}, status=401)
+        if user is None:
+            return JsonResponse(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=401,
+            )
+        response = StreamingHttpResponse(
+            self.stream(user),  # type: ignore[arg-type]
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def authenticate(self, request: HttpRequest) -> User | None:
+        raw_token = request.GET.get('token')
+        if raw_token is None:
+            header = self.authentication.get_header(request)
+            if header is None:
+                return None
+            raw_token = self.authentication.get_raw_token(header)
+            if raw_token is None:
+                return None
+        token = self.authentication.get_validated_token(raw_token)
+        return await self.authentication.aget_user(token)
+
+    async def stream(self, user: User) -> AsyncIterator[str]:
+        options = getattr(settings, 'CHATS_EVENTS', {})
+        keepalive = options.get('KEEPALIVE', 15)
+        deadline = time.monotonic() + options.get('STREAM_TIMEOUT', 300)
+        with events.get_hub().subscribe(user.id) as queue:
+            yield 'retry: 3000\n\n'
+            number = await sync_to_async(
+                services.get_unread_messages_number
+            )(user)
+            yield events.format_event(
+                {'type': 'unread.changed', 'data': {'number': number}}
+            )
+            while time.monotonic() < deadline:
+                try:
+                    event = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield events.format_event(event)
+
+
+def release_connections() -> None:
+    """
+    Close database connections of the current thread that are not
+    in a transaction, e.g. before a request waits for long.
+    """
+    for connection in connections.all():
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+class AsyncAPIView(View):
+    """
+    Base of async views that answer like the DRF views of the same
+    endpoints.
+
+    DRF views are sync, so under ASGI each of them takes a thread for
+    the whole request. These views authenticate, check permissions
+    (`ahas_permission()`) and query with async methods of the ORM;
+    only writes that need a transaction are run in a thread.
+    """
+
+    authentication = StatelessJWTAuthentication()
+    permission_classes: list[type[permissions.AsyncPermission]] = []
+    parser_classes = APIView.parser_classes
+
+    @classmethod
+    def as_view(cls, **initkwargs) -> Callable:
+        view = super().as_view(**initkwargs)
+        # Requests are authenticated by tokens, as in DRF views.
+        setattr(view, 'csrf_exempt', True)
+        return view
+
+    # `View` types only sync `dispatch()`, but runs async handlers too.
+    async def dispatch(  # type: ignore[override]
+        self, request: HttpRequest, *args, **kwargs
+    ) -> HttpResponseBase:
+        request = Request(
+            request, parsers=[parser() for parser in self.parser_classes]
+        )
+        self.request = request
+        try:
+            await self.initial(request)
+            return await super().dispatch(  # type: ignore[misc]
+                request, *args, **kwargs
+            )
+        except APIException as error:
+            return self.handle_exception(request, error)
+
+    async def initial(self, request: Request) -> None:
+        authenticated = await self.authentication.aauthenticate(request)
+        if authenticated is None:
+            raise NotAuthenticated()
+        request.user = authenticated[0]
+        for permission_class in self.permission_classes:
+            permission = permission_class()
+            if not await permission.ahas_permission(request, self):
+                raise PermissionDenied(getattr(permission, 'message', None))
+
+    def handle_exception(
+        self, request: Request, error: APIException
+    ) -> JsonResponse:
+        data = error.detail
+        if not isinstance(data, (dict, list)):
+            data = {'detail': data}
+        response = JsonResponse(data, status=error.status_code, safe=False)
+        if isinstance(error, (NotAuthenticated, AuthenticationFailed)):
+            response['WWW-Authenticate'] = (
+                self.authentication.authenticate_header(request)
+            )
+        return response
+
+
+class AsyncMessageCreationView(AsyncAPIView):
+    permission_classes = [permissions.IsThreadParticipant]
+
+    async def post(self, request: Request, pk: int) -> JsonResponse:
+        serializer = MessageSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = get_request_user(request)
+        sender = await sync_to_async(get_model_user)(user)
+        try:
+            # The write is one transaction, which the async ORM lacks.
+            message = await sync_to_async(serializer.save)(
+                thread=Thread(id=pk), sender=sender
+            )
+        except IntegrityError:
+            raise NotFound('Thread is not found')
+        data = MessageSerializer(message).data
+        return JsonResponse(data, status=HTTP_201_CREATED)
+
+
+class AsyncMessageListView(ThreadMessagesMixin, AsyncAPIView):
+    permission_classes = [permissions.IsThreadParticipant]
+    pagination_class = MessagePagination
+
+    async def get(self, request: Request, pk: int) -> JsonResponse:
+        messages = self.get_queryset()
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(messages, request, self)
+        if page is None:
+            page = [message async for message in messages]
+            return JsonResponse(
+                MessageSerializer(page, many=True).data, safe=False
+            )
+        data = MessageSerializer(page, many=True).data
+        return JsonResponse(paginator.get_paginated_response(data).data)
+
+
+class MessageWaitView(ThreadMessagesMixin, AsyncAPIView):
+    """
+    Long poll of messages newer than the `after` cursor.
+
+    Returns at once if there are such messages, otherwise waits up to
+    `timeout` seconds for a new message of the thread. The request is
+    woken by the event of the created message and holds neither a thread
+    nor a database connection while waiting. The default in-process
+    event backend does not deliver events of other worker processes,
+    so with it the thread is also re-checked every `RECHECK_INTERVAL`
+    seconds of `CHATS_EVENTS`.
+    """
+    permission_classes = [permissions.IsThreadParticipant]
+    pagination_class = MessagePagination
+    # Waiting is not slowness, so requests do not skew metrics.
+    record_metrics = False
+
+    async def get(self, request: Request, pk: int) -> JsonResponse:
+        if 'after' not in request.query_params:
+            raise ValidationError({'after': 'This parameter is required.'})
+        serializer = MessageWaitSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        deadline = time.monotonic() + serializer.validated_data['timeout']
+        recheck_interval = events.get_recheck_interval()
+        user = get_request_user(request)
+        paginator = self.pagination_class()
+        messages = self.get_queryset()
+
+        # Events are received before the check, so a message created
+        # after it is not missed.
+        with events.get_hub().subscribe(user.id) as queue:
+            page = await paginator.apaginate_queryset(messages, request, self)
+            while not page and (remaining := deadline - time.monotonic()) > 0:
+                await sync_to_async(release_connections)()
+                event = await events.wait_for_event(
+                    queue,
+                    lambda event: (
+                        event['type'] == 'message.created'
+                        and event['data']['thread'] == int(pk)
+                    ),
+                    min(remaining, recheck_interval or remaining),
+                )
+                if event is None and recheck_interval is None:
+                    break
+                page = await paginator.apaginate_queryset(
+                    messages, request, self
+                )
+        data = MessageSerializer(page, many=True).data
+        return JsonResponse(paginator.get_paginated_response(data).data)
+
+
+class AsyncMessageMarkingAsReadView(AsyncAPIView):
+    permission_classes = [
+        permissions.IsThreadMessageParticipant,
+        permissions.IsNotSender,
+    ]
+
+    async def patch(self, request: Request, pk: int) -> HttpResponse:
+        await services.amark_message_as_read(pk, get_request_user(request))
+        return HttpResponse(status=HTTP_200_OK)
+
+
+class AsyncThreadMarkingAsReadView(AsyncAPIView):
+    permission_classes = [permissions.IsThreadParticipant]
+
+    async def patch(self, request: Request, pk: int) -> JsonResponse:
+        serializer = ThreadReadingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            number = await sync_to_async(services.mark_thread_as_read)(
+                pk,
+                get_request_user(request),
+                message_id=data.get('message'),
+                created=data.get('created'),
+            )
+        except ObjectDoesNotExist:
+            raise NotFound('Message is not found in the thread')
+        return JsonResponse({'number': number}, status=HTTP_200_OK)
+
+
+class AsyncUnreadMessagesNumberView(AsyncAPIView):
+
+    async def get(self, request: Request) -> JsonResponse:
+        user = get_request_user(request)
+        number = await services.aget_unread_messages_number(user)
+        return JsonResponse(number, status=HTTP_200_OK, safe=False)
+
+
 thread_creation = ThreadCreationView.as_view()
 thread_destroy = ThreadDestroyView.as_view()
 thread_list = ThreadListView.as_view()
 message_creation = MessageCreationView.as_view()
+message_batch_creation = MessageBatchCreationView.as_view()
 message_list = MessageListView.as_view()
 message_marking_as_read = MessageMarkingAsReadView.as_view()
+thread_marking_as_read = ThreadMarkingAsReadView.as_view()
+thread_export = ThreadExportView.as_view()
 unread_messages_number = UnreadMessagesNumberView.as_view()
+sync = SyncView.as_view()
+event_stream = EventStreamView.as_view()
+message_search = MessageSearchView.as_view()
+metrics_view = MetricsView.as_view()
+message_wait = MessageWaitView.as_view()
+async_message_creation = AsyncMessageCreationView.as_view()
+async_message_list = AsyncMessageListView.as_view()
+async_message_marking_as_read = AsyncMessageMarkingAsReadView.as_view()
+async_thread_marking_as_read = AsyncThreadMarkingAsReadView.as_view()
+async_unread_messages_number = AsyncUnreadMessagesNumberView.as_view()
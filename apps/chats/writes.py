@@ -0,0 +1,126 @@
+"""
+Write path of new messages.
+
+Messages are created by `services.create_message()` and
+`services.create_messages()`: the message, `updated` and `last_message`
+of its thread, unread messages counters and the change log are written
+by one transaction. `post_save` receivers of `Message` do the same for
+raw ORM writes (e.g. `Message.objects.create()` in scripts) only if
+`SIGNALS` is true.
+
+If `COALESCE_MS` is set, messages of concurrent requests are written
+in groups (group commit): requests wait up to that number of
+milliseconds for each other and their messages are inserted with one
+transaction, so a thread with many new messages is updated once.
+"""
+import threading
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Message
+
+DEFAULTS = {
+    'SIGNALS': False,
+    'COALESCE_MS': 0,
+    'MAX_BATCH': 100,
+}
+
+
+def get_option(name: str) -> Any:
+    options = getattr(settings, 'CHATS_MESSAGE_WRITES', {})
+    return options.get(name, DEFAULTS[name])
+
+
+class PendingMessage:
+    """
+    Message waiting for the write of its group.
+    """
+
+    def __init__(self, message: Message) -> None:
+        self.message = message
+        self.error: Exception | None = None
+        self.written = threading.Event()
+
+    def done(self, message: Message) -> None:
+        self.message = message
+        self.written.set()
+
+    def fail(self, error: Exception) -> None:
+        self.error = error
+        self.written.set()
+
+    def result(self) -> Message:
+        self.written.wait()
+        if self.error is not None:
+            raise self.error
+        return self.message
+
+
+class MessageWriter:
+    """
+    Writes messages of concurrent callers in groups with `write`,
+    which takes a list of messages and returns them saved.
+
+    The first caller of a group is its leader: it waits for the
+    window or until `max_batch` messages are queued, takes the queued
+    messages and writes them with its own connection. Other callers
+    wait for their messages. If the write of a group fails, its
+    messages are written one by one, so only the failing ones fail.
+    """
+
+    def __init__(
+        self, write: Callable[[list[Message]], list[Message]]
+    ) -> None:
+        self.write = write
+        self.lock = threading.Lock()
+        self.pending: list[PendingMessage] = []
+        self.full = threading.Event()
+        self.leading = False
+
+    def submit(
+        self, message: Message, window: float, max_batch: int
+    ) -> Message:
+        item = PendingMessage(message)
+        with self.lock:
+            self.pending.append(item)
+            lead = not self.leading
+            self.leading = True
+            if len(self.pending) >= max_batch:
+                self.full.set()
+        if lead:
+            self.full.wait(window)
+            with self.lock:
+                batch, self.pending = self.pending, []
+                self.leading = False
+                self.full.clear()
+            self.flush(batch)
+        return item.result()
+
+    def flush(self, batch: list[PendingMessage]) -> None:
+        try:
+            messages = self.write([item.message for item in batch])
+        except Exception as error:
+            if len(batch) == 1:
+                batch[0].fail(error)
+                return
+            for item in batch:
+                self.flush([item])
+            return
+        for item, message in zip(batch, messages):
+            item.done(message)
+
+
+def write_message(message: Message, writer: MessageWriter) -> Message:
+    """
+    Write the message alone or with messages of concurrent callers
+    if coalescing is enabled.
+
+    Messages written inside a transaction are always written alone,
+    because a group must not be rolled back by one of its callers.
+    """
+    window = get_option('COALESCE_MS') / 1000
+    if not window or transaction.get_connection().in_atomic_block:
+        return writer.write([message])[0]
+    return writer.submit(message, window, get_option('MAX_BATCH'))
@@ -33,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'chats.middleware.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -68,6 +69,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Busy timeout in seconds: how long a writer waits for the lock.
+            'timeout': config('DATABASE_BUSY_TIMEOUT', default=20, cast=int),
+        },
+        'CONN_MAX_AGE': config('DATABASE_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -100,8 +107,95 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Runs tests with chats metrics turned off.
+TEST_RUNNER = 'chats.tests.runner.TestRunner'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'chats.authentication.StatelessJWTAuthentication',
+    ),
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+CHATS_DATABASE = {
+    'JOURNAL_MODE': config('DATABASE_JOURNAL_MODE', default='WAL'),
+    'SYNCHRONOUS': config('DATABASE_SYNCHRONOUS', default='NORMAL'),
+    'MMAP_SIZE': config('DATABASE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+    'WRITE_RETRIES': config('DATABASE_WRITE_RETRIES', default=5, cast=int),
+    'RETRY_BACKOFF_MS': 20,
+}
+
+CHATS_MEMBERSHIP_CACHE_TIMEOUT = config(
+    'CHATS_MEMBERSHIP_CACHE_TIMEOUT', default=60, cast=int
+)
+
+CHATS_AUTH_USER_CACHE_SIZE = config(
+    'CHATS_AUTH_USER_CACHE_SIZE', default=1024, cast=int
+)
+
+CHATS_AUTH_STATE_TIMEOUT = config(
+    'CHATS_AUTH_STATE_TIMEOUT', default=30, cast=int
+)
+
+CHATS_EVENTS = {
+    'BACKEND': config(
+        'CHATS_EVENTS_BACKEND', default='chats.events.InMemoryEventBackend'
     ),
+    # Options of the backend, e.g. of FileEventBackend.
+    'OPTIONS': {
+        'path': config('CHATS_EVENTS_PATH', default='chats_events.log'),
+        'max_bytes': config(
+            'CHATS_EVENTS_MAX_BYTES', default=10 * 1024 * 1024, cast=int
+        ),
+    },
+    'KEEPALIVE': 15,
+    'STREAM_TIMEOUT': 300,
+    'LONG_POLL_TIMEOUT': 30,
+    # Long polls re-check the database after it with an in-process
+    # backend, which misses events of other worker processes.
+    'RECHECK_INTERVAL': 1,
+}
+
+CHATS_SEARCH = {
+    'BACKEND': config(
+        'CHATS_SEARCH_BACKEND', default='chats.search.SQLiteSearchBackend'
+    ),
+    'OPTIONS': {},
+}
+
+CHATS_RETENTION = {
+    'MAX_AGE_DAYS': config('CHATS_RETENTION_MAX_AGE_DAYS', default=0, cast=int),
+    'MAX_MESSAGES_PER_THREAD': config(
+        'CHATS_RETENTION_MAX_MESSAGES', default=0, cast=int
+    ),
+    'ARCHIVE': config('CHATS_RETENTION_ARCHIVE', default=True, cast=bool),
+    'BATCH_SIZE': 1000,
+}
+
+CHATS_THREAD_PURGE = {
+    'BACKGROUND': config('CHATS_THREAD_PURGE_BACKGROUND', default=True, cast=bool),
+    'BATCH_SIZE': 1000,
+}
+
+CHATS_RESPONSE_CACHE = {
+    'ENABLED': config('CHATS_RESPONSE_CACHE_ENABLED', default=True, cast=bool),
+    'TIMEOUT': config('CHATS_RESPONSE_CACHE_TIMEOUT', default=60, cast=int),
+}
+
+CHATS_MESSAGE_WRITES = {
+    'SIGNALS': config('CHATS_MESSAGE_SIGNALS', default=False, cast=bool),
+    'COALESCE_MS': config('CHATS_MESSAGE_COALESCE_MS', default=0, cast=int),
+    'MAX_BATCH': 100,
+}
+
+CHATS_METRICS = {
+    'ENABLED': config('CHATS_METRICS_ENABLED', default=True, cast=bool),
+    'SLOW_REQUEST_MS': config('CHATS_SLOW_REQUEST_MS', default=500, cast=int),
+    'SAMPLE_RATE': config('CHATS_METRICS_SAMPLE_RATE', default=0.0, cast=float),
 }
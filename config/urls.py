@@ -1,14 +1,31 @@
+from djoser.views import UserViewSet
+from rest_framework.routers import DefaultRouter
+
 from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+from chats.authentication import ModelJWTAuthentication
+
+
+class AccountViewSet(UserViewSet):
+    """
+    Users of djoser, authenticated as model instances to be changed.
+    """
+
+    authentication_classes = [ModelJWTAuthentication]
+
+
+account_router = DefaultRouter()
+account_router.register('users', AccountViewSet)
+
 api_urls = [
     path('chats/', include('chats.urls')),
 ]
 
 urlpatterns = [
     path('api/v1/', include(api_urls)),
-    path('auth/', include('djoser.urls')),
+    path('auth/', include(account_router.urls)),
     path('auth/', include('djoser.urls.jwt')),
 ]
 